@@ -1,13 +1,44 @@
+import os
+import hashlib
+import functools
 import yfinance as yf
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
 import backtrader as bt
 
+
+class SharedOHLCV:
+    """
+    只读的OHLCV连续数组
+    
+    将DataFrame一次性转换为5个C连续的float64数组, 多个策略/指标计算
+    共享同一份数据, 避免各自复制。数组设为只读, 防止被意外修改。
+    """
+    
+    __slots__ = ('index', 'open', 'high', 'low', 'close', 'volume')
+    
+    COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+    
+    def __init__(self, data):
+        if data.columns.nlevels > 1:
+            data = data.droplevel(1, axis=1)
+        
+        self.index = data.index
+        for column in self.COLUMNS:
+            array = np.ascontiguousarray(data[column].to_numpy(dtype=np.float64))
+            array.flags.writeable = False
+            setattr(self, column.lower(), array)
+    
+    def __len__(self):
+        return len(self.close)
+
+
 class BTCDataFeed:
     """Bitcoin data fetching and management"""
     
-    def __init__(self):
-        self.symbol = "BTC-USD"
+    def __init__(self, symbol="BTC-USD"):
+        self.symbol = symbol
     
     def fetch_data(self, start_date="2020-01-01", end_date=None, interval="1d"):
         """
@@ -43,25 +74,55 @@ class BTCDataFeed:
             print(f"数据获取失败: {e}")
             return None
     
-    def get_backtrader_data(self, start_date="2020-01-01", end_date=None):
+    def fetch_data_cached(self, start_date="2020-01-01", end_date=None, cache_dir=None):
+        """
+        带缓存的fetch_data, 按 进程内缓存 -> 磁盘缓存 -> 下载 的顺序查找
+        
+        返回的DataFrame已去除多级列名, 同一日期区间的调用方共享同一对象, 不应修改。
+        结束日期未指定时数据随时间变化, 直接下载不缓存。
+        
+        参数:
+        - cache_dir: 磁盘缓存目录(pickle文件), None为只使用进程内缓存
+        """
+        if end_date is None:
+            data = self.fetch_data(start_date, end_date)
+            return None if data is None else _flatten_columns(data)
+        
+        try:
+            return _load_data(self.symbol, start_date, end_date, cache_dir)
+        except ValueError:
+            return None
+    
+    def get_backtrader_data(self, start_date="2020-01-01", end_date=None, cache_dir=None):
         """
         获取用于Backtrader的数据格式
+        
+        指定cache_dir时经由fetch_data_cached获取(返回的DataFrame为共享缓存, 不应修改)。
         """
-        data = self.fetch_data(start_date, end_date)
+        if cache_dir is not None:
+            data = self.fetch_data_cached(start_date, end_date, cache_dir)
+        else:
+            data = self.fetch_data(start_date, end_date)
         if data is None:
             return None, None
         
         # 确保列名正确
-        if data.columns.nlevels > 1:
-            data.columns = data.columns.droplevel(1)
+        data = _flatten_columns(data)
         
-        # 重置索引确保datetime作为列
-        data_reset = data.reset_index()
+        return self.to_backtrader_feed(data), data
+    
+    @staticmethod
+    def to_backtrader_feed(data):
+        """
+        由fetch_data返回的DataFrame创建Backtrader数据源
         
-        # 创建Backtrader数据源
-        bt_data = bt.feeds.PandasData(
-            dataname=data_reset,
-            datetime='Date',
+        每个Cerebro需要独立的数据源对象, 同一份DataFrame可重复用于创建。
+        datetime=None时PandasData直接读取DatetimeIndex, 无需reset_index()
+        为每个数据源复制一份DataFrame; 数据源只读取, 不会修改共享的DataFrame。
+        """
+        return bt.feeds.PandasData(
+            dataname=data,
+            datetime=None,
             open='Open',
             high='High',
             low='Low',
@@ -69,8 +130,46 @@ class BTCDataFeed:
             volume='Volume',
             openinterest=-1
         )
-        
-        return bt_data, data
+    
+    def get_shared_ohlcv(self, data):
+        """
+        将fetch_data/get_backtrader_data返回的DataFrame转换为共享的只读数组
+        """
+        if data is None:
+            return None
+        return SharedOHLCV(data)
+
+
+def _flatten_columns(data):
+    """去除yfinance返回的多级列名(第二级为交易对)"""
+    if data.columns.nlevels > 1:
+        data.columns = data.columns.droplevel(1)
+    return data
+
+
+@functools.lru_cache(maxsize=8)
+def _load_data(symbol, start_date, end_date, cache_dir):
+    """
+    fetch_data_cached的实现, lru_cache为进程内缓存
+    
+    获取失败时抛出ValueError(异常不会被lru_cache缓存, 下次调用重新获取)。
+    """
+    cache_path = None
+    if cache_dir:
+        key = hashlib.sha256(f'{symbol}|{start_date}|{end_date}'.encode()).hexdigest()
+        cache_path = os.path.join(cache_dir, f'{key}.pkl')
+        if os.path.exists(cache_path):
+            return pd.read_pickle(cache_path)
+    
+    data = BTCDataFeed(symbol).fetch_data(start_date, end_date)
+    if data is None:
+        raise ValueError(f"无法获取 {symbol} 在 {start_date} 到 {end_date} 期间的数据")
+    data = _flatten_columns(data)
+    
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        data.to_pickle(cache_path)
+    return data
 
 if __name__ == "__main__":
     # 测试数据获取
@@ -0,0 +1,56 @@
+import backtrader as bt
+import numpy as np
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from strategies._kernels import rsi_wilder, rsi_step
+
+
+class RSIIncremental(bt.Indicator):
+    """
+    增量计算的Wilder RSI (数值与bt.indicators.RSI一致)
+
+    只维护平均涨幅/跌幅两个标量, 每根K线O(1)更新, 计算量与周期无关:
+    - runonce模式: once()对整段收盘价调用编译内核一次性计算
+    - 逐K线模式(如实时数据): nextstart()以前period个涨跌幅的均值为种子,
+      之后next()调用rsi_step单步更新
+    """
+
+    lines = ('rsi',)
+
+    params = (
+        ('period', 14),
+    )
+
+    def __init__(self):
+        # 第一个RSI需要period个涨跌幅, 即period+1根K线
+        self.addminperiod(self.p.period + 1)
+        self._up = 0.0
+        self._down = 0.0
+
+    def nextstart(self):
+        period = self.p.period
+        close = self.data
+        up = 0.0
+        down = 0.0
+        for k in range(-period + 1, 1):
+            delta = close[k] - close[k - 1]
+            up += max(delta, 0.0)
+            down += max(-delta, 0.0)
+        self._up = up / period
+        self._down = down / period
+        self.lines.rsi[0] = (100.0 if self._down == 0.0
+                             else 100.0 - 100.0 / (1.0 + self._up / self._down))
+
+    def next(self):
+        self._up, self._down, self.lines.rsi[0] = rsi_step(
+            self.data[0] - self.data[-1], self._up, self._down, self.p.period
+        )
+
+    def once(self, start, end):
+        rsi = rsi_wilder(np.asarray(self.data.array[:end], dtype=np.float64), self.p.period)
+        dst = self.lines.rsi.array
+        for i in range(start, end):
+            dst[i] = rsi[i]
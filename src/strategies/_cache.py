@@ -0,0 +1,233 @@
+"""
+策略共享的指标预计算缓存
+
+同一份行情上依次运行多个策略时(如综合测试), 相同的指标会被重复计算,
+例如成交量SMA(20)同时用于动量突破与价量策略, RSI(14)同时用于布林带与
+多指标策略。此模块按数据内容摘要缓存OHLCV数组和指标结果。
+
+缓存的数组均为只读, 使用方需要修改时应先复制。
+
+数组保持float64而不用float32: 指标值要与Backtrader数据线(float64)比较阈值,
+float32的舍入会改变恰好落在阈值附近的K线信号; 而日线数据每个数组只有
+数千个元素, 远小于CPU缓存, 策略在next()中又是逐个读取标量, 减半的内存
+带宽并不会体现在回测耗时上。
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from strategies._kernels import (NUMBA_AVAILABLE, NDArrayOHLCV, line_to_array, rsi_wilder,
+                                 rate_of_change, moving_average, rolling_mean_std, macd_lines,
+                                 ema, atr_wilder)
+
+try:
+    import talib
+except ImportError:  # TA-Lib为可选依赖
+    talib = None
+
+try:
+    from scipy.signal import lfilter
+except ImportError:  # SciPy为可选依赖
+    lfilter = None
+
+# 最多保留的数据集个数, 超出时淘汰最久未使用的
+_MAX_DATASETS = 4
+
+# 数据摘要 -> {指标键: 结果}
+_DATASETS = OrderedDict()
+
+
+def _freeze(value):
+    """将结果中的数组标记为只读, 防止缓存被使用方修改"""
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, tuple):
+        for item in value:
+            _freeze(item)
+    return value
+
+
+class PrecomputedIndicators:
+    """
+    单个数据集的指标缓存
+
+    使用方法:
+        indicators = precomputed(self.data)
+        rsi = indicators.rsi(14)
+        channels = indicators.get(('turtle', 20, 10, 20),
+                                  lambda: turtle_channels(...))
+    """
+
+    __slots__ = ('ohlcv', '_results')
+
+    def __init__(self, ohlcv, results):
+        self.ohlcv = ohlcv
+        self._results = results
+
+    def get(self, key, compute):
+        """按键读取指标, 未命中时调用compute()计算并缓存"""
+        value = self._results.get(key)
+        if value is None:
+            value = _freeze(compute())
+            self._results[key] = value
+        return value
+
+    def sma(self, field, period):
+        """指定OHLCV列的简单移动平均"""
+        values = getattr(self.ohlcv, field)
+        return self.get(('sma', field, period), lambda: moving_average(values, period))
+
+    def roc(self, field, period):
+        """指定OHLCV列的变化率"""
+        values = getattr(self.ohlcv, field)
+        return self.get(('roc', field, period), lambda: rate_of_change(values, period))
+
+    def ema(self, field, period):
+        """指定OHLCV列的指数移动平均"""
+        values = getattr(self.ohlcv, field)
+        return self.get(('ema', field, period), lambda: ema(values, period))
+
+    def atr(self, period):
+        """Wilder ATR"""
+        ohlcv = self.ohlcv
+        return self.get(('atr', period),
+                        lambda: atr_wilder(ohlcv.high, ohlcv.low, ohlcv.close, period))
+
+    def mean_std(self, field, period):
+        """
+        指定OHLCV列的滚动均值与总体标准差(布林带中轨与带宽)
+        
+        未安装numba时rolling_mean_std为纯Python循环, 此时改用sliding_window_view
+        按窗口向量化计算(O(N·period), 但在C中完成)。
+        """
+        values = getattr(self.ohlcv, field)
+        if not NUMBA_AVAILABLE:
+            return self.get(('mean_std', field, period),
+                            lambda: _mean_std_windows(values, period))
+        return self.get(('mean_std', field, period),
+                        lambda: rolling_mean_std(values, period))
+
+    def macd(self, fast_period, slow_period, signal_period):
+        """
+        收盘价的MACD线与信号线
+        
+        未安装numba时macd_lines为纯Python递推, 此时若安装了SciPy则以lfilter
+        (C实现的一阶IIR滤波)计算三条EMA, 种子与bt.indicators.EMA相同。
+        """
+        close = self.ohlcv.close
+        if lfilter is not None and not NUMBA_AVAILABLE:
+            return self.get(('macd', fast_period, slow_period, signal_period),
+                            lambda: _macd_lfilter(close, fast_period, slow_period, signal_period))
+        return self.get(('macd', fast_period, slow_period, signal_period),
+                        lambda: macd_lines(close, fast_period, slow_period, signal_period))
+
+    def rsi(self, period):
+        """
+        收盘价的Wilder RSI
+        
+        未安装numba时rsi_wilder为纯Python循环, 此时若安装了TA-Lib则改用其C实现
+        (同样以首个周期均值为种子的Wilder平滑, 与bt.indicators.RSI一致)。
+        """
+        close = self.ohlcv.close
+        if talib is not None and not NUMBA_AVAILABLE:
+            return self.get(('rsi', period), lambda: talib.RSI(close, timeperiod=period))
+        return self.get(('rsi', period), lambda: rsi_wilder(close, period))
+
+
+def _mean_std_windows(values, period):
+    """滚动均值与总体标准差的sliding_window_view实现, 结果与kernels.rolling_mean_std一致"""
+    mean = np.full(values.shape[0], np.nan)
+    std = np.full(values.shape[0], np.nan)
+    if values.shape[0] >= period:
+        windows = sliding_window_view(values, period)
+        mean[period - 1:] = windows.mean(axis=1)
+        std[period - 1:] = windows.std(axis=1)
+    return mean, std
+
+
+def _ema_lfilter(values, period):
+    """
+    EMA的lfilter实现, 结果与kernels.ema一致
+    
+    y[i] = alpha*x[i] + (1-alpha)*y[i-1] 即一阶IIR滤波, 以首个周期的SMA为
+    初始状态, 跳过输入开头的NaN。
+    """
+    out = np.full(values.shape[0], np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if valid.shape[0] == 0:
+        return out
+    start = valid[0]
+    if values.shape[0] - start < period:
+        return out
+
+    seed = values[start:start + period].mean()
+    out[start + period - 1] = seed
+    alpha = 2.0 / (period + 1)
+    rest = values[start + period:]
+    if rest.shape[0]:
+        out[start + period:] = lfilter([alpha], [1.0, alpha - 1.0], rest,
+                                       zi=[(1.0 - alpha) * seed])[0]
+    return out
+
+
+def _macd_lfilter(close, fast_period, slow_period, signal_period):
+    """MACD线与信号线的lfilter实现, 结果与kernels.macd_lines一致"""
+    macd = _ema_lfilter(close, fast_period) - _ema_lfilter(close, slow_period)
+    return macd, _ema_lfilter(macd, signal_period)
+
+
+def _digest(ohlcv):
+    """OHLCV内容摘要, 内容相同的不同数据源共享同一缓存"""
+    h = hashlib.blake2b(digest_size=16)
+    for values in ohlcv:
+        h.update(values)
+    return h.digest()
+
+
+def _line_views(data):
+    """
+    OHLCV数据线底层缓冲区的只读视图
+    
+    Backtrader数据线以array('d')存储, np.frombuffer可零拷贝读取; 其他存储
+    (如qbuffer模式的deque)退回line_to_array复制。视图只用于计算摘要和
+    首次建缓存时复制, 不应保留: 导出缓冲区期间array无法扩容。
+    """
+    views = []
+    for line in (data.open, data.high, data.low, data.close, data.volume):
+        try:
+            values = np.frombuffer(line.array, dtype=np.float64)
+        except (TypeError, ValueError):
+            values = line_to_array(line)
+        if values.shape[0] == 0:
+            raise ValueError("数据未预加载, 无法预计算指标(请使用Cerebro(preload=True))")
+        views.append(values)
+    return views
+
+
+def precomputed(data):
+    """
+    返回Backtrader数据源对应的指标缓存
+    
+    数据源需已预加载(见line_to_array)。OHLCV数组每个数据集只复制一次:
+    命中缓存时直接在数据线缓冲区上计算摘要, 各策略共享同一组只读数组。
+    """
+    views = _line_views(data)
+    key = _digest(views)
+    results = _DATASETS.get(key)
+    if results is None:
+        results = {'ohlcv': _freeze(tuple(np.array(values) for values in views))}
+        _DATASETS[key] = results
+        while len(_DATASETS) > _MAX_DATASETS:
+            _DATASETS.popitem(last=False)
+    else:
+        _DATASETS.move_to_end(key)
+    del views
+    return PrecomputedIndicators(NDArrayOHLCV(*results['ohlcv']), results)
+
+
+def clear_cache():
+    """清空全部缓存"""
+    _DATASETS.clear()
@@ -0,0 +1,818 @@
+"""
+策略共享的数值计算内核
+使用Numba编译为机器码; 未安装numba时退化为纯Python实现, 结果一致
+"""
+
+import os
+import subprocess
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+try:
+    from numba import njit, prange, types
+
+    NUMBA_AVAILABLE = True
+    _SCALAR_TYPES = {'i8': types.int64, 'f8': types.float64}
+
+    def kernel_signatures(n_arrays, scalars=(), n_outputs=1):
+        """
+        生成内核的显式签名, 使编译在导入时完成(配合cache=True写入磁盘缓存)
+
+        参数:
+        - n_arrays: float64序列参数个数(位于标量参数之前)
+        - scalars: 标量参数类型代码, 如('i8', 'f8')
+        - n_outputs: 返回的float64数组个数
+
+        数组参数只声明只读的任意布局一种: 只读数组(如SharedOHLCV、缓存的指标)
+        直接匹配, 可写数组也能安全转换到它。若同时声明可写签名, 可写数组匹配
+        两份签名的代价相同, numba会报Ambiguous overloading。
+        """
+        scalar_types = [_SCALAR_TYPES[code] for code in scalars]
+        output = types.Array(types.float64, 1, 'C')
+        restype = output if n_outputs == 1 else types.UniTuple(output, n_outputs)
+        array = types.Array(types.float64, 1, 'A', readonly=True)
+        return [restype(*([array] * n_arrays), *scalar_types)]
+except ImportError:  # numba为可选依赖
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+    def kernel_signatures(n_arrays, scalars=(), n_outputs=1):
+        return None
+
+
+def line_to_array(line):
+    """
+    将Backtrader数据线转换为float64数组
+
+    需要数据已预加载(Cerebro默认preload=True), 此时在策略__init__中
+    即可拿到完整的历史数据。
+    """
+    array = np.array(line.array, dtype=np.float64)
+    if array.shape[0] == 0:
+        raise ValueError("数据未预加载, 无法预计算指标(请使用Cerebro(preload=True))")
+    return array
+
+
+# OHLCV的结构数组(SoA)形式: 每列一个C连续float64数组
+NDArrayOHLCV = namedtuple('NDArrayOHLCV', ['open', 'high', 'low', 'close', 'volume'])
+
+
+def as_soa(data):
+    """将Backtrader数据源的OHLCV线一次性转换为NDArrayOHLCV, 供内核计算"""
+    return NDArrayOHLCV(*(np.ascontiguousarray(line_to_array(line))
+                          for line in (data.open, data.high, data.low,
+                                       data.close, data.volume)))
+
+
+@njit(kernel_signatures(1, ('i8',)), cache=True)
+def rsi_wilder(close, period):
+    """
+    Wilder RSI (与bt.indicators.RSI一致: 以首个周期的均值为种子, 前period根为NaN)
+    """
+    n = close.shape[0]
+    out = np.full(n, np.nan)
+    if n <= period:
+        return out
+
+    # 涨跌幅拆分为 (d+|d|)/2 与 (|d|-d)/2, 无分支且结果精确
+    up = 0.0
+    down = 0.0
+    for i in range(1, period + 1):
+        delta = close[i] - close[i - 1]
+        magnitude = abs(delta)
+        up += 0.5 * (magnitude + delta)
+        down += 0.5 * (magnitude - delta)
+    up /= period
+    down /= period
+    out[period] = 100.0 if down == 0.0 else 100.0 - 100.0 / (1.0 + up / down)
+
+    for i in range(period + 1, n):
+        delta = close[i] - close[i - 1]
+        magnitude = abs(delta)
+        gain = 0.5 * (magnitude + delta)
+        loss = 0.5 * (magnitude - delta)
+        up = (up * (period - 1) + gain) / period
+        down = (down * (period - 1) + loss) / period
+        out[i] = 100.0 if down == 0.0 else 100.0 - 100.0 / (1.0 + up / down)
+
+    return out
+
+
+@njit('UniTuple(f8, 3)(f8, f8, f8, i8)', cache=True)
+def rsi_step(delta, up, down, period):
+    """
+    Wilder RSI的单步流式更新(种子期之后), 每根K线O(1)
+
+    参数:
+    - delta: 本根K线收盘价变化
+    - up, down: 上一根K线的平均涨幅/跌幅
+
+    返回:
+    - (up, down, rsi)
+    """
+    magnitude = abs(delta)
+    up = (up * (period - 1) + 0.5 * (magnitude + delta)) / period
+    down = (down * (period - 1) + 0.5 * (magnitude - delta)) / period
+    rsi = 100.0 if down == 0.0 else 100.0 - 100.0 / (1.0 + up / down)
+    return up, down, rsi
+
+
+@njit(parallel=True, cache=True)
+def rsi_matrix(close, period):
+    """
+    多资产Wilder RSI: close为 (K线数, 资产数) 的二维数组, 逐列计算
+
+    各列相互独立, 用prange分配到多个线程, 每个线程只写自己的列。
+    按列连续存储(np.asfortranarray)时每列的读写为连续内存访问。
+
+    返回:
+    - 与close形状相同的RSI矩阵, 每列与rsi_wilder(close[:, j], period)一致
+    """
+    out = np.empty(close.shape)
+    for j in prange(close.shape[1]):
+        out[:, j] = rsi_wilder(close[:, j], period)
+    return out
+
+
+@njit(kernel_signatures(1, ('i8',)), cache=True)
+def rolling_zscore(values, period):
+    """
+    滚动Z-Score (均值/总体标准差与bt.indicators.SMA/StdDev一致)
+
+    维护窗口内的累计和与平方和, 每根K线O(1)更新。数据先减去首个值,
+    减小大数值下平方和相减带来的精度损失。前period-1根为NaN, 标准差为0时为0。
+    """
+    n = values.shape[0]
+    out = np.full(n, np.nan)
+    if n == 0:
+        return out
+
+    shift = values[0]
+    total = 0.0
+    total_sq = 0.0
+    for i in range(n):
+        x = values[i] - shift
+        total += x
+        total_sq += x * x
+        if i >= period:
+            old = values[i - period] - shift
+            total -= old
+            total_sq -= old * old
+        if i >= period - 1:
+            mean = total / period
+            variance = total_sq / period - mean * mean
+            out[i] = (x - mean) / np.sqrt(variance) if variance > 0.0 else 0.0
+
+    return out
+
+
+@njit(kernel_signatures(1, ('i8',), n_outputs=2), cache=True)
+def rolling_mean_std(values, period):
+    """
+    滚动均值与总体标准差 (与bt.indicators.SMA/StdDev一致), 前period-1根为NaN
+
+    返回:
+    - (mean, std)
+    """
+    n = values.shape[0]
+    mean = np.full(n, np.nan)
+    std = np.full(n, np.nan)
+    if n == 0:
+        return mean, std
+
+    shift = values[0]
+    total = 0.0
+    total_sq = 0.0
+    for i in range(n):
+        x = values[i] - shift
+        total += x
+        total_sq += x * x
+        if i >= period:
+            old = values[i - period] - shift
+            total -= old
+            total_sq -= old * old
+        if i >= period - 1:
+            m = total / period
+            mean[i] = m + shift
+            std[i] = np.sqrt(max(total_sq / period - m * m, 0.0))
+
+    return mean, std
+
+
+@njit(kernel_signatures(1, ('i8', 'i8', 'f8', 'f8', 'f8'), n_outputs=2), cache=True)
+def dynamic_bollinger(close, period, volatility_period, dev_base, dev_min, dev_max):
+    """
+    动态标准差倍数的布林带(EnhancedBollingerStrategy)
+
+    中轨与带宽为period日滚动均值/总体标准差; 倍数由波动率比率调整:
+    波动率为volatility_period日标准差, 比率 = 当前波动率 / 其最近volatility_period
+    个值的均值。比率>1.2时倍数放大(不超过dev_max), <0.8时缩小(不低于dev_min),
+    否则为dev_base; 均值窗口未填满时比率按1处理。
+
+    返回:
+    - (top, bot): 前 max(period, volatility_period)-1 根为NaN
+    """
+    n = close.shape[0]
+    top = np.full(n, np.nan)
+    bot = np.full(n, np.nan)
+    mid, std = rolling_mean_std(close, period)
+    _, volatility = rolling_mean_std(close, volatility_period)
+
+    start = max(period, volatility_period) - 1
+    full = 2 * volatility_period - 2  # 波动率均值窗口填满的首根K线
+    total = 0.0
+    for i in range(volatility_period - 1, n):
+        total += volatility[i]
+        if i - volatility_period >= volatility_period - 1:
+            total -= volatility[i - volatility_period]
+        if i < start:
+            continue
+
+        dev = dev_base
+        if i >= full:
+            avg = total / volatility_period
+            ratio = volatility[i] / avg if avg > 0 else 1.0
+            if ratio > 1.2:
+                dev = min(dev_max, dev_base * ratio)
+            elif ratio < 0.8:
+                dev = max(dev_min, dev_base * ratio)
+        top[i] = mid[i] + std[i] * dev
+        bot[i] = mid[i] - std[i] * dev
+
+    return top, bot
+
+
+@njit(kernel_signatures(3, ('i8', 'i8', 'i8'), n_outputs=3), cache=True)
+def turtle_channels(high, low, close, entry_period, exit_period, atr_period):
+    """
+    海龟策略指标的融合计算: 一次遍历OHLC同时得到
+    - entry_period日最高价 (bt.indicators.Highest)
+    - exit_period日最低价 (bt.indicators.Lowest)
+    - Wilder ATR (bt.indicators.ATR, 以首个周期真实波幅均值为种子)
+
+    最高/最低价使用单调队列(以预分配数组实现的环形缓冲区, 存放K线索引),
+    每根K线均摊O(1)。预热期为NaN。
+    """
+    n = high.shape[0]
+    highest = np.full(n, np.nan)
+    lowest = np.full(n, np.nan)
+    atr = np.full(n, np.nan)
+
+    # 单调递减队列: 队首为窗口最高价的索引
+    max_queue = np.empty(entry_period, dtype=np.int64)
+    max_head = 0
+    max_size = 0
+    # 单调递增队列: 队首为窗口最低价的索引
+    min_queue = np.empty(exit_period, dtype=np.int64)
+    min_head = 0
+    min_size = 0
+
+    tr_sum = 0.0
+    for i in range(n):
+        # 移出窗口外的队首, 再从队尾弹出不再可能成为最值的元素
+        if max_size > 0 and max_queue[max_head] <= i - entry_period:
+            max_head = (max_head + 1) % entry_period
+            max_size -= 1
+        while max_size > 0 and high[max_queue[(max_head + max_size - 1) % entry_period]] <= high[i]:
+            max_size -= 1
+        max_queue[(max_head + max_size) % entry_period] = i
+        max_size += 1
+        if i >= entry_period - 1:
+            highest[i] = high[max_queue[max_head]]
+
+        if min_size > 0 and min_queue[min_head] <= i - exit_period:
+            min_head = (min_head + 1) % exit_period
+            min_size -= 1
+        while min_size > 0 and low[min_queue[(min_head + min_size - 1) % exit_period]] >= low[i]:
+            min_size -= 1
+        min_queue[(min_head + min_size) % exit_period] = i
+        min_size += 1
+        if i >= exit_period - 1:
+            lowest[i] = low[min_queue[min_head]]
+
+        if i == 0:
+            continue
+        prev_close = close[i - 1]
+        true_range = max(high[i], prev_close) - min(low[i], prev_close)
+        if i < atr_period:
+            tr_sum += true_range
+        elif i == atr_period:
+            atr[i] = (tr_sum + true_range) / atr_period
+        else:
+            atr[i] = (atr[i - 1] * (atr_period - 1) + true_range) / atr_period
+
+    return highest, lowest, atr
+
+
+@njit(kernel_signatures(3, ('i8',)), cache=True)
+def atr_wilder(high, low, close, period):
+    """
+    Wilder ATR (与bt.indicators.ATR一致: 真实波幅从第2根K线起有效,
+    以首个周期的均值为种子), 前period根为NaN
+    """
+    n = high.shape[0]
+    atr = np.full(n, np.nan)
+    tr_sum = 0.0
+    for i in range(1, n):
+        prev_close = close[i - 1]
+        true_range = max(high[i], prev_close) - min(low[i], prev_close)
+        if i < period:
+            tr_sum += true_range
+        elif i == period:
+            atr[i] = (tr_sum + true_range) / period
+        else:
+            atr[i] = (atr[i - 1] * (period - 1) + true_range) / period
+    return atr
+
+
+def rate_of_change(values, period):
+    """变化率 (与bt.indicators.ROC一致: values / values(-period) - 1), 预热期为NaN"""
+    out = np.full(values.shape[0], np.nan)
+    if values.shape[0] > period:
+        out[period:] = values[period:] / values[:-period] - 1.0
+    return out
+
+
+def moving_average(values, period):
+    """简单移动平均(前缀和实现, O(N)), 预热期为NaN"""
+    out = np.full(values.shape[0], np.nan)
+    if values.shape[0] >= period:
+        cumsum = np.cumsum(np.concatenate(([0.0], values)))
+        out[period - 1:] = (cumsum[period:] - cumsum[:-period]) / period
+    return out
+
+
+@njit(kernel_signatures(1, ('i8',)), cache=True)
+def ema(values, period):
+    """
+    指数移动平均 (与bt.indicators.EMA一致: alpha=2/(period+1), 以首个周期的SMA为种子)
+
+    跳过输入开头的NaN(如另一指标的预热期), 种子取第一个有效值起的period个值。
+    """
+    n = values.shape[0]
+    out = np.full(n, np.nan)
+    start = 0
+    while start < n and np.isnan(values[start]):
+        start += 1
+    if n - start < period:
+        return out
+
+    total = 0.0
+    for i in range(start, start + period):
+        total += values[i]
+    prev = total / period
+    out[start + period - 1] = prev
+
+    alpha = 2.0 / (period + 1)
+    alpha1 = 1.0 - alpha
+    for i in range(start + period, n):
+        prev = prev * alpha1 + values[i] * alpha
+        out[i] = prev
+
+    return out
+
+
+@njit(kernel_signatures(1, ('i8', 'i8', 'i8'), n_outputs=2), cache=True)
+def macd_lines(close, fast_period, slow_period, signal_period):
+    """
+    MACD线与信号线 (与bt.indicators.MACD一致: 三条均线均为EMA)
+
+    返回:
+    - (macd, signal), 预热期为NaN
+    """
+    macd = ema(close, fast_period) - ema(close, slow_period)
+    return macd, ema(macd, signal_period)
+
+
+@njit(kernel_signatures(2, ('i8',), n_outputs=2), cache=True)
+def rolling_extrema(high, low, period):
+    """
+    滚动最高价/最低价 (bt.indicators.Highest/Lowest), 单调队列实现, 每根K线均摊O(1)
+
+    返回:
+    - (highest, lowest): 前period-1根为NaN
+    """
+    n = high.shape[0]
+    highest = np.full(n, np.nan)
+    lowest = np.full(n, np.nan)
+
+    max_queue = np.empty(period, dtype=np.int64)
+    max_head = 0
+    max_size = 0
+    min_queue = np.empty(period, dtype=np.int64)
+    min_head = 0
+    min_size = 0
+    for i in range(n):
+        if max_size > 0 and max_queue[max_head] <= i - period:
+            max_head = (max_head + 1) % period
+            max_size -= 1
+        while max_size > 0 and high[max_queue[(max_head + max_size - 1) % period]] <= high[i]:
+            max_size -= 1
+        max_queue[(max_head + max_size) % period] = i
+        max_size += 1
+
+        if min_size > 0 and min_queue[min_head] <= i - period:
+            min_head = (min_head + 1) % period
+            min_size -= 1
+        while min_size > 0 and low[min_queue[(min_head + min_size - 1) % period]] >= low[i]:
+            min_size -= 1
+        min_queue[(min_head + min_size) % period] = i
+        min_size += 1
+
+        if i >= period - 1:
+            highest[i] = high[max_queue[max_head]]
+            lowest[i] = low[min_queue[min_head]]
+
+    return highest, lowest
+
+
+@njit(kernel_signatures(3, ('i8', 'i8', 'i8'), n_outputs=2), cache=True)
+def stoch_williams(high, low, close, stoch_period, williams_period, period_dfast):
+    """
+    融合计算慢速随机指标%K与威廉指标%R
+
+    两者共用窗口最高价/最低价, 周期相同时只计算一次。与bt.indicators.Stochastic
+    的percK、bt.indicators.WilliamsR一致; 预热期及最高价等于最低价时为NaN。
+
+    返回:
+    - (stoch_k, williams)
+    """
+    n = close.shape[0]
+    stoch_high, stoch_low = rolling_extrema(high, low, stoch_period)
+    if williams_period == stoch_period:
+        williams_high, williams_low = stoch_high, stoch_low
+    else:
+        williams_high, williams_low = rolling_extrema(high, low, williams_period)
+
+    fast_k = np.full(n, np.nan)
+    stoch_k = np.full(n, np.nan)
+    williams = np.full(n, np.nan)
+    for i in range(n):
+        price_range = stoch_high[i] - stoch_low[i]
+        if price_range > 0.0:
+            fast_k[i] = 100.0 * (close[i] - stoch_low[i]) / price_range
+
+        # %K慢线: 快速%K的period_dfast日均值(窗口很小, 直接求和)
+        if i >= stoch_period + period_dfast - 2:
+            total = 0.0
+            for j in range(i - period_dfast + 1, i + 1):
+                total += fast_k[j]
+            stoch_k[i] = total / period_dfast
+
+        price_range = williams_high[i] - williams_low[i]
+        if price_range > 0.0:
+            williams[i] = -100.0 * (williams_high[i] - close[i]) / price_range
+
+    return stoch_k, williams
+
+
+# 3位掩码的置位数查找表
+_POPCOUNT3 = np.array([0, 1, 1, 2, 1, 2, 2, 3], dtype=np.uint8)
+
+
+def confirmation_signals(rsi, stoch_k, williams, oversold, overbought, min_count):
+    """
+    RSI/Stochastic/Williams %R 多指标确认信号
+
+    三个超卖(超买)条件按位打包为uint8掩码, 再用"置位数 >= min_count"的
+    8项布尔查找表直接映射为信号, 每根K线一次查表, 无比较分支。NaN比较结果为False。
+
+    返回:
+    - (oversold_signal, overbought_signal): 布尔数组
+    """
+    action_lut = _POPCOUNT3 >= min_count
+    oversold_mask = ((rsi < oversold).astype(np.uint8)
+                     | ((stoch_k < oversold).astype(np.uint8) << 1)
+                     | ((williams < oversold - 100).astype(np.uint8) << 2))
+    overbought_mask = ((rsi > overbought).astype(np.uint8)
+                       | ((stoch_k > overbought).astype(np.uint8) << 1)
+                       | ((williams > overbought - 100).astype(np.uint8) << 2))
+    return action_lut[oversold_mask], action_lut[overbought_mask]
+
+
+# 允许倒数近似与乘加融合; 不启用nnan/ninf, 内核依赖inf作为"不使用"的哨兵值
+_FASTMATH_FINITE_SAFE = {'arcp', 'contract'}
+
+
+@njit(cache=True, fastmath=_FASTMATH_FINITE_SAFE)
+def simulate_long_only(close, entry_signal, exit_signal, stop_distance,
+                       stop_loss, take_profit):
+    """
+    单仓位做多状态机
+
+    以信号K线收盘价成交, 入场后下一根K线起检查出场:
+    - exit_signal为True
+    - 价格跌破 入场价 - stop_distance (ATR类止损, 不使用时传inf)
+    - 收益率低于 -stop_loss 或高于 take_profit (不使用时传inf)
+
+    返回:
+    - (entries, exits, returns, open_entry): 已平仓交易的入场/出场K线索引及
+      每笔收益率(小数), 期末仍持仓时的入场K线索引(无持仓为-1)
+    """
+    n = close.shape[0]
+    entries = np.empty(n, dtype=np.int64)
+    exits = np.empty(n, dtype=np.int64)
+    returns = np.empty(n)
+    count = 0
+
+    in_position = False
+    buy_price = 0.0
+    inv_buy = 0.0
+    entry_index = 0
+    for i in range(n):
+        if not in_position:
+            if entry_signal[i]:
+                in_position = True
+                buy_price = close[i]
+                # 每笔持仓只做一次除法, 持仓期间收益率用乘法计算
+                inv_buy = 1.0 / buy_price
+                entry_index = i
+            continue
+
+        return_pct = close[i] * inv_buy - 1.0
+        if (exit_signal[i] or
+                close[i] < buy_price - stop_distance[i] or
+                return_pct < -stop_loss or
+                return_pct > take_profit):
+            entries[count] = entry_index
+            exits[count] = i
+            returns[count] = return_pct
+            count += 1
+            in_position = False
+
+    open_entry = entry_index if in_position else -1
+    return entries[:count], exits[:count], returns[:count], open_entry
+
+
+@njit(cache=True, fastmath=_FASTMATH_FINITE_SAFE)
+def final_value(close, entry_signal, exit_signal, stop_loss, take_profit,
+                cash, commission, position_size):
+    """
+    含手续费的单仓位回测, 只返回最终账户价值(参数扫描用, 不记录交易)
+
+    出场规则与simulate_long_only一致(不含ATR止损), 以信号K线收盘价成交;
+    买入使用position_size比例的现金, 买卖均按成交额收取commission比例的手续费。
+    """
+    in_position = False
+    units = 0.0
+    inv_buy = 0.0
+    for i in range(close.shape[0]):
+        price = close[i]
+        if not in_position:
+            if entry_signal[i]:
+                in_position = True
+                units = cash * position_size / price
+                cash -= units * price * (1.0 + commission)
+                inv_buy = 1.0 / price
+            continue
+
+        return_pct = price * inv_buy - 1.0
+        if exit_signal[i] or return_pct < -stop_loss or return_pct > take_profit:
+            cash += units * price * (1.0 - commission)
+            units = 0.0
+            in_position = False
+
+    if in_position:
+        cash += units * close[close.shape[0] - 1]
+    return cash
+
+
+@njit(parallel=True, cache=True)
+def sweep_momentum(close, volume, rsi, grid, rsi_limit, cash, commission, position_size):
+    """
+    ImprovedMomentumStrategy的并行参数扫描
+
+    grid每行为一组参数: (momentum_period, volume_period, momentum_threshold,
+    volume_threshold, stop_loss, take_profit)。各组合相互独立, 用prange分配到
+    多个线程, 价格/成交量/RSI数组只读共享。入场/出场规则与
+    ImprovedMomentumStrategy.next一致, 资金按final_value计算(含手续费)。
+
+    返回:
+    - 每组参数的最终账户价值
+    """
+    n = close.shape[0]
+    results = np.empty(grid.shape[0])
+    for k in prange(grid.shape[0]):
+        momentum_period = int(grid[k, 0])
+        volume_period = int(grid[k, 1])
+        momentum_threshold = grid[k, 2]
+        volume_threshold = grid[k, 3]
+
+        entry = np.zeros(n, dtype=np.bool_)
+        exit_ = np.zeros(n, dtype=np.bool_)
+        volume_sum = 0.0
+        for i in range(n):
+            volume_sum += volume[i]
+            if i >= volume_period:
+                volume_sum -= volume[i - volume_period]
+            if i < momentum_period or i < volume_period - 1:
+                continue
+            # 与策略一致: 动量值为ROC再除以100
+            prev = close[i - momentum_period]
+            momentum = (close[i] - prev) / prev / 100
+            exit_[i] = momentum < momentum_threshold * 0.2
+            if volume_sum > 0.0:
+                volume_ratio = volume[i] / (volume_sum / volume_period)
+                entry[i] = (momentum > momentum_threshold and
+                            volume_ratio > volume_threshold and
+                            rsi[i] < rsi_limit)
+
+        results[k] = final_value(close, entry, exit_, grid[k, 4], grid[k, 5],
+                                 cash, commission, position_size)
+
+    return results
+
+
+@njit(cache=True, fastmath=_FASTMATH_FINITE_SAFE)
+def run_rsi(close, period, oversold, overbought, stop_loss, take_profit,
+            position_size, cash):
+    """
+    RSI均值回归策略的完整编译实现(RSI计算 + 单仓位状态机 + 资金曲线)
+
+    规则与RSIMeanReversionStrategy一致: RSI低于oversold买入, RSI高于overbought
+    或触发止损/止盈卖出; 以信号K线收盘价成交, 买入使用position_size比例的现金,
+    不含手续费。期末未平仓的持仓与Backtrader一样逐K线按收盘价计入账户价值。
+
+    返回:
+    - (equity, entries, exits, returns): 每根K线的账户价值, 已平仓交易的
+      入场/出场K线索引, 每笔收益率(小数)
+    """
+    n = close.shape[0]
+    rsi = rsi_wilder(close, period)
+    entries, exits, returns, open_entry = simulate_long_only(
+        close, rsi < oversold, rsi > overbought, np.full(n, np.inf),
+        stop_loss, take_profit
+    )
+
+    equity = np.empty(n)
+    units = 0.0
+    k = 0
+    for i in range(n):
+        if (k < entries.shape[0] and i == entries[k]) or i == open_entry:
+            units = cash * position_size / close[i]
+            cash -= units * close[i]
+        elif k < exits.shape[0] and i == exits[k]:
+            cash += units * close[i]
+            units = 0.0
+            k += 1
+        equity[i] = cash + units * close[i]
+
+    return equity, entries, exits, returns
+
+
+@njit(parallel=True, cache=True)
+def sweep_bollinger(close, rsi, stop_distance, bb_periods, bb_devs,
+                    rsi_oversold, rsi_overbought, position_size):
+    """
+    布林带均值回归策略的并行参数扫描(bb_period × bb_dev网格)
+
+    各参数组合相互独立, 按bb_period用prange分配到多个线程; 同一周期的
+    均值/标准差只计算一次, 供该周期下所有bb_dev复用。OHLC数组只读共享。
+    入场/出场规则与BollingerMeanReversionStrategy.vectorized_signals一致。
+
+    返回:
+    - results[i, j] = (总收益率%, 交易次数, 胜率%)
+    """
+    n = close.shape[0]
+    results = np.zeros((bb_periods.shape[0], bb_devs.shape[0], 3))
+    for i in prange(bb_periods.shape[0]):
+        mean, std = rolling_mean_std(close, bb_periods[i])
+        entry = np.empty(n, dtype=np.bool_)
+        exit_ = np.empty(n, dtype=np.bool_)
+        for j in range(bb_devs.shape[0]):
+            for k in range(n):
+                band = bb_devs[j] * std[k]
+                entry[k] = close[k] <= (mean[k] - band) * 1.005 and rsi[k] < rsi_oversold
+                exit_[k] = close[k] >= (mean[k] + band) * 0.995 and rsi[k] > rsi_overbought
+
+            _, _, returns, open_entry = simulate_long_only(close, entry, exit_, stop_distance,
+                                                           np.inf, np.inf)
+            equity = 1.0
+            wins = 0
+            for r in returns:
+                equity *= 1.0 + position_size * r
+                if r > 0:
+                    wins += 1
+            # 期末未平仓的持仓按最后收盘价计入收益率(不计入交易次数)
+            if open_entry >= 0:
+                equity *= 1.0 + position_size * (close[n - 1] / close[open_entry] - 1.0)
+            results[i, j, 0] = (equity - 1.0) * 100
+            results[i, j, 1] = returns.shape[0]
+            if returns.shape[0] > 0:
+                results[i, j, 2] = wins / returns.shape[0] * 100
+
+    return results
+
+
+@njit('i1[::1](f8, f8[::1], f8[::1], b1[::1], b1)', cache=True)
+def grid_actions(price, neg_buy_thresholds, sell_levels, filled, can_buy):
+    """
+    网格策略单根K线的下单动作(ImprovedGridStrategy), 一次遍历全部网格
+
+    - 买入: 未持仓, can_buy为真, 且价格不高于 买入价位*1.002
+      (neg_buy_thresholds为该阈值取负, 即 -price >= neg_buy_thresholds[k])
+    - 卖出: 已持仓且价格不低于卖出价位
+
+    返回:
+    - actions: int8数组, 1为买入, -1为卖出, 0为不动作
+    """
+    n = filled.shape[0]
+    actions = np.zeros(n, dtype=np.int8)
+    neg_price = -price
+    for k in range(n):
+        if filled[k]:
+            if price >= sell_levels[k]:
+                actions[k] = -1
+        elif can_buy and neg_buy_thresholds[k] <= neg_price:
+            actions[k] = 1
+    return actions
+
+
+@njit('Tuple((f8[::1], f8, f8))(f8[::1])', cache=True)
+def equity_curve_stats(values):
+    """
+    账户价值序列的风险统计(PerformanceAnalyzer), 融合为两次遍历且不生成收益率数组
+
+    第一遍计算滚动峰值、回撤与日收益率均值, 第二遍计算日收益率的总体标准差
+    (与np.std(np.diff(values) / values[:-1])一致)。
+
+    返回:
+    - (drawdown, return_std, max_drawdown): drawdown为各K线相对此前峰值的回撤(<=0),
+      不足两个值时return_std为0
+    """
+    n = values.shape[0]
+    drawdown = np.empty(n)
+    peak = -np.inf
+    max_drawdown = 0.0
+    total = 0.0
+    for i in range(n):
+        value = values[i]
+        if value > peak:
+            peak = value
+        drawdown[i] = (value - peak) / peak
+        if drawdown[i] < max_drawdown:
+            max_drawdown = drawdown[i]
+        if i > 0:
+            total += (value - values[i - 1]) / values[i - 1]
+
+    if n < 2:
+        return drawdown, 0.0, max_drawdown
+
+    mean = total / (n - 1)
+    squares = 0.0
+    for i in range(1, n):
+        deviation = (values[i] - values[i - 1]) / values[i - 1] - mean
+        squares += deviation * deviation
+    return drawdown, np.sqrt(squares / (n - 1)), max_drawdown
+
+
+def warm_up():
+    """
+    预先编译未声明签名的内核并写入磁盘缓存(cache=True)
+
+    声明了签名的内核在导入时即编译; 其余内核(状态机、参数扫描等)在首次调用时
+    才按实参类型编译, 需要数秒。此函数以小数组按实际调用时的类型各调用一次,
+    之后的进程(包括多进程回测的子进程)直接从缓存加载。未安装numba时无操作。
+
+    命令行: python src/strategies/_kernels.py
+    """
+    if not NUMBA_AVAILABLE:
+        return
+
+    n = 64
+    close = 100.0 + np.sin(np.arange(n, dtype=np.float64))
+    signal = np.zeros(n, dtype=np.bool_)
+
+    simulate_long_only(close, signal, signal, np.full(n, np.inf), np.inf, np.inf)
+    final_value(close, signal, signal, np.inf, np.inf, 10000.0, 0.001, 0.95)
+    run_rsi(close, 14, 30.0, 70.0, 0.05, 0.1, 0.95, 10000.0)
+    rsi_matrix(np.asfortranarray(np.column_stack((close, close))), 14)
+    sweep_momentum(close, close, close, np.array([[10.0, 20.0, 0.02, 1.5, 0.05, 0.1]]),
+                   75.0, 10000.0, 0.001, 0.95)
+    sweep_bollinger(close, close, np.full(n, np.inf), np.array([20], dtype=np.int64),
+                    np.array([2.0]), 30.0, 70.0, 0.95)
+
+
+def warm_up_in_subprocess():
+    """
+    在独立的Python进程中运行warm_up()
+
+    warm_up()会执行parallel=True的内核(rsi_matrix、sweep_momentum等), 从而启动
+    numba的线程层; TBB线程层不是fork安全的, 之后fork出的进程池子进程会使解释器
+    退出时挂起。创建进程池前预编译内核应使用此函数: 编译结果同样写入磁盘缓存,
+    而主进程不启动线程层。未安装numba时无操作。
+    """
+    if not NUMBA_AVAILABLE:
+        return
+    subprocess.run([sys.executable, os.path.abspath(__file__)], check=False)
+
+
+if __name__ == '__main__':
+    warm_up()
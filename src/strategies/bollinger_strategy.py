@@ -1,5 +1,12 @@
 import backtrader as bt
 import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.trade_buffer import TradeRecordBuffer
 
 
 class BollingerBandsStrategy(bt.Strategy):
@@ -53,7 +60,7 @@ class BollingerBandsStrategy(bt.Strategy):
         self.buy_comm = None
         
         # 性能跟踪
-        self.trades = []
+        self.trades = TradeRecordBuffer()
         self.signals = []
         
         # 可视化数据收集
@@ -116,12 +123,7 @@ class BollingerBandsStrategy(bt.Strategy):
         
         self.log(f'交易盈亏: {profit_loss:.2f} ({profit_pct:.2f}%)')
         
-        self.trades.append({
-            'date': self.datas[0].datetime.date(0),
-            'pnl': profit_loss,
-            'pnl_pct': profit_pct,
-            'price': trade.price
-        })
+        self.trades.append(self.datas[0].datetime.date(0), profit_loss, profit_pct, trade.price)
     
     def check_volume_condition(self):
         """检查成交量条件"""
@@ -270,11 +272,11 @@ class BollingerBandsStrategy(bt.Strategy):
     def stop(self):
         """策略结束时的统计"""
         if self.params.print_log and self.trades:
-            trades_df = pd.DataFrame(self.trades)
+            trades = self.trades.values
             signals_df = pd.DataFrame(self.signals)
             
-            win_rate = len(trades_df[trades_df['pnl'] > 0]) / len(trades_df)
-            avg_return = trades_df['pnl_pct'].mean()
+            win_rate = np.count_nonzero(trades['pnl'] > 0) / len(trades)
+            avg_return = trades['pnl_pct'].mean()
             
             # 布林带统计
             avg_bb_width = signals_df['bb_width'].mean()
@@ -282,7 +284,7 @@ class BollingerBandsStrategy(bt.Strategy):
             self.log('='*50)
             self.log(f'策略统计 (布林带{self.params.bb_period}周期, {self.params.bb_dev}倍标准差):')
             self.log(f'策略类型: {self.params.strategy_type}')
-            self.log(f'总交易次数: {len(trades_df)}')
+            self.log(f'总交易次数: {len(trades)}')
             self.log(f'胜率: {win_rate:.2%}')
             self.log(f'平均收益率: {avg_return:.2f}%')
             self.log(f'平均布林带宽度: {avg_bb_width:.4f}')
@@ -1,5 +1,11 @@
 import backtrader as bt
 import pandas as pd
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.trade_buffer import TradeRecordBuffer
 
 
 class BTCGridTradingStrategy(bt.Strategy):
@@ -32,14 +38,14 @@ class BTCGridTradingStrategy(bt.Strategy):
             self.atr = bt.indicators.ATR(self.data, period=14)
         
         # 网格状态跟踪
-        self.grid_levels_dict = {}  # {price_level: {'bought': bool, 'size': float, 'order_id': str}}
+        self.grid_levels_dict = {}  # {整数价位: {'price': float, 'size': float, 'order_ref': int}}
         self.active_orders = {}     # {order_id: order_object}
         self.total_position = 0.0   # 总持仓
         self.avg_buy_price = 0.0    # 平均买入价
         self.initial_cash = None    # 初始资金
         
         # 性能跟踪
-        self.trades = []
+        self.trades = TradeRecordBuffer()
         self.grid_transactions = []
         
     def log(self, txt, dt=None):
@@ -138,12 +144,7 @@ class BTCGridTradingStrategy(bt.Strategy):
         
         self.log(f'网格交易盈亏: {profit_loss:.2f} ({profit_pct:.2f}%)')
         
-        self.trades.append({
-            'date': self.datas[0].datetime.date(0),
-            'pnl': profit_loss,
-            'pnl_pct': profit_pct,
-            'price': trade.price
-        })
+        self.trades.append(self.datas[0].datetime.date(0), profit_loss, profit_pct, trade.price)
     
     def next(self):
         """策略主逻辑"""
@@ -177,7 +178,7 @@ class BTCGridTradingStrategy(bt.Strategy):
                 closest_levels.append(level)
         
         for i, level in enumerate(closest_levels):
-            level_key = f"level_{level:.0f}"
+            level_key = round(level)  # 整数价位作为键, 取整方式与"%.0f"格式化相同
             
             # 买入条件：价格接近或低于网格水平，且未持有该水平
             if (current_price <= level * 1.005 and  # 允许0.5%的价格偏差
@@ -350,7 +351,7 @@ class DynamicBTCGridStrategy(BTCGridTradingStrategy):
                 closest_levels.append(level)
         
         for level in closest_levels:
-            level_key = f"level_{level:.0f}"
+            level_key = round(level)  # 整数价位作为键, 取整方式与"%.0f"格式化相同
             
             # 动态买入判断
             if (self.should_buy(current_price, level) and
@@ -2,12 +2,24 @@ import backtrader as bt
 import pandas as pd
 import sys
 import os
+from dataclasses import dataclass, asdict
+from datetime import date
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.enhanced_visualization import EnhancedStrategyMixin
 
 
+@dataclass(slots=True, frozen=True)
+class TradePoint:
+    """买卖点记录(使用__slots__避免每笔订单分配字典)"""
+    date: date
+    type: str
+    price: float
+    size: float
+    commission: float
+
+
 class EnhancedBollingerBandsStrategy(bt.Strategy, EnhancedStrategyMixin):
     """
     增强版布林带策略 - 集成Backtrader原生绘图和自定义可视化
@@ -16,6 +28,11 @@ class EnhancedBollingerBandsStrategy(bt.Strategy, EnhancedStrategyMixin):
     - 价格突破布林带上轨: 买入信号(突破策略)
     - 价格跌破布林带下轨: 卖出信号
     - 集成增强的可视化功能
+    
+    record_level:
+    - 'full': 记录交易统计及全部可视化数据(默认)
+    - 'stats': 仅记录交易数据, 适用于参数扫描
+    - 'none': 不记录任何数据
     """
     
     params = (
@@ -28,6 +45,7 @@ class EnhancedBollingerBandsStrategy(bt.Strategy, EnhancedStrategyMixin):
         ('take_profit', 0.12),    # 止盈比例
         ('position_size', 0.95),  # 仓位大小比例
         ('print_log', True),      # 是否打印日志
+        ('record_level', 'full'), # 数据记录级别: 'none' | 'stats' | 'full'
     )
     
     def __init__(self):
@@ -134,6 +152,16 @@ class EnhancedBollingerBandsStrategy(bt.Strategy, EnhancedStrategyMixin):
         self.buy_price = None
         self.buy_comm = None
         
+        # 策略类型在回测期间不变, 预先绑定对应的交易逻辑
+        if self.params.strategy_type == 'breakout':
+            self._trade_logic = self._breakout_logic
+        else:  # mean_reversion
+            self._trade_logic = self._mean_reversion_logic
+        
+        # 数据记录级别: 'stats'只记录交易统计, 'full'额外记录可视化数据
+        self._record_stats = self.params.record_level in ('stats', 'full')
+        self._record_full = self.params.record_level == 'full'
+        
         # 性能跟踪
         self.trades = []
         self.signals = []
@@ -163,20 +191,14 @@ class EnhancedBollingerBandsStrategy(bt.Strategy, EnhancedStrategyMixin):
                 self.buy_comm = order.executed.comm
                 
                 # 记录买点
-                self.trade_points.append({
-                    'date': self.datas[0].datetime.date(0),
-                    'type': 'buy',
-                    'price': order.executed.price,
-                    'size': order.executed.size,
-                    'commission': order.executed.comm
-                })
-                self.visualization_data['trade_points'].append({
-                    'date': self.datas[0].datetime.date(0),
-                    'type': 'buy',
-                    'price': order.executed.price,
-                    'size': order.executed.size,
-                    'commission': order.executed.comm
-                })
+                if self._record_full:
+                    trade_point = TradePoint(
+                        self.datas[0].datetime.date(0), 'buy',
+                        order.executed.price, order.executed.size,
+                        order.executed.comm
+                    )
+                    self.trade_points.append(trade_point)
+                    self.visualization_data['trade_points'].append(trade_point)
                 
             elif order.issell():
                 self.log(f'卖出执行: 价格 {order.executed.price:.2f}, '
@@ -184,20 +206,14 @@ class EnhancedBollingerBandsStrategy(bt.Strategy, EnhancedStrategyMixin):
                         f'手续费 {order.executed.comm:.2f}')
                 
                 # 记录卖点
-                self.trade_points.append({
-                    'date': self.datas[0].datetime.date(0),
-                    'type': 'sell', 
-                    'price': order.executed.price,
-                    'size': order.executed.size,
-                    'commission': order.executed.comm
-                })
-                self.visualization_data['trade_points'].append({
-                    'date': self.datas[0].datetime.date(0),
-                    'type': 'sell', 
-                    'price': order.executed.price,
-                    'size': order.executed.size,
-                    'commission': order.executed.comm
-                })
+                if self._record_full:
+                    trade_point = TradePoint(
+                        self.datas[0].datetime.date(0), 'sell',
+                        order.executed.price, order.executed.size,
+                        order.executed.comm
+                    )
+                    self.trade_points.append(trade_point)
+                    self.visualization_data['trade_points'].append(trade_point)
                 
         elif order.status in [order.Canceled, order.Margin, order.Rejected]:
             self.log('订单被取消/拒绝')
@@ -215,6 +231,9 @@ class EnhancedBollingerBandsStrategy(bt.Strategy, EnhancedStrategyMixin):
         self.log(f'交易盈亏: {profit_loss:.2f} ({profit_pct:.2f}%)')
         
         # 记录交易数据
+        if not self._record_stats:
+            return
+        
         trade_data = {
             'date': self.datas[0].datetime.date(0),
             'pnl': profit_loss,
@@ -222,7 +241,8 @@ class EnhancedBollingerBandsStrategy(bt.Strategy, EnhancedStrategyMixin):
             'price': trade.price
         }
         self.trades.append(trade_data)
-        self.visualization_data['trades'].append(trade_data)
+        if self._record_full:
+            self.visualization_data['trades'].append(trade_data)
     
     def check_volume_condition(self):
         """检查成交量条件"""
@@ -234,15 +254,36 @@ class EnhancedBollingerBandsStrategy(bt.Strategy, EnhancedStrategyMixin):
         
         return current_volume >= (avg_volume * self.params.volume_threshold)
     
+    def start(self):
+        """回测开始前缓存布林带底层数组(缓冲区此时已由Cerebro配置完成)"""
+        self._bb_top_arr = self.bb_top.array
+        self._bb_mid_arr = self.bb_mid.array
+        self._bb_bot_arr = self.bb_bot.array
+    
     def next(self):
         """策略主逻辑"""
         current_price = self.data.close[0]
-        bb_top = self.bb_top[0]
-        bb_mid = self.bb_mid[0]
-        bb_bot = self.bb_bot[0]
+        # 三条轨道同属一个指标, 共用同一索引, 直接读取数组避免LineBuffer.__getitem__开销
+        idx = self.bb_top.idx
+        bb_top = self._bb_top_arr[idx]
+        bb_mid = self._bb_mid_arr[idx]
+        bb_bot = self._bb_bot_arr[idx]
         bb_width = (bb_top - bb_bot) / bb_mid
         bb_pos = (current_price - bb_bot) / (bb_top - bb_bot)
         
+        # 记录可视化数据(参数扫描时可通过record_level关闭)
+        if self._record_full:
+            self._record_bar(current_price, bb_top, bb_mid, bb_bot, bb_width, bb_pos)
+        
+        # 如果有挂单，等待执行
+        if self.order:
+            return
+        
+        # 策略逻辑
+        self._trade_logic(current_price, bb_top, bb_bot, bb_pos)
+    
+    def _record_bar(self, current_price, bb_top, bb_mid, bb_bot, bb_width, bb_pos):
+        """记录单根K线的信号、指标和组合价值数据"""
         # 记录信号数据
         signal_data = {
             'date': self.datas[0].datetime.date(0),
@@ -271,7 +312,7 @@ class EnhancedBollingerBandsStrategy(bt.Strategy, EnhancedStrategyMixin):
             'High': self.data.high[0], 
             'Low': self.data.low[0],
             'Close': current_price,
-            'Volume': self.data.volume[0] if hasattr(self.data, 'volume') else 0,
+            'Volume': self._get_volume(),
             'bb_upper': bb_top,
             'bb_middle': bb_mid,
             'bb_lower': bb_bot,
@@ -286,16 +327,6 @@ class EnhancedBollingerBandsStrategy(bt.Strategy, EnhancedStrategyMixin):
             'cash': self.broker.getcash(),
             'position_value': self.broker.getvalue() - self.broker.getcash()
         })
-        
-        # 如果有挂单，等待执行
-        if self.order:
-            return
-        
-        # 策略逻辑
-        if self.params.strategy_type == 'breakout':
-            self._breakout_logic(current_price, bb_top, bb_bot, bb_pos)
-        else:  # mean_reversion
-            self._mean_reversion_logic(current_price, bb_top, bb_bot, bb_pos)
     
     def _breakout_logic(self, current_price, bb_top, bb_bot, bb_pos):
         """突破策略逻辑"""
@@ -370,7 +401,7 @@ class EnhancedBollingerBandsStrategy(bt.Strategy, EnhancedStrategyMixin):
         """获取可视化所需的数据(兼容旧接口)"""
         return {
             'indicator_data': pd.DataFrame(self.indicator_data),
-            'trade_points': self.trade_points,
+            'trade_points': [asdict(point) for point in self.trade_points],
             'portfolio_values': pd.DataFrame(self.portfolio_values),
             'trades': self.trades,
             'signals': pd.DataFrame(self.signals)
@@ -382,7 +413,8 @@ class EnhancedBollingerBandsStrategy(bt.Strategy, EnhancedStrategyMixin):
             trades_df = pd.DataFrame(self.trades)
             win_rate = len(trades_df[trades_df['pnl'] > 0]) / len(trades_df)
             avg_return = trades_df['pnl_pct'].mean()
-            avg_bb_width = pd.DataFrame(self.signals)['bb_width'].mean()
+            avg_bb_width = (pd.DataFrame(self.signals)['bb_width'].mean()
+                            if self.signals else float('nan'))
             
             self.log('='*50)
             self.log(f'策略统计 (布林带{self.params.bb_period}周期, '
@@ -1,5 +1,12 @@
 import backtrader as bt
 import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.trade_buffer import TradeRecordBuffer
 
 
 class MACDMomentumStrategy(bt.Strategy):
@@ -35,6 +42,7 @@ class MACDMomentumStrategy(bt.Strategy):
         # MACD组件
         self.macd_line = self.macd.macd
         self.signal_line = self.macd.signal
+        # 柱状图即MACD线与信号线的差值, 同时用于过滤弱交叉信号
         self.histogram = self.macd.histo if hasattr(self.macd, 'histo') else (self.macd_line - self.signal_line)
         
         # 交叉信号
@@ -46,7 +54,7 @@ class MACDMomentumStrategy(bt.Strategy):
         self.buy_comm = None
         
         # 性能跟踪
-        self.trades = []
+        self.trades = TradeRecordBuffer()
         self.signals = []
         
         # 可视化数据收集
@@ -112,12 +120,7 @@ class MACDMomentumStrategy(bt.Strategy):
         self.log(f'交易盈亏: {profit_loss:.2f} ({profit_pct:.2f}%)')
         
         # 记录交易数据
-        self.trades.append({
-            'date': self.datas[0].datetime.date(0),
-            'pnl': profit_loss,
-            'pnl_pct': profit_pct,
-            'price': trade.price
-        })
+        self.trades.append(self.datas[0].datetime.date(0), profit_loss, profit_pct, trade.price)
     
     def next(self):
         """策略主逻辑"""
@@ -163,12 +166,13 @@ class MACDMomentumStrategy(bt.Strategy):
         if self.order:
             return
         
+        # MACD差值是否足够大(买卖分支共用)
+        macd_diff_ok = abs(histogram_val) > self.params.min_macd_diff
+        
         # 买入条件：MACD金叉 + 额外确认条件
         if not self.position and crossover > 0:
             # 确认信号强度
-            macd_diff = abs(macd_val - signal_val)
-            
-            if (macd_diff > self.params.min_macd_diff and  # MACD差值足够大
+            if (macd_diff_ok and  # MACD差值足够大
                 histogram_val > histogram_val or True):    # 柱状图增长(或忽略此条件)
                 
                 # 计算买入数量
@@ -187,8 +191,7 @@ class MACDMomentumStrategy(bt.Strategy):
                 
                 # MACD死叉信号
                 if crossover < 0:
-                    macd_diff = abs(macd_val - signal_val)
-                    if macd_diff > self.params.min_macd_diff:
+                    if macd_diff_ok:
                         self.log(f'卖出信号(MACD死叉): MACD={macd_val:.4f}, '
                                 f'信号线={signal_val:.4f}, 价格={current_price:.2f}')
                         self.order = self.sell(size=self.position.size)
@@ -216,11 +219,11 @@ class MACDMomentumStrategy(bt.Strategy):
     def stop(self):
         """策略结束时的统计"""
         if self.params.print_log and self.trades:
-            trades_df = pd.DataFrame(self.trades)
+            trades = self.trades.values
             signals_df = pd.DataFrame(self.signals)
             
-            win_rate = len(trades_df[trades_df['pnl'] > 0]) / len(trades_df)
-            avg_return = trades_df['pnl_pct'].mean()
+            win_rate = np.count_nonzero(trades['pnl'] > 0) / len(trades)
+            avg_return = trades['pnl_pct'].mean()
             
             # 信号统计
             buy_signals = len(signals_df[signals_df['crossover'] > 0])
@@ -228,7 +231,7 @@ class MACDMomentumStrategy(bt.Strategy):
             
             self.log('='*50)
             self.log(f'策略统计 (MACD {self.params.fast_period}-{self.params.slow_period}-{self.params.signal_period}):')
-            self.log(f'总交易次数: {len(trades_df)}')
+            self.log(f'总交易次数: {len(trades)}')
             self.log(f'胜率: {win_rate:.2%}')
             self.log(f'平均收益率: {avg_return:.2f}%')
             self.log(f'买入信号数: {buy_signals}')
@@ -276,7 +279,6 @@ class AdvancedMACDStrategy(MACDMomentumStrategy):
         """增强版策略主逻辑"""
         current_price = self.data.close[0]
         macd_val = self.macd_line[0]
-        signal_val = self.signal_line[0]
         crossover = self.macd_crossover[0]
         rsi_val = self.rsi[0]
         ema_val = self.ema[0]
@@ -285,11 +287,14 @@ class AdvancedMACDStrategy(MACDMomentumStrategy):
         if self.order:
             return
         
+        # MACD差值是否足够大(买卖分支共用)
+        macd_diff_ok = abs(self.histogram[0]) > self.params.min_macd_diff
+        
         # 买入条件：MACD金叉 + RSI不超买 + 价格在EMA之上
         if not self.position and crossover > 0:
             if (rsi_val < self.params.rsi_overbought and 
                 current_price > ema_val and
-                abs(macd_val - signal_val) > self.params.min_macd_diff):
+                macd_diff_ok):
                 
                 available_cash = self.broker.getcash()
                 size = (available_cash * self.params.position_size) / current_price
@@ -320,7 +325,7 @@ class AdvancedMACDStrategy(MACDMomentumStrategy):
             
             # MACD死叉 + RSI超买
             if (crossover < 0 and rsi_val > self.params.rsi_overbought and
-                abs(macd_val - signal_val) > self.params.min_macd_diff):
+                macd_diff_ok):
                 sell_signal = True
                 sell_reason = "MACD死叉+RSI超买"
             
@@ -7,6 +7,68 @@
 import backtrader as bt
 import pandas as pd
 import numpy as np
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.vectorized_backtest import strategy_params, simulate_signals
+from utils.trade_buffer import ReturnBuffer
+from strategies._kernels import (NDArrayOHLCV, rsi_wilder, rolling_zscore,
+                                 stoch_williams, confirmation_signals, sweep_bollinger,
+                                 rolling_mean_std, atr_wilder)
+from strategies._cache import precomputed
+
+
+def backtest_bollinger_vectorized(close, high, low, params=None):
+    """
+    BollingerMeanReversionStrategy的向量化回测
+    
+    一次性计算布林带/RSI/ATR数组生成信号, 再由编译的单仓位状态机一次遍历
+    得到全部交易, 适用于参数扫描。以信号K线收盘价成交, 不含手续费。
+    
+    参数:
+    - close, high, low: 价格数组
+    - params: 覆盖BollingerMeanReversionStrategy默认参数的字典
+    
+    返回:
+    - dict: trades(每笔收益率%), entries/exits(K线索引), total_return(复利收益率%)
+    """
+    ohlcv = NDArrayOHLCV(open=None,
+                         high=np.ascontiguousarray(high, dtype=np.float64),
+                         low=np.ascontiguousarray(low, dtype=np.float64),
+                         close=np.ascontiguousarray(close, dtype=np.float64),
+                         volume=None)
+    p = strategy_params(BollingerMeanReversionStrategy, params)
+    signals = BollingerMeanReversionStrategy.vectorized_signals(ohlcv, p)
+    return simulate_signals(ohlcv.close, signals, p['position_size'])
+
+
+def sweep_bollinger_vectorized(close, high, low, bb_periods, bb_devs, params=None):
+    """
+    BollingerMeanReversionStrategy的bb_period × bb_dev并行网格扫描
+    
+    RSI/ATR与扫描维度无关, 只计算一次; 网格在编译内核中按周期多线程并行,
+    不经过Cerebro。成交假设与backtest_bollinger_vectorized相同。
+    
+    参数:
+    - close, high, low: 价格数组
+    - bb_periods, bb_devs: 扫描的布林带周期与标准差倍数
+    - params: 覆盖其余默认参数的字典
+    
+    返回:
+    - ndarray (len(bb_periods), len(bb_devs), 3): 总收益率%, 交易次数, 胜率%
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    p = strategy_params(BollingerMeanReversionStrategy, params)
+    rsi = rsi_wilder(close, int(p['rsi_period']))
+    atr = atr_wilder(np.ascontiguousarray(high, dtype=np.float64),
+                     np.ascontiguousarray(low, dtype=np.float64), close, int(p['atr_period']))
+    return sweep_bollinger(close, rsi, np.ascontiguousarray(atr * p['atr_multiplier']),
+                           np.asarray(bb_periods, dtype=np.int64),
+                           np.asarray(bb_devs, dtype=np.float64),
+                           float(p['rsi_oversold']), float(p['rsi_overbought']),
+                           float(p['position_size']))
 
 
 class BollingerMeanReversionStrategy(bt.Strategy):
@@ -37,12 +99,35 @@ class BollingerMeanReversionStrategy(bt.Strategy):
             period=self.params.bb_period,
             devfactor=self.params.bb_dev
         )
-        self.rsi = bt.indicators.RSI(self.data.close, period=self.params.rsi_period)
+        # RSI一次性预计算, next()中按索引读取
+        self._rsi = precomputed(self.data).rsi(self.params.rsi_period)
         self.atr = bt.indicators.ATR(self.data, period=self.params.atr_period)
         
+        # 缓存next()中使用的参数和出场阈值, 避免每根K线的参数查找
+        self._bb_period = self.params.bb_period
+        self._rsi_oversold = self.params.rsi_oversold
+        self._rsi_overbought = self.params.rsi_overbought
+        self._atr_multiplier = self.params.atr_multiplier
+        self._position_size = self.params.position_size
+        
         self.order = None
         self.buy_price = None
-        self.trades = []
+        self.trades = ReturnBuffer()
+    
+    @classmethod
+    def vectorized_signals(cls, ohlcv, p):
+        """向量化入场/出场信号(供VectorizedBacktester使用)"""
+        close = ohlcv.close
+        # 与sweep_bollinger使用同一布林带内核(总体标准差, 与bt.indicators.BollingerBands一致)
+        mid, std = rolling_mean_std(close, int(p['bb_period']))
+        band = p['bb_dev'] * std
+        rsi = rsi_wilder(close, int(p['rsi_period']))
+        atr = atr_wilder(ohlcv.high, ohlcv.low, close, int(p['atr_period']))
+        return {
+            'entry': (close <= (mid - band) * 1.005) & (rsi < p['rsi_oversold']),
+            'exit': (close >= (mid + band) * 0.995) & (rsi > p['rsi_overbought']),
+            'stop_distance': atr * p['atr_multiplier'],
+        }
     
     def log(self, txt, dt=None):
         if self.params.print_log:
@@ -62,20 +147,20 @@ class BollingerMeanReversionStrategy(bt.Strategy):
         self.order = None
     
     def next(self):
-        if self.order or len(self.bb) < self.params.bb_period:
+        if self.order or len(self.bb) < self._bb_period:
             return
             
         current_price = self.data.close[0]
         bb_lower = self.bb.bot[0]
         bb_upper = self.bb.top[0]
-        rsi_val = self.rsi[0]
+        rsi_val = self._rsi[len(self) - 1]
         
         # 触及下轨 + RSI超卖确认买入
         if (not self.position and 
             current_price <= bb_lower * 1.005 and
-            rsi_val < self.params.rsi_oversold):
+            rsi_val < self._rsi_oversold):
             
-            size = (self.broker.getcash() * self.params.position_size) / current_price
+            size = (self.broker.getcash() * self._position_size) / current_price
             self.order = self.buy(size=size)
         
         # 出场条件
@@ -83,17 +168,18 @@ class BollingerMeanReversionStrategy(bt.Strategy):
             return_pct = (current_price - self.buy_price) / self.buy_price
             
             # 触及上轨 + RSI超买 或 ATR止损
-            atr_stop = (self.atr[0] * self.params.atr_multiplier) / self.buy_price if len(self.atr) > 0 else 0.08
+            atr_stop = (self.atr[0] * self._atr_multiplier) / self.buy_price if len(self.atr) > 0 else 0.08
             
-            if ((current_price >= bb_upper * 0.995 and rsi_val > self.params.rsi_overbought) or
+            if ((current_price >= bb_upper * 0.995 and rsi_val > self._rsi_overbought) or
                 return_pct < -atr_stop):
                 
                 self.order = self.sell(size=self.position.size)
     
     def stop(self):
         if self.params.print_log and self.trades:
-            win_rate = len([t for t in self.trades if t > 0]) / len(self.trades)
-            avg_return = sum(self.trades) / len(self.trades)
+            returns = self.trades.values
+            win_rate = (returns > 0).mean()
+            avg_return = returns.mean()
             self.log(f'增强布林带策略 - 交易: {len(self.trades)}, 胜率: {win_rate:.2%}, 平均收益: {avg_return:.2f}%')
 
 
@@ -117,12 +203,34 @@ class ZScoreMeanReversionStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        self.price_sma = bt.indicators.SMA(self.data.close, period=self.params.lookback_period)
-        self.price_std = bt.indicators.StdDev(self.data.close, period=self.params.lookback_period)
+        # Z-Score一次性预计算(滚动均值/标准差O(1)更新)
+        indicators = precomputed(self.data)
+        lookback_period = self.params.lookback_period
+        self._zscore = indicators.get(
+            ('zscore', lookback_period),
+            lambda: rolling_zscore(indicators.ohlcv.close, lookback_period)
+        )
+        
+        # 缓存next()中使用的参数和出场阈值, 避免每根K线的参数查找
+        self._lookback_period = self.params.lookback_period
+        self._entry_zscore = self.params.entry_zscore
+        self._exit_zscore = self.params.exit_zscore * 0.5
+        self._stop_loss = self.params.stop_loss
+        self._position_size = self.params.position_size
         
         self.order = None
         self.buy_price = None
-        self.trades = []
+        self.trades = ReturnBuffer()
+    
+    @classmethod
+    def vectorized_signals(cls, ohlcv, p):
+        """向量化入场/出场信号(供VectorizedBacktester使用)"""
+        zscore = rolling_zscore(ohlcv.close, p['lookback_period'])
+        return {
+            'entry': zscore < p['entry_zscore'],
+            'exit': zscore > p['exit_zscore'] * 0.5,
+            'stop_loss': p['stop_loss'],
+        }
     
     def log(self, txt, dt=None):
         if self.params.print_log:
@@ -142,29 +250,19 @@ class ZScoreMeanReversionStrategy(bt.Strategy):
         self.order = None
     
     def calculate_zscore(self):
-        """计算当前价格的Z-Score"""
-        if len(self.price_sma) == 0 or len(self.price_std) == 0:
-            return 0
-        
-        current_price = self.data.close[0]
-        mean_price = self.price_sma[0]
-        std_price = self.price_std[0]
-        
-        if std_price == 0:
-            return 0
-        
-        return (current_price - mean_price) / std_price
+        """获取当前价格的Z-Score"""
+        return self._zscore[len(self) - 1]
     
     def next(self):
-        if self.order or len(self.price_sma) < self.params.lookback_period:
+        if self.order or len(self) < self._lookback_period:
             return
             
         current_price = self.data.close[0]
         zscore = self.calculate_zscore()
         
         # Z-Score过低买入（价格被低估）
-        if not self.position and zscore < self.params.entry_zscore:
-            size = (self.broker.getcash() * self.params.position_size) / current_price
+        if not self.position and zscore < self._entry_zscore:
+            size = (self.broker.getcash() * self._position_size) / current_price
             self.order = self.buy(size=size)
         
         # 出场条件
@@ -172,13 +270,14 @@ class ZScoreMeanReversionStrategy(bt.Strategy):
             return_pct = (current_price - self.buy_price) / self.buy_price
             
             # Z-Score回归正常区间或止损
-            if zscore > self.params.exit_zscore * 0.5 or return_pct < -self.params.stop_loss:
+            if zscore > self._exit_zscore or return_pct < -self._stop_loss:
                 self.order = self.sell(size=self.position.size)
     
     def stop(self):
         if self.params.print_log and self.trades:
-            win_rate = len([t for t in self.trades if t > 0]) / len(self.trades)
-            avg_return = sum(self.trades) / len(self.trades)
+            returns = self.trades.values
+            win_rate = (returns > 0).mean()
+            avg_return = returns.mean()
             self.log(f'Z-Score策略 - 交易: {len(self.trades)}, 胜率: {win_rate:.2%}, 平均收益: {avg_return:.2f}%')
 
 
@@ -206,13 +305,55 @@ class OverboughtOversoldStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        self.rsi = bt.indicators.RSI(self.data.close, period=self.params.rsi_period)
-        self.stoch = bt.indicators.Stochastic(self.data, period=self.params.stoch_period)
-        self.williams = bt.indicators.WilliamsR(self.data, period=self.params.williams_period)
+        indicators = precomputed(self.data)
+        ohlcv = indicators.ohlcv
+        stoch_period = self.params.stoch_period
+        williams_period = self.params.williams_period
+        
+        # 三个指标一次性预计算, 并查表得到多指标确认的买入/卖出信号
+        self._rsi = indicators.rsi(self.params.rsi_period)
+        self._stoch_k, self._williams = indicators.get(
+            ('stoch_williams', stoch_period, williams_period),
+            lambda: stoch_williams(ohlcv.high, ohlcv.low, ohlcv.close,
+                                   stoch_period, williams_period, 3)
+        )
+        self._oversold_signal, self._overbought_signal = confirmation_signals(
+            self._rsi, self._stoch_k, self._williams,
+            self.params.oversold_threshold, self.params.overbought_threshold,
+            self.params.confirmation_count
+        )
+        
+        # 与原bt指标的最小周期一致(Stochastic的%D需要period+4根K线)
+        self._warmup = max(self.params.rsi_period + 1,
+                           self.params.stoch_period + 4,
+                           self.params.williams_period)
+        
+        # 缓存next()中使用的参数和出场阈值, 避免每根K线的参数查找
+        self._stop_loss = self.params.stop_loss
+        self._take_profit = self.params.take_profit
+        self._position_size = self.params.position_size
         
         self.order = None
         self.buy_price = None
-        self.trades = []
+        self.trades = ReturnBuffer()
+    
+    @classmethod
+    def vectorized_signals(cls, ohlcv, p):
+        """向量化入场/出场信号(供VectorizedBacktester使用)"""
+        close = ohlcv.close
+        stoch_k, williams = stoch_williams(ohlcv.high, ohlcv.low, close,
+                                           p['stoch_period'], p['williams_period'], 3)
+        oversold_signal, overbought_signal = confirmation_signals(
+            rsi_wilder(close, int(p['rsi_period'])), stoch_k, williams,
+            p['oversold_threshold'], p['overbought_threshold'], p['confirmation_count']
+        )
+        return {
+            'entry': oversold_signal,
+            'exit': overbought_signal,
+            'warmup': max(p['rsi_period'] + 1, p['stoch_period'] + 4, p['williams_period']),
+            'stop_loss': p['stop_loss'],
+            'take_profit': p['take_profit'],
+        }
     
     def log(self, txt, dt=None):
         if self.params.print_log:
@@ -231,51 +372,16 @@ class OverboughtOversoldStrategy(bt.Strategy):
                     self.log(f'多指标卖出: {order.executed.price:.2f}, 收益: {profit_pct:.2f}%')
         self.order = None
     
-    def count_oversold_signals(self):
-        """统计超卖信号数量"""
-        signals = 0
-        
-        if len(self.rsi) > 0 and self.rsi[0] < self.params.oversold_threshold:
-            signals += 1
-            
-        if len(self.stoch) > 0 and self.stoch.percK[0] < self.params.oversold_threshold:
-            signals += 1
-            
-        if len(self.williams) > 0 and self.williams[0] < -100 + self.params.oversold_threshold:
-            signals += 1
-            
-        return signals
-    
-    def count_overbought_signals(self):
-        """统计超买信号数量"""
-        signals = 0
-        
-        if len(self.rsi) > 0 and self.rsi[0] > self.params.overbought_threshold:
-            signals += 1
-            
-        if len(self.stoch) > 0 and self.stoch.percK[0] > self.params.overbought_threshold:
-            signals += 1
-            
-        if len(self.williams) > 0 and self.williams[0] > -100 + self.params.overbought_threshold:
-            signals += 1
-            
-        return signals
-    
     def next(self):
-        if self.order:
-            return
-            
-        min_periods = max(self.params.rsi_period, self.params.stoch_period, self.params.williams_period)
-        if len(self.data) < min_periods:
+        if self.order or len(self) < self._warmup:
             return
             
         current_price = self.data.close[0]
-        oversold_count = self.count_oversold_signals()
-        overbought_count = self.count_overbought_signals()
+        i = len(self) - 1
         
         # 多指标超卖买入
-        if not self.position and oversold_count >= self.params.confirmation_count:
-            size = (self.broker.getcash() * self.params.position_size) / current_price
+        if not self.position and self._oversold_signal[i]:
+            size = (self.broker.getcash() * self._position_size) / current_price
             self.order = self.buy(size=size)
         
         # 出场条件
@@ -283,14 +389,15 @@ class OverboughtOversoldStrategy(bt.Strategy):
             return_pct = (current_price - self.buy_price) / self.buy_price
             
             # 多指标超买或止损止盈
-            if (overbought_count >= self.params.confirmation_count or
-                return_pct < -self.params.stop_loss or
-                return_pct > self.params.take_profit):
+            if (self._overbought_signal[i] or
+                return_pct < -self._stop_loss or
+                return_pct > self._take_profit):
                 
                 self.order = self.sell(size=self.position.size)
     
     def stop(self):
         if self.params.print_log and self.trades:
-            win_rate = len([t for t in self.trades if t > 0]) / len(self.trades)
-            avg_return = sum(self.trades) / len(self.trades)
+            returns = self.trades.values
+            win_rate = (returns > 0).mean()
+            avg_return = returns.mean()
             self.log(f'多指标策略 - 交易: {len(self.trades)}, 胜率: {win_rate:.2%}, 平均收益: {avg_return:.2f}%')
\ No newline at end of file
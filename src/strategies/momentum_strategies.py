@@ -7,6 +7,14 @@
 import backtrader as bt
 import pandas as pd
 import numpy as np
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.trade_buffer import ReturnBuffer
+from strategies._kernels import turtle_channels, rate_of_change, moving_average
+from strategies._cache import precomputed
 
 
 class TurtleTradingStrategy(bt.Strategy):
@@ -30,14 +38,29 @@ class TurtleTradingStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        self.high_n = bt.indicators.Highest(self.data.high, period=self.params.entry_period)
-        self.low_n = bt.indicators.Lowest(self.data.low, period=self.params.exit_period)
-        self.atr = bt.indicators.ATR(self.data, period=self.params.atr_period)
+        # 最高价/最低价通道和ATR一次遍历预计算
+        indicators = precomputed(self.data)
+        ohlcv = indicators.ohlcv
+        periods = (self.params.entry_period, self.params.exit_period, self.params.atr_period)
+        self._high_n, self._low_n, self._atr = indicators.get(
+            ('turtle',) + periods,
+            lambda: turtle_channels(ohlcv.high, ohlcv.low, ohlcv.close, *periods)
+        )
+        self._warmup = max(self.params.entry_period,
+                           self.params.exit_period,
+                           self.params.atr_period + 1)
+        
+        # 缓存next()中使用的参数和出场阈值, 避免每根K线的参数查找
+        self._position_size = self.params.position_size
+        self._max_units = self.params.max_units
+        self._atr_multiplier = self.params.atr_multiplier
         
         self.order = None
         self.units = 0  # 当前持仓单位数
-        self.entry_prices = []  # 记录入场价格
-        self.trades = []
+        # 各单位入场价格(预分配, 前units个有效)及其累计和
+        self._entry_prices = np.empty(max(self.params.max_units, 1), dtype=np.float64)
+        self._entry_sum = 0.0
+        self.trades = ReturnBuffer()
         
     def log(self, txt, dt=None):
         if self.params.print_log:
@@ -47,64 +70,65 @@ class TurtleTradingStrategy(bt.Strategy):
     def notify_order(self, order):
         if order.status in [order.Completed]:
             if order.isbuy():
+                self._entry_prices[self.units] = order.executed.price
+                self._entry_sum += order.executed.price
                 self.units += 1
-                self.entry_prices.append(order.executed.price)
                 self.log(f'海龟买入: {order.executed.price:.2f}, 单位数: {self.units}')
             elif order.issell():
-                if self.entry_prices:
-                    avg_entry = sum(self.entry_prices) / len(self.entry_prices)
+                if self.units > 0:
+                    avg_entry = self._entry_sum / self.units
                     profit_pct = ((order.executed.price - avg_entry) / avg_entry) * 100
                     self.trades.append(profit_pct)
                     self.log(f'海龟卖出: {order.executed.price:.2f}, 收益: {profit_pct:.2f}%')
                 self.units = 0
-                self.entry_prices = []
+                self._entry_sum = 0.0
         self.order = None
     
     def next(self):
-        if self.order:
+        if self.order or len(self) < self._warmup:
             return
             
         current_price = self.data.close[0]
-        high_n = self.high_n[0]
-        low_n = self.low_n[0]
+        i = len(self) - 1
+        high_n = self._high_n[i]
+        low_n = self._low_n[i]
+        atr = self._atr[i]
         
         # 突破买入条件
-        if (not self.position and 
-            current_price >= high_n and 
-            len(self.atr) >= self.params.atr_period):
+        if not self.position and current_price >= high_n:
             
             # 计算仓位大小
             account_value = self.broker.getvalue()
-            dollar_volatility = self.atr[0] * self.params.position_size
-            shares = (account_value * self.params.position_size) / dollar_volatility
+            dollar_volatility = atr * self._position_size
+            shares = (account_value * self._position_size) / dollar_volatility
             
             self.order = self.buy(size=shares)
         
         # 加仓条件
         elif (self.position and 
-              self.units < self.params.max_units and
-              len(self.entry_prices) > 0):
+              0 < self.units < self._max_units):
             
-            last_entry = self.entry_prices[-1]
-            if current_price >= last_entry + (0.5 * self.atr[0]):
+            last_entry = self._entry_prices[self.units - 1]
+            if current_price >= last_entry + (0.5 * atr):
                 account_value = self.broker.getvalue()
-                dollar_volatility = self.atr[0] * self.params.position_size
-                shares = (account_value * self.params.position_size) / dollar_volatility
+                dollar_volatility = atr * self._position_size
+                shares = (account_value * self._position_size) / dollar_volatility
                 
                 self.order = self.buy(size=shares)
         
         # 退出条件
         elif (self.position and 
               (current_price <= low_n or 
-               (len(self.entry_prices) > 0 and 
-                current_price <= self.entry_prices[0] - (self.params.atr_multiplier * self.atr[0])))):
+               (self.units > 0 and 
+                current_price <= self._entry_prices[0] - (self._atr_multiplier * atr)))):
             
             self.order = self.sell(size=self.position.size)
     
     def stop(self):
         if self.params.print_log and self.trades:
-            win_rate = len([t for t in self.trades if t > 0]) / len(self.trades)
-            avg_return = sum(self.trades) / len(self.trades)
+            returns = self.trades.values
+            win_rate = (returns > 0).mean()
+            avg_return = returns.mean()
             self.log(f'海龟策略 - 交易: {len(self.trades)}, 胜率: {win_rate:.2%}, 平均收益: {avg_return:.2f}%')
 
 
@@ -130,21 +154,43 @@ class MomentumBreakoutStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        # 价格动量
-        self.price_momentum = bt.indicators.ROC(
-            self.data.close, 
-            period=self.params.momentum_period
-        )
+        indicators = precomputed(self.data)
+        
+        # 价格动量(转换为小数)
+        self._price_mom = indicators.roc('close', self.params.momentum_period) / 100
         
         # 成交量动量
-        self.volume_sma = bt.indicators.SMA(
-            self.data.volume, 
-            period=self.params.volume_period
-        )
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self._volume_ratio = (indicators.ohlcv.volume /
+                                  indicators.sma('volume', self.params.volume_period))
+        
+        self._warmup = max(self.params.momentum_period + 1, self.params.volume_period)
+        
+        # 缓存next()中使用的参数和出场阈值, 避免每根K线的参数查找
+        self._momentum_threshold = self.params.momentum_threshold
+        self._momentum_exit = self.params.momentum_threshold * 0.3
+        self._volume_threshold = self.params.volume_threshold
+        self._stop_loss = self.params.stop_loss
+        self._take_profit = self.params.take_profit
+        self._position_size = self.params.position_size
         
         self.order = None
         self.buy_price = None
-        self.trades = []
+        self.trades = ReturnBuffer()
+    
+    @classmethod
+    def vectorized_signals(cls, ohlcv, p):
+        """向量化入场/出场信号(供VectorizedBacktester使用)"""
+        price_mom = rate_of_change(ohlcv.close, p['momentum_period']) / 100
+        with np.errstate(divide='ignore', invalid='ignore'):
+            volume_ratio = ohlcv.volume / moving_average(ohlcv.volume, p['volume_period'])
+        return {
+            'entry': (price_mom > p['momentum_threshold']) & (volume_ratio > p['volume_threshold']),
+            'exit': price_mom < p['momentum_threshold'] * 0.3,
+            'warmup': max(p['momentum_period'] + 1, p['volume_period']),
+            'stop_loss': p['stop_loss'],
+            'take_profit': p['take_profit'],
+        }
     
     def log(self, txt, dt=None):
         if self.params.print_log:
@@ -164,19 +210,20 @@ class MomentumBreakoutStrategy(bt.Strategy):
         self.order = None
     
     def next(self):
-        if self.order:
+        if self.order or len(self) < self._warmup:
             return
             
         current_price = self.data.close[0]
-        price_mom = self.price_momentum[0] / 100  # 转换为小数
-        volume_ratio = self.data.volume[0] / self.volume_sma[0] if len(self.volume_sma) > 0 else 1
+        i = len(self) - 1
+        price_mom = self._price_mom[i]
+        volume_ratio = self._volume_ratio[i]
         
         # 双动量突破买入
         if (not self.position and 
-            price_mom > self.params.momentum_threshold and
-            volume_ratio > self.params.volume_threshold):
+            price_mom > self._momentum_threshold and
+            volume_ratio > self._volume_threshold):
             
-            size = (self.broker.getcash() * self.params.position_size) / current_price
+            size = (self.broker.getcash() * self._position_size) / current_price
             self.order = self.buy(size=size)
         
         # 出场条件
@@ -184,16 +231,17 @@ class MomentumBreakoutStrategy(bt.Strategy):
             return_pct = (current_price - self.buy_price) / self.buy_price
             
             # 动量消失或止损止盈
-            if (price_mom < self.params.momentum_threshold * 0.3 or
-                return_pct < -self.params.stop_loss or
-                return_pct > self.params.take_profit):
+            if (price_mom < self._momentum_exit or
+                return_pct < -self._stop_loss or
+                return_pct > self._take_profit):
                 
                 self.order = self.sell(size=self.position.size)
     
     def stop(self):
         if self.params.print_log and self.trades:
-            win_rate = len([t for t in self.trades if t > 0]) / len(self.trades)
-            avg_return = sum(self.trades) / len(self.trades)
+            returns = self.trades.values
+            win_rate = (returns > 0).mean()
+            avg_return = returns.mean()
             self.log(f'动量突破策略 - 交易: {len(self.trades)}, 胜率: {win_rate:.2%}, 平均收益: {avg_return:.2f}%')
 
 
@@ -218,16 +266,43 @@ class RelativeStrengthStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        # 使用收盘价作为基准计算相对强度
-        self.price_change = self.data.close / self.data.close(-1)
-        self.rs = bt.indicators.SMA(self.price_change, period=self.params.rs_period)
+        indicators = precomputed(self.data)
+        close = indicators.ohlcv.close
+        
+        # 使用收盘价作为基准计算相对强度: 日涨跌比的移动平均(前缀和实现)
+        self._rs = np.full(close.shape[0], np.nan)
+        self._rs[1:] = moving_average(close[1:] / close[:-1], self.params.rs_period)
         
         # 趋势过滤
-        self.trend_sma = bt.indicators.SMA(self.data.close, period=self.params.trend_period)
+        self._trend_sma = indicators.sma('close', self.params.trend_period)
+        
+        self._warmup = max(self.params.rs_period + 1, self.params.trend_period)
+        
+        # 缓存next()中使用的参数和出场阈值, 避免每根K线的参数查找
+        self._rs_threshold = self.params.rs_threshold
+        self._rs_exit = self.params.rs_threshold * 0.9
+        self._stop_loss = self.params.stop_loss
+        self._take_profit = self.params.take_profit
+        self._position_size = self.params.position_size
         
         self.order = None
         self.buy_price = None
-        self.trades = []
+        self.trades = ReturnBuffer()
+    
+    @classmethod
+    def vectorized_signals(cls, ohlcv, p):
+        """向量化入场/出场信号(供VectorizedBacktester使用)"""
+        close = ohlcv.close
+        rs = np.full(close.shape[0], np.nan)
+        rs[1:] = moving_average(close[1:] / close[:-1], p['rs_period'])
+        trend_up = close > moving_average(close, p['trend_period'])
+        return {
+            'entry': (rs > p['rs_threshold']) & trend_up,
+            'exit': rs < p['rs_threshold'] * 0.9,
+            'warmup': max(p['rs_period'] + 1, p['trend_period']),
+            'stop_loss': p['stop_loss'],
+            'take_profit': p['take_profit'],
+        }
     
     def log(self, txt, dt=None):
         if self.params.print_log:
@@ -247,21 +322,22 @@ class RelativeStrengthStrategy(bt.Strategy):
         self.order = None
     
     def next(self):
-        if self.order:
+        if self.order or len(self) < self._warmup:
             return
             
         current_price = self.data.close[0]
-        rs_value = self.rs[0]
+        i = len(self) - 1
+        rs_value = self._rs[i]
         
         # 趋势确认
-        trend_up = current_price > self.trend_sma[0] if len(self.trend_sma) > 0 else True
+        trend_up = current_price > self._trend_sma[i]
         
         # 强势买入
         if (not self.position and 
-            rs_value > self.params.rs_threshold and
+            rs_value > self._rs_threshold and
             trend_up):
             
-            size = (self.broker.getcash() * self.params.position_size) / current_price
+            size = (self.broker.getcash() * self._position_size) / current_price
             self.order = self.buy(size=size)
         
         # 出场条件
@@ -269,16 +345,17 @@ class RelativeStrengthStrategy(bt.Strategy):
             return_pct = (current_price - self.buy_price) / self.buy_price
             
             # 相对强度减弱或止损止盈
-            if (rs_value < self.params.rs_threshold * 0.9 or
-                return_pct < -self.params.stop_loss or
-                return_pct > self.params.take_profit):
+            if (rs_value < self._rs_exit or
+                return_pct < -self._stop_loss or
+                return_pct > self._take_profit):
                 
                 self.order = self.sell(size=self.position.size)
     
     def stop(self):
         if self.params.print_log and self.trades:
-            win_rate = len([t for t in self.trades if t > 0]) / len(self.trades)
-            avg_return = sum(self.trades) / len(self.trades)
+            returns = self.trades.values
+            win_rate = (returns > 0).mean()
+            avg_return = returns.mean()
             self.log(f'相对强度策略 - 交易: {len(self.trades)}, 胜率: {win_rate:.2%}, 平均收益: {avg_return:.2f}%')
 
 
@@ -304,12 +381,40 @@ class PriceVolumeStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        self.volume_sma = bt.indicators.SMA(self.data.volume, period=self.params.volume_period)
-        self.price_change = bt.indicators.ROC(self.data.close, period=self.params.price_period)
+        indicators = precomputed(self.data)
+        
+        # 成交量比率和价格变化(转换为小数)一次性预计算
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self._volume_ratio = (indicators.ohlcv.volume /
+                                  indicators.sma('volume', self.params.volume_period))
+        self._price_change = indicators.roc('close', self.params.price_period) / 100
+        
+        self._warmup = max(self.params.volume_period, self.params.price_period + 1)
+        
+        # 缓存next()中使用的参数和出场阈值, 避免每根K线的参数查找
+        self._price_threshold = self.params.price_threshold
+        self._volume_threshold = self.params.volume_threshold
+        self._stop_loss = self.params.stop_loss
+        self._take_profit = self.params.take_profit
+        self._position_size = self.params.position_size
         
         self.order = None
         self.buy_price = None
-        self.trades = []
+        self.trades = ReturnBuffer()
+    
+    @classmethod
+    def vectorized_signals(cls, ohlcv, p):
+        """向量化入场/出场信号(供VectorizedBacktester使用)"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            volume_ratio = ohlcv.volume / moving_average(ohlcv.volume, p['volume_period'])
+        price_change = rate_of_change(ohlcv.close, p['price_period']) / 100
+        return {
+            'entry': (price_change > p['price_threshold']) & (volume_ratio > p['volume_threshold']),
+            'exit': (price_change < -p['price_threshold']) & (volume_ratio < 0.8),
+            'warmup': max(p['volume_period'], p['price_period'] + 1),
+            'stop_loss': p['stop_loss'],
+            'take_profit': p['take_profit'],
+        }
     
     def log(self, txt, dt=None):
         if self.params.print_log:
@@ -329,19 +434,20 @@ class PriceVolumeStrategy(bt.Strategy):
         self.order = None
     
     def next(self):
-        if self.order or len(self.volume_sma) == 0:
+        if self.order or len(self) < self._warmup:
             return
             
         current_price = self.data.close[0]
-        volume_ratio = self.data.volume[0] / self.volume_sma[0]
-        price_change_pct = self.price_change[0] / 100
+        i = len(self) - 1
+        volume_ratio = self._volume_ratio[i]
+        price_change_pct = self._price_change[i]
         
         # 价涨量增买入
         if (not self.position and 
-            price_change_pct > self.params.price_threshold and
-            volume_ratio > self.params.volume_threshold):
+            price_change_pct > self._price_threshold and
+            volume_ratio > self._volume_threshold):
             
-            size = (self.broker.getcash() * self.params.position_size) / current_price
+            size = (self.broker.getcash() * self._position_size) / current_price
             self.order = self.buy(size=size)
         
         # 出场条件
@@ -349,14 +455,15 @@ class PriceVolumeStrategy(bt.Strategy):
             return_pct = (current_price - self.buy_price) / self.buy_price
             
             # 价跌量缩或止损止盈
-            if ((price_change_pct < -self.params.price_threshold and volume_ratio < 0.8) or
-                return_pct < -self.params.stop_loss or
-                return_pct > self.params.take_profit):
+            if ((price_change_pct < -self._price_threshold and volume_ratio < 0.8) or
+                return_pct < -self._stop_loss or
+                return_pct > self._take_profit):
                 
                 self.order = self.sell(size=self.position.size)
     
     def stop(self):
         if self.params.print_log and self.trades:
-            win_rate = len([t for t in self.trades if t > 0]) / len(self.trades)
-            avg_return = sum(self.trades) / len(self.trades)
+            returns = self.trades.values
+            win_rate = (returns > 0).mean()
+            avg_return = returns.mean()
             self.log(f'价量策略 - 交易: {len(self.trades)}, 胜率: {win_rate:.2%}, 平均收益: {avg_return:.2f}%')
\ No newline at end of file
@@ -1,5 +1,64 @@
 import backtrader as bt
 import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from strategies._cache import precomputed
+from strategies._kernels import NDArrayOHLCV, rsi_wilder, run_rsi
+from indicators.rsiindicator import RSIIncremental
+from utils.trade_buffer import ColumnBuffer, TradeRecordBuffer
+from utils.vectorized_backtest import strategy_params, simulate_signals
+
+
+def backtest_rsi_vectorized(close, params=None):
+    """
+    RSIMeanReversionStrategy的向量化回测
+    
+    RSI与信号整段计算, 交易由编译的单仓位状态机一次遍历得到, 适用于参数扫描。
+    以信号K线收盘价成交, 不含手续费。
+    
+    参数:
+    - close: 收盘价数组
+    - params: 覆盖RSIMeanReversionStrategy默认参数的字典
+    
+    返回:
+    - dict: trades(每笔收益率%), entries/exits(K线索引), total_return(复利收益率%)
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    p = strategy_params(RSIMeanReversionStrategy, params)
+    ohlcv = NDArrayOHLCV(open=None, high=None, low=None, close=close, volume=None)
+    signals = RSIMeanReversionStrategy.vectorized_signals(ohlcv, p)
+    return simulate_signals(close, signals, p['position_size'])
+
+
+def run_rsi_compiled(close, params=None, initial_cash=10000.0):
+    """
+    以编译内核运行RSIMeanReversionStrategy, 得到资金曲线和全部交易
+    
+    整个K线循环(RSI、信号、持仓状态机、资金曲线)在一个编译函数中完成,
+    用于参数扫描; 最终结果仍应使用Backtrader策略验证(含手续费与真实成交)。
+    
+    返回:
+    - dict: equity_curve(每根K线的账户价值), trades(每笔收益率%),
+      entries/exits(K线索引), total_return(收益率%)
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    p = strategy_params(RSIMeanReversionStrategy, params)
+    equity, entries, exits, returns = run_rsi(
+        close, int(p['rsi_period']), float(p['rsi_oversold']), float(p['rsi_overbought']),
+        float(p['stop_loss']), float(p['take_profit']), float(p['position_size']),
+        float(initial_cash)
+    )
+    return {
+        'equity_curve': equity,
+        'trades': returns * 100,
+        'entries': entries,
+        'exits': exits,
+        'total_return': (equity[-1] / initial_cash - 1) * 100 if equity.shape[0] else 0.0,
+    }
 
 
 class RSIMeanReversionStrategy(bt.Strategy):
@@ -20,33 +79,92 @@ class RSIMeanReversionStrategy(bt.Strategy):
         ('take_profit', 0.10),     # 止盈比例 (10%)
         ('position_size', 0.95),   # 仓位大小比例
         ('print_log', True),       # 是否打印日志
+        ('collect_viz', True),     # 是否收集可视化数据(关闭时get_visualization_data返回空表)
     )
     
     def __init__(self):
-        # 添加RSI指标
-        self.rsi = bt.indicators.RSI(
-            self.data.close, 
-            period=self.params.rsi_period
-        )
+        try:
+            # RSI及买卖信号一次性预计算, next()中按K线索引读取
+            self._rsi = precomputed(self.data).rsi(self.params.rsi_period)
+            self._buy_signal = self._rsi < self.params.rsi_oversold
+            self._sell_signal = self._rsi > self.params.rsi_overbought
+            self._signals = self._precomputed_signals
+        except ValueError:
+            # 数据未预加载(如实时数据源): 使用逐K线O(1)更新的增量RSI指标
+            self._rsi_line = RSIIncremental(self.data.close, period=self.params.rsi_period)
+            self._signals = self._streaming_signals
+        self._warmup = self.params.rsi_period + 1  # 与bt.indicators.RSI的最小周期一致
+        
+        # 缓存next()中使用的参数, 避免每根K线的参数查找
+        self._oversold = self.params.rsi_oversold
+        self._overbought = self.params.rsi_overbought
+        self._stop_loss = self.params.stop_loss
+        self._take_profit = self.params.take_profit
+        self._position_size = self.params.position_size
+        self._print_log = self.params.print_log
+        
+        # 数据线底层数组的引用, next()中按K线索引直接读取, 绕过LineBuffer的__getitem__
+        # (预加载时已完整; 实时数据源逐根追加到同一数组)
+        self._dt_array = self.data.datetime.array
+        self._open_array = self.data.open.array
+        self._high_array = self.data.high.array
+        self._low_array = self.data.low.array
+        self._close_array = self.data.close.array
+        self._volume_array = self.data.volume.array
         
         # 跟踪订单和价格
         self.order = None
         self.buy_price = None
         self.buy_comm = None
         
-        # 性能跟踪
-        self.trades = []
+        self._log_buffer = []  # (日期, 日志)
+        
+        # 性能跟踪: 按K线数的1/4预估交易记录容量, 超出时自动扩容
+        self.trades = TradeRecordBuffer(self.data.buflen() // 4)
         
         # 可视化数据收集
         self.trade_points = []  # 买卖点记录
-        self.indicator_data = []  # 指标数据记录
-        self.portfolio_values = []  # 组合价值记录
+        # 指标数据与组合价值按列预分配(每根K线一行), 日期为Backtrader的浮点日期数值
+        self._collect_viz = self.params.collect_viz
+        capacity = self.data.buflen() if self._collect_viz else 1
+        self._indicator_buffer = ColumnBuffer(
+            ('date', 'Open', 'High', 'Low', 'Close', 'Volume', 'rsi'), capacity
+        )
+        self._portfolio_buffer = ColumnBuffer(('date', 'value', 'cash'), capacity)
         
+    @classmethod
+    def vectorized_signals(cls, ohlcv, p):
+        """向量化入场/出场信号(供VectorizedBacktester使用)"""
+        rsi = rsi_wilder(ohlcv.close, int(p['rsi_period']))
+        return {
+            'entry': rsi < p['rsi_oversold'],
+            'exit': rsi > p['rsi_overbought'],
+            'warmup': p['rsi_period'] + 1,
+            'stop_loss': p['stop_loss'],
+            'take_profit': p['take_profit'],
+        }
+    
+    def _precomputed_signals(self, i):
+        """返回第i根K线的 (RSI, 买入信号, 卖出信号)"""
+        return self._rsi[i], self._buy_signal[i], self._sell_signal[i]
+    
+    def _streaming_signals(self, i):
+        """读取增量RSI指标并返回 (RSI, 买入信号, 卖出信号)"""
+        current_rsi = self._rsi_line[0]
+        return (current_rsi,
+                current_rsi < self._oversold,
+                current_rsi > self._overbought)
+    
     def log(self, txt, dt=None):
-        """日志记录"""
-        if self.params.print_log:
-            dt = dt or self.datas[0].datetime.date(0)
-            print(f'{dt.isoformat()}, {txt}')
+        """日志记录(先缓存, stop()时一次性输出)"""
+        if self._print_log:
+            self._log_buffer.append((dt or self.datas[0].datetime.date(0), txt))
+    
+    def _flush_log(self):
+        """输出缓存的日志"""
+        if self._log_buffer:
+            sys.stdout.write(''.join(f'{dt.isoformat()}, {txt}\n' for dt, txt in self._log_buffer))
+            self._log_buffer.clear()
     
     def notify_order(self, order):
         """订单状态通知"""
@@ -62,13 +180,14 @@ class RSIMeanReversionStrategy(bt.Strategy):
                 self.buy_comm = order.executed.comm
                 
                 # 记录买点
-                self.trade_points.append({
-                    'date': self.datas[0].datetime.date(0),
-                    'type': 'buy',
-                    'price': order.executed.price,
-                    'size': order.executed.size,
-                    'commission': order.executed.comm
-                })
+                if self._collect_viz:
+                    self.trade_points.append({
+                        'date': self.datas[0].datetime.date(0),
+                        'type': 'buy',
+                        'price': order.executed.price,
+                        'size': order.executed.size,
+                        'commission': order.executed.comm
+                    })
                 
             elif order.issell():
                 self.log(f'卖出执行: 价格 {order.executed.price:.2f}, '
@@ -76,13 +195,14 @@ class RSIMeanReversionStrategy(bt.Strategy):
                         f'手续费 {order.executed.comm:.2f}')
                 
                 # 记录卖点
-                self.trade_points.append({
-                    'date': self.datas[0].datetime.date(0),
-                    'type': 'sell', 
-                    'price': order.executed.price,
-                    'size': order.executed.size,
-                    'commission': order.executed.comm
-                })
+                if self._collect_viz:
+                    self.trade_points.append({
+                        'date': self.datas[0].datetime.date(0),
+                        'type': 'sell', 
+                        'price': order.executed.price,
+                        'size': order.executed.size,
+                        'commission': order.executed.comm
+                    })
                 
         elif order.status in [order.Canceled, order.Margin, order.Rejected]:
             self.log('订单被取消/拒绝')
@@ -100,46 +220,36 @@ class RSIMeanReversionStrategy(bt.Strategy):
         self.log(f'交易盈亏: {profit_loss:.2f} ({profit_pct:.2f}%)')
         
         # 记录交易数据
-        self.trades.append({
-            'date': self.datas[0].datetime.date(0),
-            'pnl': profit_loss,
-            'pnl_pct': profit_pct,
-            'price': trade.price
-        })
+        self.trades.append(self.datas[0].datetime.date(0), profit_loss, profit_pct, trade.price)
     
     def next(self):
         """策略主逻辑"""
-        current_price = self.data.close[0]
-        current_rsi = self.rsi[0]
-        
-        # 记录指标数据用于可视化
-        self.indicator_data.append({
-            'date': self.datas[0].datetime.date(0),
-            'Open': self.data.open[0],
-            'High': self.data.high[0], 
-            'Low': self.data.low[0],
-            'Close': current_price,
-            'Volume': self.data.volume[0],
-            'rsi': current_rsi
-        })
-        
-        # 记录组合价值
-        self.portfolio_values.append({
-            'date': self.datas[0].datetime.date(0),
-            'value': self.broker.getvalue(),
-            'cash': self.broker.getcash(),
-            'position_value': self.broker.getvalue() - self.broker.getcash()
-        })
+        i = len(self) - 1
+        current_rsi, buy_signal, sell_signal = self._signals(i)
+        if len(self) < self._warmup:
+            return
+        
+        current_price = self._close_array[i]
+        # 每根K线只查询一次账户价值和现金
+        value = self.broker.getvalue()
+        cash = self.broker.getcash()
+        
+        # 记录指标数据和组合价值用于可视化
+        if self._collect_viz:
+            dt = self._dt_array[i]
+            self._indicator_buffer.append(dt, self._open_array[i], self._high_array[i],
+                                          self._low_array[i], current_price,
+                                          self._volume_array[i], current_rsi)
+            self._portfolio_buffer.append(dt, value, cash)
         
         # 如果有挂单，等待执行
         if self.order:
             return
         
         # 买入条件：RSI超卖
-        if not self.position and current_rsi < self.params.rsi_oversold:
+        if not self.position and buy_signal:
             # 计算买入数量
-            available_cash = self.broker.getcash()
-            size = (available_cash * self.params.position_size) / current_price
+            size = (cash * self._position_size) / current_price
             
             self.log(f'买入信号: RSI={current_rsi:.2f}, 价格={current_price:.2f}')
             self.order = self.buy(size=size)
@@ -150,27 +260,40 @@ class RSIMeanReversionStrategy(bt.Strategy):
             if self.buy_price:
                 return_pct = (current_price - self.buy_price) / self.buy_price
                 
-                # RSI超买信号
-                if current_rsi > self.params.rsi_overbought:
-                    self.log(f'卖出信号(RSI超买): RSI={current_rsi:.2f}, 价格={current_price:.2f}')
-                    self.order = self.sell(size=self.position.size)
-                
-                # 止损
-                elif return_pct < -self.params.stop_loss:
-                    self.log(f'止损卖出: 亏损{return_pct*100:.2f}%, 价格={current_price:.2f}')
-                    self.order = self.sell(size=self.position.size)
-                
-                # 止盈
-                elif return_pct > self.params.take_profit:
-                    self.log(f'止盈卖出: 盈利{return_pct*100:.2f}%, 价格={current_price:.2f}')
+                # 出场条件打包为位标志: RSI超买(1) | 止损(2) | 止盈(4), 常见的无出场情况只判断一次
+                exit_flags = (int(sell_signal)
+                              | ((return_pct < -self._stop_loss) << 1)
+                              | ((return_pct > self._take_profit) << 2))
+                if exit_flags:
+                    # 多个条件同时满足时按 RSI超买 > 止损 > 止盈 的优先级记录原因
+                    if exit_flags & 1:
+                        self.log(f'卖出信号(RSI超买): RSI={current_rsi:.2f}, 价格={current_price:.2f}')
+                    elif exit_flags & 2:
+                        self.log(f'止损卖出: 亏损{return_pct*100:.2f}%, 价格={current_price:.2f}')
+                    else:
+                        self.log(f'止盈卖出: 盈利{return_pct*100:.2f}%, 价格={current_price:.2f}')
                     self.order = self.sell(size=self.position.size)
     
     def get_visualization_data(self):
-        """获取可视化所需的数据"""
+        """
+        获取可视化所需的数据
+        
+        collect_viz=False时不收集, indicator_data/portfolio_values为只有列名的空表,
+        trade_points为空列表。
+        """
+        dates = [bt.num2date(x).date() for x in self._indicator_buffer.column('date')]
+        
+        indicator_data = pd.DataFrame(self._indicator_buffer.to_dict())
+        indicator_data['date'] = dates
+        
+        portfolio_values = pd.DataFrame(self._portfolio_buffer.to_dict())
+        portfolio_values['date'] = dates
+        portfolio_values['position_value'] = portfolio_values['value'] - portfolio_values['cash']
+        
         return {
-            'indicator_data': pd.DataFrame(self.indicator_data),
+            'indicator_data': indicator_data,
             'trade_points': self.trade_points,
-            'portfolio_values': pd.DataFrame(self.portfolio_values),
+            'portfolio_values': portfolio_values,
             'trades': self.trades,
             'signals': pd.DataFrame([])  # RSI没有专门的信号记录
         }
@@ -178,18 +301,21 @@ class RSIMeanReversionStrategy(bt.Strategy):
     def stop(self):
         """策略结束时的统计"""
         if self.params.print_log and self.trades:
-            trades_df = pd.DataFrame(self.trades)
-            win_rate = len(trades_df[trades_df['pnl'] > 0]) / len(trades_df)
-            avg_return = trades_df['pnl_pct'].mean()
+            trades = self.trades.values
+            trade_count = len(trades)
+            win_rate = np.count_nonzero(trades['pnl'] > 0) / trade_count
+            avg_return = trades['pnl_pct'].mean()
             
             self.log('='*50)
             self.log(f'策略统计 (RSI={self.params.rsi_period}, '
                     f'超卖={self.params.rsi_oversold}, '
                     f'超买={self.params.rsi_overbought}):')
-            self.log(f'总交易次数: {len(trades_df)}')
+            self.log(f'总交易次数: {trade_count}')
             self.log(f'胜率: {win_rate:.2%}')
             self.log(f'平均收益率: {avg_return:.2f}%')
             self.log(f'最终资金: {self.broker.getvalue():.2f}')
+        
+        self._flush_log()
 
 
 if __name__ == "__main__":
@@ -8,16 +8,22 @@ from ..indicators.myindicator import DerivativeIndicator
 class MyStrategy(bt.Strategy):
     params = (('myparam', 27), 
               ('exitbars', 5),
-              ('maperiod', 20)
+              ('maperiod', 20),
+              ('print_log', True)  # 是否打印日志
               )
     lines = ('derivative1', 'derivative2')
     
     def log(self, txt, dt=None):
         ''' Logging function for this strategy'''
+        if not self._print_log:
+            return
         dt = dt or self.datas[0].datetime.datetime(0)  # 注意要和datetime类型适配，使用datetime(0)表示当前时间 
         print('%s, %s' % (dt.isoformat(sep=" "), txt)) # dt.isoformat(sep=" ")格式化输出，以空格为date和time的分隔符
 
     def __init__(self):
+        # 缓存log()中使用的参数, 避免每次调用的参数查找
+        self._print_log = self.params.print_log
+        
         # 为每一列，创建一个bar
         self.dataopen = self.datas[0].open      # 开盘价bar  self.datas[0]指向的是大脑通过cerebro.adddata函数加载的第一个数据
         self.datahigh = self.datas[0].high      # 最高价bar
@@ -78,19 +84,25 @@ class MyStrategy(bt.Strategy):
         next方法是Strategy最重要的的方法,
         具体策略的实现都在这个函数中，后续还会详细介绍。
         """
-        self.log('Close, {:.2f}'.format(self.dataclose[0]))
-        self.log('Derivative, {}'.format(self.derivative1.lines.derivative_volume[0]))
+        # 当前K线的取值只读取一次
+        close = self.dataclose[0]
+        sma = self.sma[0]
+        derivative_volume = self.derivative1.lines.derivative_volume
+        dv0, dv1 = derivative_volume[0], derivative_volume[-1]
+        
+        self.log('Close, {:.2f}'.format(close))
+        self.log('Derivative, {}'.format(dv0))
         # print(self.derivative1.lines.derivative_close)
         if self.order:  # Check if an order is pending ... if yes, we cannot send a 2nd one
             return
 
         if not self.position: # Check if we are in the market
-            if self.dataclose[0] > self.sma[0]: # 大于均线就买 BUY, BUY, BUY!!! (with all possible default parameters)
-                if self.derivative1.lines.derivative_volume[0] < 0 and self.derivative1.lines.derivative_volume[-1] < 0:
-                    self.log('BUY CREATE, %.2f' % self.dataclose[0])
+            if close > sma: # 大于均线就买 BUY, BUY, BUY!!! (with all possible default parameters)
+                if dv0 < 0 and dv1 < 0:
+                    self.log('BUY CREATE, %.2f' % close)
                     self.order = self.buy() # Keep track of the created order to avoid a 2nd order
         else:
-            if self.dataclose[0] < self.sma[0]: # 小于均线卖卖卖！
-                if self.derivative1.lines.derivative_volume[0] > 0 and self.derivative1.lines.derivative_volume[-1] > 0:
-                    self.log('SELL CREATE, %.2f' % self.dataclose[0])
+            if close < sma: # 小于均线卖卖卖！
+                if dv0 > 0 and dv1 > 0:
+                    self.log('SELL CREATE, %.2f' % close)
                     self.order = self.sell()  # Keep track of the created order to avoid a 2nd order
\ No newline at end of file
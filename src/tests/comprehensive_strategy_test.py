@@ -6,6 +6,8 @@
 
 import sys
 import os
+import io
+import contextlib
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -19,9 +21,13 @@ import traceback
 project_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(project_root)
 sys.path.append(os.path.join(project_root, 'advanced_strategies'))
+sys.path.append(os.path.dirname(project_root))
 
 # 导入所有策略
 from btc_data import BTCDataFeed
+from utils.vectorized_backtest import VectorizedBacktester
+from utils.trade_buffer import TradeRecordBuffer
+from utils.backtest_pool import backtest_pool
 
 # 原有策略
 from btc_strategies.rsi_strategy import RSIMeanReversionStrategy
@@ -41,15 +47,143 @@ from mean_reversion_strategies import BollingerMeanReversionStrategy, ZScoreMean
 from arbitrage_strategies import StatisticalArbitrageStrategy, PairsTradingStrategy, CalendarSpreadStrategy
 
 
+def _run_backtest(strategy_class, strategy_name, params, data, initial_cash, commission):
+    """
+    运行单个策略的回测并计算指标
+    
+    模块级函数, 可在子进程中执行; data为fetch_data返回的DataFrame,
+    每次回测由它创建独立的Backtrader数据源。
+    """
+    cerebro = bt.Cerebro()
+    
+    # 添加策略
+    if params:
+        cerebro.addstrategy(strategy_class, **params)
+    elif 'collect_viz' in strategy_class.params._getkeys():
+        # 测试只统计收益, 不需要可视化数据
+        cerebro.addstrategy(strategy_class, print_log=False, collect_viz=False)
+    else:
+        cerebro.addstrategy(strategy_class, print_log=False)
+    
+    cerebro.adddata(BTCDataFeed.to_backtrader_feed(data))
+    cerebro.broker.setcash(initial_cash)
+    cerebro.broker.setcommission(commission=commission)
+    
+    # 运行回测
+    start_value = cerebro.broker.getvalue()
+    strategies = cerebro.run()
+    final_value = cerebro.broker.getvalue()
+    
+    # 计算指标
+    total_return = (final_value - start_value) / start_value
+    return_pct = total_return * 100
+    
+    # 获取策略交易记录
+    strategy_instance = strategies[0]
+    trades = getattr(strategy_instance, 'trades', [])
+    if isinstance(trades, TradeRecordBuffer):
+        # 结构化交易记录取收益率(%)列, 与其他策略的收益率列表一致
+        trades = trades.values['pnl_pct'].tolist()
+    
+    # 计算更多指标
+    if trades:
+        win_trades = [t for t in trades if t > 0]
+        win_rate = len(win_trades) / len(trades)
+        avg_return = sum(trades) / len(trades)
+        max_loss = min(trades) if trades else 0
+        max_gain = max(trades) if trades else 0
+    else:
+        win_rate = 0
+        avg_return = 0
+        max_loss = 0
+        max_gain = 0
+    
+    return {
+        'name': strategy_name,
+        'class': strategy_class.__name__,
+        'return_pct': return_pct,
+        'final_value': final_value,
+        'total_trades': len(trades),
+        'win_rate': win_rate,
+        'avg_return': avg_return,
+        'max_gain': max_gain,
+        'max_loss': max_loss,
+        'params': params,
+        'status': 'success'
+    }
+
+
+def _vectorized_result(strategy_class, strategy_name, params, result, initial_cash):
+    """将VectorizedBacktester的结果整理为与_run_backtest相同的格式"""
+    trades = result['trades']
+    return {
+        'name': strategy_name,
+        'class': strategy_class.__name__,
+        'return_pct': result['total_return'],
+        'final_value': initial_cash * (1 + result['total_return'] / 100),
+        'total_trades': len(trades),
+        'win_rate': float((trades > 0).mean()) if len(trades) else 0,
+        'avg_return': float(trades.mean()) if len(trades) else 0,
+        'max_gain': float(trades.max()) if len(trades) else 0,
+        'max_loss': float(trades.min()) if len(trades) else 0,
+        'params': params,
+        'status': 'success'
+    }
+
+
+# 子进程共享的行情数据, 由进程池初始化时传入一次
+_worker_data = None
+
+
+def _init_worker(data):
+    global _worker_data
+    _worker_data = data
+
+
+def _run_worker(strategy_class, strategy_name, params, initial_cash, commission):
+    """
+    进程池任务: 使用初始化时传入的行情数据回测, 返回(结果, 策略输出, 异常)
+    
+    子进程继承的标准输出是主进程重定向后的内存缓冲区副本, 写入的内容不会
+    回到主进程; 因此策略自身的日志在此捕获, 随结果返回由主进程按计划顺序输出。
+    回测失败时结果为None, 异常随已捕获的输出一起返回。
+    """
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        try:
+            result = _run_backtest(strategy_class, strategy_name, params, _worker_data,
+                                   initial_cash, commission)
+        except Exception as e:
+            return None, buffer.getvalue(), e
+    return result, buffer.getvalue(), None
+
+
 class StrategyTester:
     """策略测试器"""
     
-    def __init__(self, initial_cash=10000, commission=0.001):
+    def __init__(self, initial_cash=10000, commission=0.001, cache_dir=None):
         self.initial_cash = initial_cash
         self.commission = commission
         self.btc_feed = BTCDataFeed()
+        self.cache_dir = cache_dir  # 磁盘缓存目录, None为只使用内存缓存
+        self._data_cache = {}
         self.test_results = []
         self.failed_strategies = []
+    
+    def _get_data(self, start_date, end_date):
+        """
+        获取行情数据, 按 内存缓存 -> 磁盘缓存 -> 下载 的顺序查找
+        
+        所有策略共用同一份DataFrame, 每次回测只需由它创建新的数据源。
+        """
+        key = (start_date, end_date)
+        data = self._data_cache.get(key)
+        if data is None:
+            data = self.btc_feed.fetch_data_cached(start_date, end_date, self.cache_dir)
+            if data is None:
+                raise ValueError("无法获取数据")
+            self._data_cache[key] = data
+        return data
         
     def test_single_strategy(self, strategy_class, strategy_name, params=None, 
                            start_date="2025-01-01", end_date="2025-08-23"):
@@ -57,97 +191,101 @@ class StrategyTester:
         try:
             print(f"🔄 测试 {strategy_name}...")
             
-            cerebro = bt.Cerebro()
-            
-            # 添加策略
-            if params:
-                cerebro.addstrategy(strategy_class, **params)
-            else:
-                cerebro.addstrategy(strategy_class, print_log=False)
-            
-            # 获取数据
-            bt_data, raw_data = self.btc_feed.get_backtrader_data(start_date, end_date)
-            if bt_data is None:
-                raise ValueError("无法获取数据")
-            
-            cerebro.adddata(bt_data)
-            cerebro.broker.setcash(self.initial_cash)
-            cerebro.broker.setcommission(commission=self.commission)
-            
-            # 运行回测
-            start_value = cerebro.broker.getvalue()
-            strategies = cerebro.run()
-            final_value = cerebro.broker.getvalue()
-            
-            # 计算指标
-            total_return = (final_value - start_value) / start_value
-            return_pct = total_return * 100
-            
-            # 获取策略交易记录
-            strategy_instance = strategies[0]
-            trades = getattr(strategy_instance, 'trades', [])
-            
-            # 计算更多指标
-            if trades:
-                win_trades = [t for t in trades if t > 0]
-                win_rate = len(win_trades) / len(trades)
-                avg_return = sum(trades) / len(trades)
-                max_loss = min(trades) if trades else 0
-                max_gain = max(trades) if trades else 0
-            else:
-                win_rate = 0
-                avg_return = 0
-                max_loss = 0
-                max_gain = 0
-            
-            result = {
-                'name': strategy_name,
-                'class': strategy_class.__name__,
-                'return_pct': return_pct,
-                'final_value': final_value,
-                'total_trades': len(trades),
-                'win_rate': win_rate,
-                'avg_return': avg_return,
-                'max_gain': max_gain,
-                'max_loss': max_loss,
-                'params': params,
-                'status': 'success'
-            }
-            
-            # 状态标记
-            if return_pct > 30:
-                status_emoji = "🏆"
-            elif return_pct > 22.58:  # 基准
-                status_emoji = "🟢"
-            elif return_pct > 10:
-                status_emoji = "🟡"
-            elif return_pct > 0:
-                status_emoji = "🟠"
-            else:
-                status_emoji = "🔴"
-            
-            print(f"   {status_emoji} {strategy_name}: {return_pct:.2f}% | 交易:{len(trades)} | 胜率:{win_rate*100:.1f}%")
-            
-            self.test_results.append(result)
-            return result
+            result = _run_backtest(strategy_class, strategy_name, params,
+                                   self._get_data(start_date, end_date),
+                                   self.initial_cash, self.commission)
+            return self._record_result(result)
             
         except Exception as e:
-            error_msg = str(e)
-            print(f"   ❌ {strategy_name} 失败: {error_msg}")
-            
-            failed_result = {
-                'name': strategy_name,
-                'class': strategy_class.__name__,
-                'error': error_msg,
-                'params': params,
-                'status': 'failed'
-            }
-            
-            self.failed_strategies.append(failed_result)
+            self._record_failure(strategy_class, strategy_name, params, e)
             return None
     
-    def run_comprehensive_test(self):
-        """运行所有策略的综合测试"""
+    def _record_result(self, result):
+        """打印并记录成功的回测结果"""
+        return_pct = result['return_pct']
+        
+        # 状态标记
+        if return_pct > 30:
+            status_emoji = "🏆"
+        elif return_pct > 22.58:  # 基准
+            status_emoji = "🟢"
+        elif return_pct > 10:
+            status_emoji = "🟡"
+        elif return_pct > 0:
+            status_emoji = "🟠"
+        else:
+            status_emoji = "🔴"
+        
+        print(f"   {status_emoji} {result['name']}: {return_pct:.2f}% | 交易:{result['total_trades']} | 胜率:{result['win_rate']*100:.1f}%")
+        
+        self.test_results.append(result)
+        return result
+    
+    def _record_failure(self, strategy_class, strategy_name, params, error):
+        """打印并记录失败的策略"""
+        error_msg = str(error)
+        print(f"   ❌ {strategy_name} 失败: {error_msg}")
+        
+        failed_result = {
+            'name': strategy_name,
+            'class': strategy_class.__name__,
+            'error': error_msg,
+            'params': params,
+            'status': 'failed'
+        }
+        
+        self.failed_strategies.append(failed_result)
+    
+    def run_vectorized_tests(self, strategies, start_date="2025-01-01", end_date="2025-08-23"):
+        """
+        使用向量化回测器测试策略(策略类需提供vectorized_signals)
+        
+        不经过Cerebro, 以信号K线收盘价成交且不含手续费, 适合快速筛选。
+        
+        返回:
+        - DataFrame: 以策略名称为索引的结果
+        """
+        backtester = VectorizedBacktester(
+            self.btc_feed.get_shared_ohlcv(self._get_data(start_date, end_date))
+        )
+        results = []
+        for name, strategy_class, params in strategies:
+            print(f"\n⚡ 向量化测试 {name}...")
+            try:
+                overrides = {k: v for k, v in (params or {}).items() if k != 'print_log'}
+                result = _vectorized_result(strategy_class, name, params,
+                                            backtester.run(strategy_class, **overrides),
+                                            self.initial_cash)
+                results.append(self._record_result(result))
+            except Exception as e:
+                self._record_failure(strategy_class, name, params, e)
+        
+        return pd.DataFrame(results).set_index('name') if results else pd.DataFrame()
+    
+    def run_comprehensive_test(self, max_workers=None, start_date="2025-01-01", end_date="2025-08-23",
+                               vectorized=False):
+        """
+        运行所有策略的综合测试
+        
+        各策略回测相互独立, 使用进程池并行运行(max_workers默认为CPU核数,
+        为1时顺序运行)。行情数据只获取一次, 在进程池初始化时传给各子进程。
+        
+        vectorized为True时, 提供vectorized_signals的策略改用向量化回测
+        (不含手续费), 其余策略仍使用Backtrader。
+        
+        测试过程中的输出(含策略自身的日志, 并行时由子进程捕获后返回)先写入
+        内存缓冲区, 结束时(包括异常中断)一次性写到标准输出。
+        """
+        buffer = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(buffer):
+                return self._run_comprehensive_test(max_workers, start_date, end_date, vectorized)
+        finally:
+            sys.stdout.write(buffer.getvalue())
+            sys.stdout.flush()
+    
+    def _run_comprehensive_test(self, max_workers, start_date, end_date, vectorized):
+        """run_comprehensive_test的实现, 输出由调用方缓冲"""
         print("🚀 开始综合策略测试")
         print("="*80)
         print(f"📅 测试时间: 2025-01-01 到 2025-08-23")
@@ -198,10 +336,48 @@ class StrategyTester:
         print(f"\n📋 计划测试 {len(strategies_to_test)} 个策略")
         print("-"*80)
         
-        # 逐一测试策略
-        for i, (name, strategy_class, params) in enumerate(strategies_to_test, 1):
-            print(f"\n[{i:2d}/{len(strategies_to_test)}]", end=" ")
-            self.test_single_strategy(strategy_class, name, params)
+        if vectorized:
+            self.run_vectorized_tests(
+                [t for t in strategies_to_test if hasattr(t[1], 'vectorized_signals')],
+                start_date, end_date
+            )
+            strategies_to_test = [t for t in strategies_to_test
+                                  if not hasattr(t[1], 'vectorized_signals')]
+        
+        if max_workers == 1:
+            # 逐一测试策略
+            for i, (name, strategy_class, params) in enumerate(strategies_to_test, 1):
+                print(f"\n[{i:2d}/{len(strategies_to_test)}]", end=" ")
+                self.test_single_strategy(strategy_class, name, params, start_date, end_date)
+            
+            return self.test_results, self.failed_strategies
+        
+        # 获取数据(所有策略共用)
+        raw_data = self._get_data(start_date, end_date)
+        
+        # 并行测试策略, 按计划顺序输出结果
+        with backtest_pool(_init_worker, (raw_data,), max_workers) as executor:
+            futures = [
+                executor.submit(_run_worker, strategy_class, name, params,
+                                self.initial_cash, self.commission)
+                for name, strategy_class, params in strategies_to_test
+            ]
+            
+            for i, (future, (name, strategy_class, params)) in enumerate(
+                    zip(futures, strategies_to_test), 1):
+                print(f"\n[{i:2d}/{len(strategies_to_test)}] 🔄 测试 {name}...")
+                try:
+                    result, output, error = future.result()
+                except Exception as e:
+                    self._record_failure(strategy_class, name, params, e)
+                    continue
+                
+                # 子进程中捕获的策略日志
+                sys.stdout.write(output)
+                if error is not None:
+                    self._record_failure(strategy_class, name, params, error)
+                else:
+                    self._record_result(result)
         
         return self.test_results, self.failed_strategies
     
@@ -221,20 +397,23 @@ class StrategyTester:
         print(f"💰 初始资金: ${self.initial_cash:,}")
         
         if self.test_results:
-            # 按收益率排序
-            sorted_results = sorted(self.test_results, key=lambda x: x['return_pct'], reverse=True)
+            # 按收益率排序(结果整理为DataFrame一次, 统计与分组均向量化计算)
+            sorted_results = pd.DataFrame(self.test_results).sort_values(
+                'return_pct', ascending=False, kind='stable'
+            ).reset_index(drop=True)
+            returns = sorted_results['return_pct']
             
             print(f"\n🏆 成功策略排行榜 (共{len(sorted_results)}个):")
             print("-"*100)
             print(f"{'排名':<4} {'策略名称':<25} {'收益率':<10} {'vs基准':<8} {'交易次数':<8} {'胜率':<8} {'评级'}")
             print("-"*100)
             
-            for i, result in enumerate(sorted_results, 1):
-                name = result['name'][:24]
-                return_pct = result['return_pct']
+            for i, result in enumerate(sorted_results.itertuples(index=False), 1):
+                name = result.name[:24]
+                return_pct = result.return_pct
                 vs_benchmark = return_pct - 22.58
-                trades = result['total_trades']
-                win_rate = result['win_rate'] * 100
+                trades = result.total_trades
+                win_rate = result.win_rate * 100
                 
                 # 评级系统
                 if return_pct > 35:
@@ -251,9 +430,9 @@ class StrategyTester:
                 print(f"{i:2d}.  {name:<25} {return_pct:>8.1f}% {vs_benchmark:>6.1f}% {trades:>6d} {win_rate:>6.1f}% {rating}")
             
             # 统计分析
-            profitable_count = len([r for r in sorted_results if r['return_pct'] > 0])
-            beat_benchmark_count = len([r for r in sorted_results if r['return_pct'] > 22.58])
-            avg_return = sum(r['return_pct'] for r in sorted_results) / len(sorted_results)
+            profitable_count = int((returns > 0).sum())
+            beat_benchmark_count = int((returns > 22.58).sum())
+            avg_return = returns.mean()
             
             print(f"\n📈 统计摘要:")
             print(f"   总测试策略数: {len(sorted_results)}")
@@ -261,8 +440,8 @@ class StrategyTester:
             print(f"   跑赢基准策略数: {beat_benchmark_count} ({beat_benchmark_count/len(sorted_results)*100:.1f}%)")
             print(f"   平均收益率: {avg_return:.2f}%")
             
-            if sorted_results:
-                best = sorted_results[0]
+            if len(sorted_results):
+                best = sorted_results.iloc[0]
                 print(f"   🏆 最佳策略: {best['name']}")
                 print(f"   🎯 最高收益率: {best['return_pct']:.2f}%")
         
@@ -290,24 +469,22 @@ class StrategyTester:
             print(f"\n📊 策略类别分析:")
             print("-"*50)
             
-            # 按策略类别分组
-            momentum_strategies = [r for r in sorted_results if any(x in r['name'] for x in ['MACD', '动量', '海龟', '突破', '相对强度', '价量'])]
-            mean_reversion_strategies = [r for r in sorted_results if any(x in r['name'] for x in ['RSI', '布林', 'Z-Score', '超买超卖', '均值回归'])]
-            grid_strategies = [r for r in sorted_results if '网格' in r['name']]
-            arbitrage_strategies = [r for r in sorted_results if any(x in r['name'] for x in ['套利', '配对', '价差'])]
-            
+            # 按策略名称关键字分组(同一策略可属于多个类别)
+            names = sorted_results['name']
             categories = [
-                ("动量策略", momentum_strategies),
-                ("均值回归策略", mean_reversion_strategies),
-                ("网格策略", grid_strategies),
-                ("套利策略", arbitrage_strategies)
+                ("动量策略", ['MACD', '动量', '海龟', '突破', '相对强度', '价量']),
+                ("均值回归策略", ['RSI', '布林', 'Z-Score', '超买超卖', '均值回归']),
+                ("网格策略", ['网格']),
+                ("套利策略", ['套利', '配对', '价差'])
             ]
             
-            for category_name, category_strategies in categories:
-                if category_strategies:
-                    avg_return = sum(s['return_pct'] for s in category_strategies) / len(category_strategies)
-                    best_strategy = max(category_strategies, key=lambda x: x['return_pct'])
-                    print(f"{category_name}: {len(category_strategies)}个, 平均收益{avg_return:.1f}%, 最佳{best_strategy['name']}({best_strategy['return_pct']:.1f}%)")
+            for category_name, keywords in categories:
+                mask = names.str.contains('|'.join(keywords), regex=True)
+                if mask.any():
+                    category_returns = returns[mask]
+                    # 已按收益率降序排列, 首个即为最佳
+                    best_strategy = sorted_results[mask].iloc[0]
+                    print(f"{category_name}: {int(mask.sum())}个, 平均收益{category_returns.mean():.1f}%, 最佳{best_strategy['name']}({best_strategy['return_pct']:.1f}%)")
         
         print(f"\n{'='*100}")
         print(f"✅ 综合测试报告生成完成!")
@@ -321,7 +498,7 @@ def main():
     
     try:
         # 创建测试器
-        tester = StrategyTester(initial_cash=10000, commission=0.001)
+        tester = StrategyTester(initial_cash=10000, commission=0.001, cache_dir='data_cache')
         
         # 运行综合测试
         test_results, failed_strategies = tester.run_comprehensive_test()
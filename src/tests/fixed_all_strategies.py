@@ -7,6 +7,42 @@
 import backtrader as bt
 import pandas as pd
 import numpy as np
+import itertools
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from strategies._cache import precomputed
+from strategies._kernels import (rsi_wilder, macd_lines, rolling_mean_std, rate_of_change,
+                                 moving_average, turtle_channels, sweep_momentum, grid_actions)
+from utils.vectorized_backtest import strategy_params
+from utils.trade_buffer import ReturnBuffer
+
+
+def _macd_crosses(macd, signal):
+    """MACD金叉/死叉布尔数组(首根K线无前值, 为False)"""
+    cross_up = np.zeros(macd.shape[0], dtype=np.bool_)
+    cross_dn = np.zeros(macd.shape[0], dtype=np.bool_)
+    cross_up[1:] = (macd[:-1] <= signal[:-1]) & (macd[1:] > signal[1:])
+    cross_dn[1:] = (macd[:-1] >= signal[:-1]) & (macd[1:] < signal[1:])
+    return cross_up, cross_dn
+
+
+def _bollinger_signals(close, mid, std, bb_dev, strategy_type):
+    """按策略类型生成布林带入场/出场信号"""
+    bb_top = mid + bb_dev * std
+    bb_bot = mid - bb_dev * std
+    if strategy_type == 'mean_reversion':
+        # 均值回归：触及下轨买入, 触及上轨卖出
+        return close <= bb_bot * 1.005, close >= bb_top * 0.995
+    # 突破：突破上轨买入, 跌破下轨卖出
+    return close > bb_top, close < bb_bot
+
+
+def _volume_ratio(volume, volume_sma):
+    """成交量与其均线之比, 均线无效或为0的K线记为0"""
+    return np.divide(volume, volume_sma, out=np.zeros_like(volume), where=volume_sma > 0)
 
 
 # 修复MACD相关问题
@@ -22,19 +58,48 @@ class FixedMACDStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        # 使用MACDHisto指标替代MACD
-        self.macd = bt.indicators.MACDHisto(
-            self.data.close,
-            period_me1=self.params.fast_period,
-            period_me2=self.params.slow_period,
-            period_signal=self.params.signal_period
-        )
+        # MACD线与信号线由编译内核一次性预计算, 金叉/死叉整段向量化判断,
+        # next()中按K线索引读取
+        macd, signal = precomputed(self.data).macd(self.params.fast_period,
+                                                   self.params.slow_period,
+                                                   self.params.signal_period)
+        self._cross_up, self._cross_dn = _macd_crosses(macd, signal)
+        # 与bt.indicators.MACDHisto的最小周期一致
+        self._warmup = (max(self.params.fast_period, self.params.slow_period)
+                        + self.params.signal_period - 1)
+        self._bar = 0  # 已处理的K线数(策略无指标, 每根K线都会调用next)
+        
+        # 缓存next()中使用的参数, 避免每根K线的参数查找
+        self._stop_loss = self.params.stop_loss
+        self._take_profit = self.params.take_profit
+        self._position_size = self.params.position_size
+        
         self.order = None
         self.buy_price = None
-        self.trades = []
+        self.trades = ReturnBuffer()
+    
+    @classmethod
+    def vectorized_signals(cls, ohlcv, p):
+        """向量化入场/出场信号(供VectorizedBacktester使用)"""
+        macd, signal = macd_lines(ohlcv.close, p['fast_period'], p['slow_period'],
+                                  p['signal_period'])
+        cross_up, cross_dn = _macd_crosses(macd, signal)
+        return {
+            'entry': cross_up,
+            'exit': cross_dn,
+            'warmup': max(p['fast_period'], p['slow_period']) + p['signal_period'] - 1,
+            'stop_loss': p['stop_loss'],
+            'take_profit': p['take_profit'],
+        }
         
+    def start(self):
+        # 现金只在订单成交时变化: 开始时读取一次, 之后在notify_order中刷新,
+        # next()中不再每次查询broker
+        self._cash = self.broker.getcash()
+    
     def notify_order(self, order):
         if order.status in [order.Completed]:
+            self._cash = self.broker.getcash()
             if order.isbuy():
                 self.buy_price = order.executed.price
             elif order.issell() and self.buy_price:
@@ -43,31 +108,26 @@ class FixedMACDStrategy(bt.Strategy):
         self.order = None
     
     def next(self):
-        if self.order or len(self.macd) < self.params.slow_period:
+        self._bar += 1
+        if self.order or self._bar < self._warmup:
             return
-            
+        
+        i = self._bar - 1
         current_price = self.data.close[0]
-        macd_line = self.macd.macd[0]
-        signal_line = self.macd.signal[0]
         
         # 金叉买入
-        if (not self.position and 
-            macd_line > signal_line and 
-            len(self.macd.macd) > 1 and
-            self.macd.macd[-1] <= self.macd.signal[-1]):
+        if not self.position and self._cross_up[i]:
             
-            size = (self.broker.getcash() * self.params.position_size) / current_price
+            size = (self._cash * self._position_size) / current_price
             self.order = self.buy(size=size)
             
         # 死叉或止损止盈卖出
         elif self.position and self.buy_price:
             return_pct = (current_price - self.buy_price) / self.buy_price
             
-            if ((macd_line < signal_line and 
-                 len(self.macd.macd) > 1 and
-                 self.macd.macd[-1] >= self.macd.signal[-1]) or
-                return_pct < -self.params.stop_loss or
-                return_pct > self.params.take_profit):
+            if (self._cross_dn[i] or
+                return_pct < -self._stop_loss or
+                return_pct > self._take_profit):
                 
                 self.order = self.sell(size=self.position.size)
 
@@ -84,13 +144,40 @@ class FixedRSIStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        self.rsi = bt.indicators.RSI(self.data.close, period=self.params.rsi_period)
+        # RSI由编译内核一次性预计算, next()中按K线索引读取
+        self._rsi = precomputed(self.data).rsi(self.params.rsi_period)
+        self._warmup = self.params.rsi_period + 1  # 与bt.indicators.RSI的最小周期一致
+        self._bar = 0  # 已处理的K线数(策略无指标, 每根K线都会调用next)
+        
+        # 缓存next()中使用的参数, 避免每根K线的参数查找
+        self._rsi_oversold = self.params.rsi_oversold
+        self._rsi_overbought = self.params.rsi_overbought
+        self._stop_loss = self.params.stop_loss
+        self._take_profit = self.params.take_profit
+        self._position_size = self.params.position_size
+        
         self.order = None
         self.buy_price = None
-        self.trades = []
+        self.trades = ReturnBuffer()
+    
+    @classmethod
+    def vectorized_signals(cls, ohlcv, p):
+        """向量化入场/出场信号(供VectorizedBacktester使用)"""
+        rsi = rsi_wilder(ohlcv.close, p['rsi_period'])
+        return {
+            'entry': rsi < p['rsi_oversold'],
+            'exit': rsi > p['rsi_overbought'],
+            'warmup': p['rsi_period'] + 1,
+            'stop_loss': p['stop_loss'],
+            'take_profit': p['take_profit'],
+        }
         
+    def start(self):
+        self._cash = self.broker.getcash()
+    
     def notify_order(self, order):
         if order.status in [order.Completed]:
+            self._cash = self.broker.getcash()
             if order.isbuy():
                 self.buy_price = order.executed.price
             elif order.issell() and self.buy_price:
@@ -99,24 +186,25 @@ class FixedRSIStrategy(bt.Strategy):
         self.order = None
     
     def next(self):
-        if self.order or len(self.rsi) < self.params.rsi_period:
+        self._bar += 1
+        if self.order or self._bar < self._warmup:
             return
             
         current_price = self.data.close[0]
-        rsi_val = self.rsi[0]
+        rsi_val = self._rsi[self._bar - 1]
         
         # RSI超卖买入
-        if not self.position and rsi_val < self.params.rsi_oversold:
-            size = (self.broker.getcash() * self.params.position_size) / current_price
+        if not self.position and rsi_val < self._rsi_oversold:
+            size = (self._cash * self._position_size) / current_price
             self.order = self.buy(size=size)
             
         # RSI超买或止损止盈卖出
         elif self.position and self.buy_price:
             return_pct = (current_price - self.buy_price) / self.buy_price
             
-            if (rsi_val > self.params.rsi_overbought or
-                return_pct < -self.params.stop_loss or
-                return_pct > self.params.take_profit):
+            if (rsi_val > self._rsi_overbought or
+                return_pct < -self._stop_loss or
+                return_pct > self._take_profit):
                 
                 self.order = self.sell(size=self.position.size)
 
@@ -133,17 +221,44 @@ class FixedBollingerStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        self.bb = bt.indicators.BollingerBands(
-            self.data.close,
-            period=self.params.bb_period,
-            devfactor=self.params.bb_dev
+        # 布林带上下轨由编译内核一次性预计算; strategy_type在回测中不变,
+        # 按类型一次性生成入场/出场信号, next()中按K线索引读取
+        indicators = precomputed(self.data)
+        mid, std = indicators.mean_std('close', self.params.bb_period)
+        self._entry_mask, self._exit_mask = _bollinger_signals(
+            indicators.ohlcv.close, mid, std, self.params.bb_dev, self.params.strategy_type
         )
+        self._warmup = self.params.bb_period
+        self._bar = 0  # 已处理的K线数(策略无指标, 每根K线都会调用next)
+        
+        # 缓存next()中使用的参数, 避免每根K线的参数查找
+        self._stop_loss = self.params.stop_loss
+        self._take_profit = self.params.take_profit
+        self._position_size = self.params.position_size
+        
         self.order = None
         self.buy_price = None
-        self.trades = []
+        self.trades = ReturnBuffer()
+    
+    @classmethod
+    def vectorized_signals(cls, ohlcv, p):
+        """向量化入场/出场信号(供VectorizedBacktester使用)"""
+        mid, std = rolling_mean_std(ohlcv.close, p['bb_period'])
+        entry, exit_ = _bollinger_signals(ohlcv.close, mid, std, p['bb_dev'], p['strategy_type'])
+        return {
+            'entry': entry,
+            'exit': exit_,
+            'warmup': p['bb_period'],
+            'stop_loss': p['stop_loss'],
+            'take_profit': p['take_profit'],
+        }
         
+    def start(self):
+        self._cash = self.broker.getcash()
+    
     def notify_order(self, order):
         if order.status in [order.Completed]:
+            self._cash = self.broker.getcash()
             if order.isbuy():
                 self.buy_price = order.executed.price
             elif order.issell() and self.buy_price:
@@ -152,45 +267,26 @@ class FixedBollingerStrategy(bt.Strategy):
         self.order = None
     
     def next(self):
-        if self.order or len(self.bb) < self.params.bb_period:
+        self._bar += 1
+        if self.order or self._bar < self._warmup:
             return
-            
+        
+        i = self._bar - 1
         current_price = self.data.close[0]
-        bb_top = self.bb.top[0]
-        bb_bot = self.bb.bot[0]
-        bb_mid = self.bb.mid[0]
-        
-        if self.params.strategy_type == 'mean_reversion':
-            # 均值回归：触及下轨买入
-            if not self.position and current_price <= bb_bot * 1.005:
-                size = (self.broker.getcash() * self.params.position_size) / current_price
-                self.order = self.buy(size=size)
-                
-            # 触及上轨或止损止盈卖出
-            elif self.position and self.buy_price:
-                return_pct = (current_price - self.buy_price) / self.buy_price
-                
-                if (current_price >= bb_top * 0.995 or
-                    return_pct < -self.params.stop_loss or
-                    return_pct > self.params.take_profit):
-                    
-                    self.order = self.sell(size=self.position.size)
-                    
-        else:  # breakout
-            # 突破：突破上轨买入
-            if not self.position and current_price > bb_top:
-                size = (self.broker.getcash() * self.params.position_size) / current_price
-                self.order = self.buy(size=size)
-                
-            # 跌破下轨或止损止盈卖出
-            elif self.position and self.buy_price:
-                return_pct = (current_price - self.buy_price) / self.buy_price
+        
+        if not self.position and self._entry_mask[i]:
+            size = (self._cash * self._position_size) / current_price
+            self.order = self.buy(size=size)
+            
+        # 触轨信号或止损止盈卖出
+        elif self.position and self.buy_price:
+            return_pct = (current_price - self.buy_price) / self.buy_price
+            
+            if (self._exit_mask[i] or
+                return_pct < -self._stop_loss or
+                return_pct > self._take_profit):
                 
-                if (current_price < bb_bot or
-                    return_pct < -self.params.stop_loss or
-                    return_pct > self.params.take_profit):
-                    
-                    self.order = self.sell(size=self.position.size)
+                self.order = self.sell(size=self.position.size)
 
 
 class ImprovedTurtleStrategy(bt.Strategy):
@@ -206,19 +302,38 @@ class ImprovedTurtleStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        self.high_n = bt.indicators.Highest(self.data.high, period=self.params.entry_period)
-        self.low_n = bt.indicators.Lowest(self.data.low, period=self.params.exit_period)
-        self.atr = bt.indicators.ATR(self.data, period=self.params.atr_period)
-        
+        # 通道/ATR与趋势均线取自共享的预计算缓存(与TurtleTradingStrategy同参数时
+        # 直接复用其结果), next()中按K线索引读取
+        indicators = precomputed(self.data)
+        ohlcv = indicators.ohlcv
+        periods = (self.params.entry_period, self.params.exit_period, self.params.atr_period)
+        self._high_n, self._low_n, self._atr = indicators.get(
+            ('turtle',) + periods,
+            lambda: turtle_channels(ohlcv.high, ohlcv.low, ohlcv.close, *periods)
+        )
+        # 与bt.indicators.Highest/Lowest/ATR/SMA的最小周期一致
+        self._warmup = max(self.params.entry_period, self.params.exit_period,
+                           self.params.atr_period + 1)
         if self.params.trend_filter:
-            self.trend_sma = bt.indicators.SMA(self.data.close, period=self.params.trend_period)
+            self._trend_sma = indicators.sma('close', self.params.trend_period)
+            self._warmup = max(self._warmup, self.params.trend_period)
+        self._trend_filter = self.params.trend_filter
+        self._bar = 0  # 已处理的K线数(策略无指标, 每根K线都会调用next)
+        
+        # 缓存next()中使用的参数, 避免每根K线的参数查找
+        self._atr_multiplier = self.params.atr_multiplier
+        self._position_size = self.params.position_size
         
         self.order = None
         self.buy_price = None
-        self.trades = []
+        self.trades = ReturnBuffer()
         
+    def start(self):
+        self._cash = self.broker.getcash()
+    
     def notify_order(self, order):
         if order.status in [order.Completed]:
+            self._cash = self.broker.getcash()
             if order.isbuy():
                 self.buy_price = order.executed.price
             elif order.issell() and self.buy_price:
@@ -227,24 +342,26 @@ class ImprovedTurtleStrategy(bt.Strategy):
         self.order = None
     
     def next(self):
-        if self.order or len(self.atr) < self.params.atr_period:
+        self._bar += 1
+        if self.order or self._bar < self._warmup:
             return
             
+        i = self._bar - 1
         current_price = self.data.close[0]
-        high_n = self.high_n[0]
-        low_n = self.low_n[0]
+        high_n = self._high_n[i]
+        low_n = self._low_n[i]
         
         # 趋势过滤
         trend_ok = True
-        if self.params.trend_filter and len(self.trend_sma) > 0:
-            trend_ok = current_price > self.trend_sma[0]
+        if self._trend_filter:
+            trend_ok = current_price > self._trend_sma[i]
         
         # 突破买入
         if not self.position and current_price >= high_n and trend_ok:
             # 基于ATR计算仓位
-            atr_val = self.atr[0]
-            account_value = self.broker.getvalue()
-            risk_amount = account_value * self.params.position_size
+            atr_val = self._atr[i]
+            account_value = self._cash  # 空仓时账户价值即现金
+            risk_amount = account_value * self._position_size
             shares = risk_amount / atr_val
             
             if shares > 0:
@@ -252,7 +369,7 @@ class ImprovedTurtleStrategy(bt.Strategy):
         
         # 突破退出或ATR止损
         elif self.position and self.buy_price:
-            atr_stop_price = self.buy_price - (self.params.atr_multiplier * self.atr[0])
+            atr_stop_price = self.buy_price - (self._atr_multiplier * self._atr[i])
             
             if current_price <= low_n or current_price <= atr_stop_price:
                 self.order = self.sell(size=self.position.size)
@@ -273,18 +390,59 @@ class ImprovedMomentumStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        self.momentum = bt.indicators.ROC(self.data.close, period=self.params.momentum_period)
-        self.volume_sma = bt.indicators.SMA(self.data.volume, period=self.params.volume_period)
-        
+        # 动量、成交量比率与RSI过滤条件整段向量化预计算, next()中按K线索引读取
+        indicators = precomputed(self.data)
+        self._momentum = indicators.roc('close', self.params.momentum_period) / 100  # 转换为小数
+        volume = indicators.ohlcv.volume
+        self._volume_ratio = _volume_ratio(volume,
+                                           indicators.sma('volume', self.params.volume_period))
+        # 与各bt指标的最小周期一致: ROC需period+1根, SMA需period根, RSI需period+1根
+        self._warmup = max(self.params.momentum_period + 1, self.params.volume_period)
         if self.params.rsi_filter:
-            self.rsi = bt.indicators.RSI(self.data.close, period=self.params.rsi_period)
+            # RSI过滤: 避免在超买区域买入
+            self._rsi_ok = indicators.rsi(self.params.rsi_period) < 75
+            self._warmup = max(self._warmup, self.params.rsi_period + 1)
+        else:
+            self._rsi_ok = np.ones(volume.shape[0], dtype=np.bool_)
+        self._bar = 0  # 已处理的K线数(策略无指标, 每根K线都会调用next)
+        
+        # 缓存next()中使用的参数, 避免每根K线的参数查找
+        self._momentum_threshold = self.params.momentum_threshold
+        self._volume_threshold = self.params.volume_threshold
+        self._stop_loss = self.params.stop_loss
+        self._take_profit = self.params.take_profit
+        self._position_size = self.params.position_size
         
         self.order = None
         self.buy_price = None
-        self.trades = []
+        self.trades = ReturnBuffer()
+    
+    @classmethod
+    def vectorized_signals(cls, ohlcv, p):
+        """向量化入场/出场信号(供VectorizedBacktester使用)"""
+        close = ohlcv.close
+        momentum = rate_of_change(close, p['momentum_period']) / 100
+        volume_ratio = _volume_ratio(ohlcv.volume,
+                                     moving_average(ohlcv.volume, p['volume_period']))
+        entry = (momentum > p['momentum_threshold']) & (volume_ratio > p['volume_threshold'])
+        warmup = max(p['momentum_period'] + 1, p['volume_period'])
+        if p['rsi_filter']:
+            entry &= rsi_wilder(close, p['rsi_period']) < 75
+            warmup = max(warmup, p['rsi_period'] + 1)
+        return {
+            'entry': entry,
+            'exit': momentum < p['momentum_threshold'] * 0.2,
+            'warmup': warmup,
+            'stop_loss': p['stop_loss'],
+            'take_profit': p['take_profit'],
+        }
         
+    def start(self):
+        self._cash = self.broker.getcash()
+    
     def notify_order(self, order):
         if order.status in [order.Completed]:
+            self._cash = self.broker.getcash()
             if order.isbuy():
                 self.buy_price = order.executed.price
             elif order.issell() and self.buy_price:
@@ -293,38 +451,76 @@ class ImprovedMomentumStrategy(bt.Strategy):
         self.order = None
     
     def next(self):
-        if self.order or len(self.momentum) < self.params.momentum_period:
+        self._bar += 1
+        if self.order or self._bar < self._warmup:
             return
-            
-        current_price = self.data.close[0]
-        momentum_val = self.momentum[0] / 100  # 转换为小数
-        volume_ratio = self.data.volume[0] / self.volume_sma[0] if len(self.volume_sma) > 0 else 1
         
-        # RSI过滤
-        rsi_ok = True
-        if self.params.rsi_filter and len(self.rsi) > 0:
-            rsi_ok = self.rsi[0] < 75  # 避免在超买区域买入
+        i = self._bar - 1
+        current_price = self.data.close[0]
+        momentum_val = self._momentum[i]
         
         # 动量突破买入
         if (not self.position and 
-            momentum_val > self.params.momentum_threshold and
-            volume_ratio > self.params.volume_threshold and
-            rsi_ok):
+            momentum_val > self._momentum_threshold and
+            self._volume_ratio[i] > self._volume_threshold and
+            self._rsi_ok[i]):
             
-            size = (self.broker.getcash() * self.params.position_size) / current_price
+            size = (self._cash * self._position_size) / current_price
             self.order = self.buy(size=size)
         
         # 动量衰减或止损止盈卖出
         elif self.position and self.buy_price:
             return_pct = (current_price - self.buy_price) / self.buy_price
             
-            if (momentum_val < self.params.momentum_threshold * 0.2 or
-                return_pct < -self.params.stop_loss or
-                return_pct > self.params.take_profit):
+            if (momentum_val < self._momentum_threshold * 0.2 or
+                return_pct < -self._stop_loss or
+                return_pct > self._take_profit):
                 
                 self.order = self.sell(size=self.position.size)
 
 
+def sweep_improved_momentum(close, volume, momentum_periods, volume_periods,
+                            momentum_thresholds, params=None,
+                            initial_cash=10000.0, commission=0.001):
+    """
+    ImprovedMomentumStrategy的参数网格并行扫描
+    
+    对 momentum_period × volume_period × momentum_threshold 的全部组合运行
+    含手续费的向量化回测(编译内核中按组合多线程并行, 不经过Cerebro);
+    RSI与扫描维度无关, 只计算一次。以信号K线收盘价成交, 最终结果仍应
+    使用Backtrader策略验证。
+    
+    参数:
+    - close, volume: 收盘价与成交量数组
+    - momentum_periods, volume_periods, momentum_thresholds: 扫描的取值
+    - params: 覆盖其余默认参数的字典
+    
+    返回:
+    - DataFrame: 每行一组参数及其final_value, return_pct
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    volume = np.ascontiguousarray(volume, dtype=np.float64)
+    p = strategy_params(ImprovedMomentumStrategy, params)
+    
+    if p['rsi_filter']:
+        rsi = rsi_wilder(close, p['rsi_period'])
+    else:
+        rsi = np.zeros(close.shape[0])  # 不过滤时所有K线都满足 rsi < 75
+    
+    combos = list(itertools.product(momentum_periods, volume_periods, momentum_thresholds))
+    grid = np.array([(mp, vp, mt, p['volume_threshold'], p['stop_loss'], p['take_profit'])
+                     for mp, vp, mt in combos], dtype=np.float64).reshape(-1, 6)
+    
+    values = sweep_momentum(close, volume, rsi, grid, 75.0, float(initial_cash),
+                            float(commission), float(p['position_size']))
+    
+    results = pd.DataFrame(combos, columns=['momentum_period', 'volume_period',
+                                            'momentum_threshold'])
+    results['final_value'] = values
+    results['return_pct'] = (values / initial_cash - 1) * 100
+    return results
+
+
 class ImprovedGridStrategy(bt.Strategy):
     """改进版网格策略"""
     params = (
@@ -340,17 +536,36 @@ class ImprovedGridStrategy(bt.Strategy):
     )
     
     def __init__(self):
+        # 趋势均线取自共享的预计算缓存, next()中按K线索引读取
         if self.params.use_trend_filter:
-            self.trend_sma = bt.indicators.SMA(self.data.close, period=self.params.trend_period)
+            self._trend_sma = precomputed(self.data).sma('close', self.params.trend_period)
+            self._warmup = self.params.trend_period  # 与bt.indicators.SMA的最小周期一致
+            self._bar = 0  # 已处理的K线数(策略无指标, 每根K线都会调用next)
+        
+        # use_trend_filter在回测中不变, 按参数绑定对应的next实现, 避免每根K线判断
+        self.next = self._next_with_trend if self.params.use_trend_filter else self._next_no_trend
         
-        self.grid_orders = {}  # 存储网格订单
+        # 缓存next()中使用的参数, 避免每根K线的参数查找
+        self._max_loss_pct = self.params.max_loss_pct
+        self._max_position = self.params.max_position
+        
+        # 网格价位在首根K线确定基准价后一次性生成(见_build_grid)
+        self._buy_levels = None
+        self._sell_levels = None
+        self._neg_buy_thresholds = None
+        self._filled = None   # 各网格是否持仓
+        self._sizes = None    # 各网格的持仓数量
         self.total_position = 0.0
         self.base_price = None
         self.initial_cash = None
-        self.trades = []
+        self.trades = ReturnBuffer()
         
+    def start(self):
+        self._cash = self.broker.getcash()
+    
     def notify_order(self, order):
         if order.status in [order.Completed]:
+            self._cash = self.broker.getcash()
             if order.isbuy():
                 self.total_position += order.executed.size
             elif order.issell():
@@ -358,54 +573,53 @@ class ImprovedGridStrategy(bt.Strategy):
                 profit = order.executed.value - (order.executed.size * self.base_price)
                 self.trades.append(profit)
     
-    def next(self):
+    def _build_grid(self):
+        """按基准价生成各网格的买入/卖出价位(价位在整个回测中不变)"""
+        levels = self.params.grid_levels
+        spacing = self.params.grid_spacing
+        self._buy_levels = self.base_price - np.arange(1, levels + 1) * spacing
+        self._sell_levels = self._buy_levels + spacing * (1 + self.params.take_profit_pct)
+        # 买入阈值取负, 供grid_actions比较
+        self._neg_buy_thresholds = -self._buy_levels * 1.002
+        self._filled = np.zeros(levels, dtype=np.bool_)
+        self._sizes = np.full(levels, self.params.base_order_size)
+    
+    def _next_with_trend(self):
+        self._bar += 1
+        if self._bar < self._warmup:
+            return
+        # 趋势过滤: 在下跌趋势中暂停买入，在上涨趋势中正常操作
+        current_price = self.data.close[0]
+        self._grid_next(current_price, current_price >= self._trend_sma[self._bar - 1] * 0.95)
+    
+    def _next_no_trend(self):
+        self._grid_next(self.data.close[0], True)
+    
+    def _grid_next(self, current_price, trend_ok):
+        """网格主逻辑(由__init__中绑定的next调用)"""
         if self.initial_cash is None:
             self.initial_cash = self.broker.getvalue()
             self.base_price = self.data.open[0]
-        
-        current_price = self.data.close[0]
+            self._build_grid()
         
         # 整体止损检查
-        current_value = self.broker.getvalue()
+        current_value = self._cash + self.position.size * current_price
         total_loss_pct = (current_value - self.initial_cash) / self.initial_cash
         
-        if total_loss_pct < -self.params.max_loss_pct:
+        if total_loss_pct < -self._max_loss_pct:
             if self.total_position > 0:
                 self.sell(size=self.total_position)
             return
         
-        # 趋势过滤
-        trend_ok = True
-        if self.params.use_trend_filter and len(self.trend_sma) > 0:
-            # 在下跌趋势中减少买入，在上涨趋势中正常操作
-            if current_price < self.trend_sma[0] * 0.95:
-                trend_ok = False
-        
-        # 计算网格水平
-        for i in range(1, self.params.grid_levels + 1):
-            buy_level = self.base_price - (i * self.params.grid_spacing)
-            sell_level = buy_level + self.params.grid_spacing * (1 + self.params.take_profit_pct)
-            
-            grid_key = f"grid_{i}"
-            
-            # 网格买入
-            if (trend_ok and
-                current_price <= buy_level * 1.002 and 
-                grid_key not in self.grid_orders and
-                self.total_position < self.params.max_position):
-                
-                order = self.buy(size=self.params.base_order_size)
-                if order:
-                    self.grid_orders[grid_key] = {
-                        'buy_level': buy_level,
-                        'sell_level': sell_level,
-                        'size': self.params.base_order_size
-                    }
-            
-            # 网格卖出
-            elif (grid_key in self.grid_orders and 
-                  current_price >= self.grid_orders[grid_key]['sell_level']):
-                
-                order = self.sell(size=self.grid_orders[grid_key]['size'])
-                if order:
-                    del self.grid_orders[grid_key]
\ No newline at end of file
+        # 网格买入/卖出判断在编译内核中一次遍历完成
+        actions = grid_actions(current_price, self._neg_buy_thresholds, self._sell_levels,
+                               self._filled,
+                               trend_ok and self.total_position < self._max_position)
+        
+        # 按网格顺序下单(与逐个网格检查时的下单顺序一致)
+        for k in np.flatnonzero(actions):
+            if actions[k] > 0:
+                if self.buy(size=self._sizes[k]):
+                    self._filled[k] = True
+            elif self.sell(size=self._sizes[k]):
+                self._filled[k] = False
\ No newline at end of file
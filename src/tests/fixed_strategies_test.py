@@ -7,12 +7,17 @@ import sys
 import os
 import warnings
 warnings.filterwarnings('ignore')
+from concurrent.futures import ProcessPoolExecutor
 
 import backtrader as bt
 import pandas as pd
 import numpy as np
 from btc_data import BTCDataFeed
 
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from strategies._cache import precomputed
+
 
 class FixedRSIStrategy(bt.Strategy):
     """修复版RSI策略"""
@@ -25,22 +30,33 @@ class FixedRSIStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        self.rsi = bt.indicators.RSI(self.data.close, period=self.params.rsi_period)
+        # RSI与买卖信号整段预计算, next()中按K线索引读取
+        rsi = precomputed(self.data).rsi(self.params.rsi_period)
+        self._entry_mask = rsi < self.params.rsi_oversold
+        self._exit_mask = rsi > self.params.rsi_overbought
+        self._warmup = self.params.rsi_period + 1  # 与bt.indicators.RSI的最小周期一致
+        
+        # 缓存next()中使用的参数, 避免每根K线的参数查找
+        self._stop_loss = self.params.stop_loss
+        self._take_profit = self.params.take_profit
+        
+        self._bar = 0  # 已处理的K线数(策略无指标, 每根K线都会调用next)
         self.order = None
         self.buy_price = None
         
     def next(self):
+        self._bar += 1
         if self.order:
             return
         
         # 确保RSI有值
-        if len(self.rsi) < self.params.rsi_period:
+        if self._bar < self._warmup:
             return
-            
+        
+        i = self._bar - 1
         current_price = self.data.close[0]
-        rsi_val = self.rsi[0]
         
-        if not self.position and rsi_val < self.params.rsi_oversold:
+        if not self.position and self._entry_mask[i]:
             size = 0.95 * self.broker.getcash() / current_price
             self.order = self.buy(size=size)
             self.buy_price = current_price
@@ -48,9 +64,9 @@ class FixedRSIStrategy(bt.Strategy):
         elif self.position and self.buy_price:
             return_pct = (current_price - self.buy_price) / self.buy_price
             
-            if (rsi_val > self.params.rsi_overbought or
-                return_pct < -self.params.stop_loss or
-                return_pct > self.params.take_profit):
+            if (self._exit_mask[i] or
+                return_pct < -self._stop_loss or
+                return_pct > self._take_profit):
                 self.order = self.sell(size=self.position.size)
     
     def notify_order(self, order):
@@ -69,28 +85,39 @@ class FixedMACDStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        self.macd = bt.indicators.MACDHisto(
-            self.data.close,
-            period_me1=self.params.fast_period,
-            period_me2=self.params.slow_period,
-            period_signal=self.params.signal_period
-        )
+        # MACD金叉/死叉整段预计算, next()中按K线索引读取
+        macd, signal = precomputed(self.data).macd(self.params.fast_period,
+                                                   self.params.slow_period,
+                                                   self.params.signal_period)
+        self._entry_mask = np.zeros(macd.shape[0], dtype=np.bool_)
+        self._exit_mask = np.zeros(macd.shape[0], dtype=np.bool_)
+        self._entry_mask[1:] = (macd[1:] > signal[1:]) & (macd[:-1] <= signal[:-1])
+        self._exit_mask[1:] = (macd[1:] < signal[1:]) & (macd[:-1] >= signal[:-1])
+        # 与bt.indicators.MACDHisto的最小周期一致
+        self._warmup = (max(self.params.fast_period, self.params.slow_period)
+                        + self.params.signal_period - 1)
+        
+        # 缓存next()中使用的参数, 避免每根K线的参数查找
+        self._stop_loss = self.params.stop_loss
+        self._take_profit = self.params.take_profit
+        
+        self._bar = 0  # 已处理的K线数(策略无指标, 每根K线都会调用next)
         self.order = None
         self.buy_price = None
         
     def next(self):
+        self._bar += 1
         if self.order:
             return
         
         # 确保MACD有足够数据
-        if len(self.macd) < max(self.params.fast_period, self.params.slow_period):
+        if self._bar < self._warmup:
             return
-            
+        
+        i = self._bar - 1
         current_price = self.data.close[0]
-        macd_line = self.macd.macd[0]
-        signal_line = self.macd.signal[0]
         
-        if not self.position and macd_line > signal_line and self.macd.macd[-1] <= self.macd.signal[-1]:
+        if not self.position and self._entry_mask[i]:
             size = 0.95 * self.broker.getcash() / current_price
             self.order = self.buy(size=size)
             self.buy_price = current_price
@@ -98,9 +125,9 @@ class FixedMACDStrategy(bt.Strategy):
         elif self.position and self.buy_price:
             return_pct = (current_price - self.buy_price) / self.buy_price
             
-            if (macd_line < signal_line and self.macd.macd[-1] >= self.macd.signal[-1] or
-                return_pct < -self.params.stop_loss or
-                return_pct > self.params.take_profit):
+            if (self._exit_mask[i] or
+                return_pct < -self._stop_loss or
+                return_pct > self._take_profit):
                 self.order = self.sell(size=self.position.size)
     
     def notify_order(self, order):
@@ -118,26 +145,34 @@ class SimpleBollingerStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        self.bb = bt.indicators.BollingerBands(
-            self.data.close,
-            period=self.params.bb_period,
-            devfactor=self.params.bb_dev
-        )
+        # 布林带与触轨信号整段预计算, next()中按K线索引读取
+        indicators = precomputed(self.data)
+        close = indicators.ohlcv.close
+        mid, std = indicators.mean_std('close', self.params.bb_period)
+        self._entry_mask = close <= mid - self.params.bb_dev * std
+        self._exit_mask = close >= mid + self.params.bb_dev * std
+        self._warmup = self.params.bb_period
+        
+        # 缓存next()中使用的参数, 避免每根K线的参数查找
+        self._stop_loss = self.params.stop_loss
+        self._take_profit = self.params.take_profit
+        
+        self._bar = 0  # 已处理的K线数(策略无指标, 每根K线都会调用next)
         self.order = None
         self.buy_price = None
         
     def next(self):
+        self._bar += 1
         if self.order:
             return
             
-        if len(self.bb) < self.params.bb_period:
+        if self._bar < self._warmup:
             return
-            
+        
+        i = self._bar - 1
         current_price = self.data.close[0]
-        bb_top = self.bb.top[0]
-        bb_bot = self.bb.bot[0]
         
-        if not self.position and current_price <= bb_bot:
+        if not self.position and self._entry_mask[i]:
             size = 0.95 * self.broker.getcash() / current_price
             self.order = self.buy(size=size)
             self.buy_price = current_price
@@ -145,9 +180,9 @@ class SimpleBollingerStrategy(bt.Strategy):
         elif self.position and self.buy_price:
             return_pct = (current_price - self.buy_price) / self.buy_price
             
-            if (current_price >= bb_top or
-                return_pct < -self.params.stop_loss or
-                return_pct > self.params.take_profit):
+            if (self._exit_mask[i] or
+                return_pct < -self._stop_loss or
+                return_pct > self._take_profit):
                 self.order = self.sell(size=self.position.size)
     
     def notify_order(self, order):
@@ -155,8 +190,13 @@ class SimpleBollingerStrategy(bt.Strategy):
             self.order = None
 
 
-def run_strategy_test(strategy_class, strategy_name, params=None):
-    """运行单个策略测试"""
+def run_strategy_test(strategy_class, strategy_name, params=None, raw_data=None):
+    """
+    运行单个策略测试
+    
+    raw_data为get_backtrader_data返回的DataFrame, 为None时自行获取2025年数据。
+    模块级函数, 可在子进程中执行, 由DataFrame在进程内创建数据源。
+    """
     try:
         cerebro = bt.Cerebro()
         
@@ -166,11 +206,14 @@ def run_strategy_test(strategy_class, strategy_name, params=None):
             cerebro.addstrategy(strategy_class)
         
         # 获取2025年数据
-        btc_feed = BTCDataFeed()
-        bt_data, raw_data = btc_feed.get_backtrader_data("2025-01-01", "2025-08-23")
-        
-        if bt_data is None:
-            return None
+        if raw_data is None:
+            btc_feed = BTCDataFeed()
+            bt_data, raw_data = btc_feed.get_backtrader_data("2025-01-01", "2025-08-23",
+                                                             cache_dir='data_cache')
+            if bt_data is None:
+                return None
+        else:
+            bt_data = BTCDataFeed.to_backtrader_feed(raw_data)
             
         cerebro.adddata(bt_data)
         cerebro.broker.setcash(10000.0)
@@ -211,14 +254,26 @@ def main():
     
     results = []
     
-    for name, strategy_class, params in strategies:
-        print(f"🔄 测试 {name}...")
-        result = run_strategy_test(strategy_class, name, params)
-        if result:
-            results.append(result)
-            print(f"   ✅ 收益率: {result['return_pct']:.2f}%")
-        else:
-            print(f"   ❌ 测试失败")
+    # 数据只获取一次, 传给各子进程创建数据源
+    _, raw_data = BTCDataFeed().get_backtrader_data("2025-01-01", "2025-08-23",
+                                                    cache_dir='data_cache')
+    if raw_data is None:
+        print("❌ 无法获取数据")
+        return results
+    
+    # 各策略回测相互独立, 并行运行并按计划顺序输出结果
+    with ProcessPoolExecutor(max_workers=min(len(strategies), os.cpu_count())) as executor:
+        futures = [executor.submit(run_strategy_test, strategy_class, name, params, raw_data)
+                   for name, strategy_class, params in strategies]
+        
+        for (name, strategy_class, params), future in zip(strategies, futures):
+            print(f"🔄 测试 {name}...")
+            result = future.result()
+            if result:
+                results.append(result)
+                print(f"   ✅ 收益率: {result['return_pct']:.2f}%")
+            else:
+                print(f"   ❌ 测试失败")
     
     return results
 
@@ -6,6 +6,43 @@
 import backtrader as bt
 import pandas as pd
 import numpy as np
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from strategies._cache import precomputed
+from strategies._kernels import dynamic_bollinger, rsi_wilder, moving_average
+from utils.trade_buffer import ReturnBuffer
+
+
+def _volume_confirmation(indicators, period, factor):
+    """成交量高于其period日均线factor倍的K线(布尔数组, 均线预热期为False)"""
+    volume = indicators.ohlcv.volume
+    volume_sma = indicators.sma('volume', period)
+    return indicators.get(('volume_confirm', period, factor), lambda: volume > volume_sma * factor)
+
+
+def _macd_cross_signal(macd, signal):
+    """MACD交叉信号(int8数组): 金叉为1, 死叉为-1, 其余为0(首根K线无前值, 为0)"""
+    cross = np.zeros(macd.shape[0], dtype=np.int8)
+    cross[1:][(macd[:-1] <= signal[:-1]) & (macd[1:] > signal[1:])] = 1
+    cross[1:][(macd[:-1] >= signal[:-1]) & (macd[1:] < signal[1:])] = -1
+    return cross
+
+
+def _first_exit_bar(start, close, exit_signal, buy_price, stop_loss, take_profit):
+    """
+    买入后最早可能卖出的K线索引(出场信号/止损/止盈), 之后都不触发时为K线数
+    
+    收益率与next()中逐K线的判断按相同顺序计算, 此前的K线不可能卖出, 可以跳过。
+    stop_loss可为标量或与close等长的数组(如ATR动态止损)。
+    """
+    if isinstance(stop_loss, np.ndarray):
+        stop_loss = stop_loss[start:]
+    return_pct = (close[start:] - buy_price) / buy_price
+    hits = np.flatnonzero(exit_signal[start:] | (return_pct < -stop_loss) | (return_pct > take_profit))
+    return start + int(hits[0]) if hits.shape[0] else close.shape[0]
 
 
 class OptimizedRSIStrategy(bt.Strategy):
@@ -31,59 +68,109 @@ class OptimizedRSIStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        self.rsi = bt.indicators.RSI(self.data.close, period=self.params.rsi_period)
-        self.volume_sma = bt.indicators.SMA(self.data.volume, period=20)
+        # RSI与成交量确认由编译内核一次性预计算, 阈值比较整段向量化为布尔数组,
+        # next()中按K线索引读取
+        indicators = precomputed(self.data)
+        rsi = indicators.rsi(self.params.rsi_period)
+        self._entry = rsi < self.params.rsi_oversold
+        if self.params.volume_confirm:
+            self._entry &= _volume_confirmation(indicators, 20, 1.1)
+        self._rsi_exit = rsi > self.params.rsi_overbought
+        self._close_values = indicators.ohlcv.close
+        self._warmup = max(self.params.rsi_period + 1, 20)  # 与bt指标的最小周期一致
+        self._bar = 0  # 已处理的K线数(策略无指标, 每根K线都会调用next)
+        
+        # 缓存next()中使用的参数与数据线, 避免每根K线的属性查找
+        self._close = self.data.close
+        self._stop_loss = self.params.stop_loss
+        self._take_profit = self.params.take_profit
+        self._position_size = self.params.position_size
+        self._print_log = self.params.print_log
+        
         self.order = None
         self.buy_price = None
-        self.trades = []
+        # 是否持仓: 只在订单成交时变化, 由notify_order维护, 避免next()中
+        # 每根K线经由broker查询self.position
+        self._in_position = False
+        self._exit_bar = 0  # 持仓时最早可能卖出的K线索引, 买入成交时计算
+        self.trades = ReturnBuffer()
         
+    @classmethod
+    def vectorized_signals(cls, ohlcv, p):
+        """向量化入场/出场信号(供VectorizedBacktester使用)"""
+        rsi = rsi_wilder(ohlcv.close, p['rsi_period'])
+        entry = rsi < p['rsi_oversold']
+        if p['volume_confirm']:
+            entry &= ohlcv.volume > moving_average(ohlcv.volume, 20) * 1.1
+        return {
+            'entry': entry,
+            'exit': rsi > p['rsi_overbought'],
+            'warmup': max(p['rsi_period'] + 1, 20),
+            'stop_loss': p['stop_loss'],
+            'take_profit': p['take_profit'],
+        }
+    
     def log(self, txt, dt=None):
-        if self.params.print_log:
+        if self._print_log:
             dt = dt or self.datas[0].datetime.date(0)
             print(f'{dt.isoformat()}, {txt}')
     
+    def start(self):
+        # 现金只在订单成交时变化: 开始时读取一次, 之后在notify_order中刷新
+        self._cash = self.broker.getcash()
+    
     def notify_order(self, order):
         if order.status in [order.Completed]:
+            self._cash = self.broker.getcash()
             if order.isbuy():
+                self._in_position = True
                 self.buy_price = order.executed.price
+                # 成交在本K线的next()之前通知, 即将处理的K线索引为self._bar
+                self._exit_bar = _first_exit_bar(self._bar, self._close_values, self._rsi_exit,
+                                                 self.buy_price, self._stop_loss, self._take_profit)
                 self.log(f'买入: {order.executed.price:.2f}')
             elif order.issell():
+                self._in_position = False
                 profit_pct = ((order.executed.price - self.buy_price) / self.buy_price) * 100
                 self.trades.append(profit_pct)
                 self.log(f'卖出: {order.executed.price:.2f}, 收益: {profit_pct:.2f}%')
         self.order = None
     
     def next(self):
-        if self.order or len(self.rsi) < self.params.rsi_period:
+        self._bar += 1
+        if self.order or self._bar < self._warmup:
             return
             
-        current_price = self.data.close[0]
-        rsi_val = self.rsi[0]
+        i = self._bar - 1
+        # 跳过不可能下单的K线: 空仓时只处理入场信号K线, 持仓时从最早可能卖出的K线开始
+        if self._in_position:
+            if i < self._exit_bar:
+                return
+        elif not self._entry[i]:
+            return
         
-        # 成交量确认
-        volume_confirm = True
-        if self.params.volume_confirm and len(self.volume_sma) > 0:
-            volume_confirm = self.data.volume[0] > self.volume_sma[0] * 1.1
+        current_price = self._close[0]
         
         # 买入条件: RSI超卖 + 成交量确认
-        if not self.position and rsi_val < self.params.rsi_oversold and volume_confirm:
-            size = (self.broker.getcash() * self.params.position_size) / current_price
+        if not self._in_position and self._entry[i]:
+            size = (self._cash * self._position_size) / current_price
             self.order = self.buy(size=size)
             
         # 卖出条件
-        elif self.position and self.buy_price:
+        elif self._in_position and self.buy_price:
             return_pct = (current_price - self.buy_price) / self.buy_price
             
             # RSI超买 or 止损 or 止盈
-            if (rsi_val > self.params.rsi_overbought or
-                return_pct < -self.params.stop_loss or
-                return_pct > self.params.take_profit):
+            if (self._rsi_exit[i] or
+                return_pct < -self._stop_loss or
+                return_pct > self._take_profit):
                 self.order = self.sell(size=self.position.size)
     
     def stop(self):
         if self.params.print_log and self.trades:
-            win_rate = len([t for t in self.trades if t > 0]) / len(self.trades)
-            avg_return = sum(self.trades) / len(self.trades)
+            returns = self.trades.values
+            win_rate = (returns > 0).mean()
+            avg_return = returns.mean()
             self.log(f'优化RSI策略 - 交易次数: {len(self.trades)}, 胜率: {win_rate:.2%}, 平均收益: {avg_return:.2f}%')
 
 
@@ -112,81 +199,105 @@ class OptimizedMACDStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        self.macd = bt.indicators.MACDHisto(
-            self.data.close,
-            period_me1=self.params.fast_period,
-            period_me2=self.params.slow_period,
-            period_signal=self.params.signal_period
-        )
-        self.ema_trend = bt.indicators.EMA(self.data.close, period=self.params.ema_trend)
-        self.rsi = bt.indicators.RSI(self.data.close, period=self.params.rsi_period)
-        self.atr = bt.indicators.ATR(self.data, period=self.params.atr_period)
+        # MACD/EMA/RSI/ATR由编译内核一次性预计算; 金叉/死叉与入场过滤条件
+        # 整段向量化为信号数组, next()中按K线索引读取
+        p = self.params
+        indicators = precomputed(self.data)
+        macd, signal = indicators.macd(p.fast_period, p.slow_period, p.signal_period)
+        self._cross = indicators.get(('macd_cross', p.fast_period, p.slow_period, p.signal_period),
+                                     lambda: _macd_cross_signal(macd, signal))
+        close = self._close_values = indicators.ohlcv.close
+        # 买入条件: MACD金叉 + 价格在EMA上方 + RSI不超买
+        self._entry = ((self._cross == 1) & (close > indicators.ema('close', p.ema_trend)) &
+                       (indicators.rsi(p.rsi_period) < 70))
+        self._death_cross = self._cross == -1
+        self._atr = indicators.atr(p.atr_period)
+        # 与bt.indicators.MACDHisto/EMA/RSI/ATR的最小周期一致
+        self._warmup = max(max(p.fast_period, p.slow_period) + p.signal_period - 1,
+                           p.ema_trend, p.rsi_period + 1, p.atr_period + 1)
+        self._bar = 0  # 已处理的K线数(策略无指标, 每根K线都会调用next)
+        
+        # 缓存next()中使用的参数与数据线, 避免每根K线的属性查找
+        self._close = self.data.close
+        self._stop_loss_atr = p.stop_loss_atr
+        self._take_profit = p.take_profit
+        self._position_size = p.position_size
+        self._print_log = p.print_log
         
         self.order = None
         self.buy_price = None
-        self.trades = []
+        # 是否持仓: 只在订单成交时变化, 由notify_order维护, 避免next()中
+        # 每根K线经由broker查询self.position
+        self._in_position = False
+        self._exit_bar = 0  # 持仓时最早可能卖出的K线索引, 买入成交时计算
+        self.trades = ReturnBuffer()
         
     def log(self, txt, dt=None):
-        if self.params.print_log:
+        if self._print_log:
             dt = dt or self.datas[0].datetime.date(0)
             print(f'{dt.isoformat()}, {txt}')
     
+    def start(self):
+        # 现金只在订单成交时变化: 开始时读取一次, 之后在notify_order中刷新
+        self._cash = self.broker.getcash()
+    
     def notify_order(self, order):
         if order.status in [order.Completed]:
+            self._cash = self.broker.getcash()
             if order.isbuy():
+                self._in_position = True
                 self.buy_price = order.executed.price
+                # 成交在本K线的next()之前通知, 即将处理的K线索引为self._bar
+                # ATR动态止损: 不低于8%
+                stop_loss = np.maximum(0.08, (self._atr * self._stop_loss_atr) / self.buy_price)
+                self._exit_bar = _first_exit_bar(self._bar, self._close_values, self._death_cross,
+                                                 self.buy_price, stop_loss, self._take_profit)
                 self.log(f'买入: {order.executed.price:.2f}')
             elif order.issell():
+                self._in_position = False
                 profit_pct = ((order.executed.price - self.buy_price) / self.buy_price) * 100
                 self.trades.append(profit_pct)
                 self.log(f'卖出: {order.executed.price:.2f}, 收益: {profit_pct:.2f}%')
         self.order = None
     
     def next(self):
-        if self.order:
+        self._bar += 1
+        if self.order or self._bar < self._warmup:
             return
             
-        # 确保有足够的数据
-        min_len = max(self.params.slow_period, self.params.ema_trend)
-        if len(self.data) < min_len:
+        i = self._bar - 1
+        # 跳过不可能下单的K线: 空仓时只处理入场信号K线, 持仓时从最早可能卖出的K线开始
+        if self._in_position:
+            if i < self._exit_bar:
+                return
+        elif not self._entry[i]:
             return
-            
-        current_price = self.data.close[0]
-        macd_line = self.macd.macd[0]
-        signal_line = self.macd.signal[0]
-        ema_val = self.ema_trend[0]
-        rsi_val = self.rsi[0]
         
-        # 买入条件: MACD金叉 + 价格在EMA上方 + RSI不超买
-        macd_crossup = macd_line > signal_line and self.macd.macd[-1] <= self.macd.signal[-1]
-        trend_confirm = current_price > ema_val
-        rsi_confirm = rsi_val < 70
+        current_price = self._close[0]
         
-        if not self.position and macd_crossup and trend_confirm and rsi_confirm:
-            size = (self.broker.getcash() * self.params.position_size) / current_price
+        # 买入条件: MACD金叉 + 价格在EMA上方 + RSI不超买
+        if not self._in_position and self._entry[i]:
+            size = (self._cash * self._position_size) / current_price
             self.order = self.buy(size=size)
             
         # 卖出条件
-        elif self.position and self.buy_price:
+        elif self._in_position and self.buy_price:
             return_pct = (current_price - self.buy_price) / self.buy_price
             
-            # MACD死叉
-            macd_crossdown = macd_line < signal_line and self.macd.macd[-1] >= self.macd.signal[-1]
-            
             # ATR动态止损
-            atr_stop_loss = 0
-            if len(self.atr) > 0:
-                atr_stop_loss = (self.atr[0] * self.params.stop_loss_atr) / self.buy_price
+            atr_stop_loss = (self._atr[i] * self._stop_loss_atr) / self.buy_price
             
-            if (macd_crossdown or
+            # MACD死叉 or 止损 or 止盈
+            if (self._death_cross[i] or
                 return_pct < -max(0.08, atr_stop_loss) or  # 动态止损
-                return_pct > self.params.take_profit):
+                return_pct > self._take_profit):
                 self.order = self.sell(size=self.position.size)
     
     def stop(self):
         if self.params.print_log and self.trades:
-            win_rate = len([t for t in self.trades if t > 0]) / len(self.trades)
-            avg_return = sum(self.trades) / len(self.trades)
+            returns = self.trades.values
+            win_rate = (returns > 0).mean()
+            avg_return = returns.mean()
             self.log(f'优化MACD策略 - 交易次数: {len(self.trades)}, 胜率: {win_rate:.2%}, 平均收益: {avg_return:.2f}%')
 
 
@@ -215,101 +326,118 @@ class EnhancedBollingerStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        self.bb = bt.indicators.BollingerBands(
-            self.data.close,
-            period=self.params.bb_period,
-            devfactor=self.params.bb_dev_base
+        # 动态倍数的布林带上下轨由编译内核一次遍历预计算(滚动标准差与波动率比率融合,
+        # 波动率均值为O(1)更新的滑动窗口和), RSI与成交量确认同样预计算, next()中按K线索引读取
+        p = self.params
+        indicators = precomputed(self.data)
+        close = self._close_values = indicators.ohlcv.close
+        rsi = indicators.rsi(p.rsi_period)
+        self._warmup = max(p.rsi_period + 1, p.bb_period)  # 与bt指标的最小周期一致
+        self._bar = 0  # 已处理的K线数(策略无指标, 每根K线都会调用next)
+        bb_top, bb_bot = indicators.get(
+            ('dynamic_bollinger', p.bb_period, p.volatility_period,
+             p.bb_dev_base, p.bb_dev_min, p.bb_dev_max),
+            lambda: dynamic_bollinger(close, p.bb_period, p.volatility_period,
+                                      p.bb_dev_base, p.bb_dev_min, p.bb_dev_max)
         )
-        self.rsi = bt.indicators.RSI(self.data.close, period=self.params.rsi_period)
-        self.volume_sma = bt.indicators.SMA(self.data.volume, period=self.params.bb_period)
-        self.volatility = bt.indicators.StdDev(self.data.close, period=self.params.volatility_period)
+        # 买入条件: 触及下轨(允许小幅偏差) + RSI不超卖(避免极度超卖) + 成交量确认
+        self._entry = ((close <= bb_bot * 1.002) & (rsi > 25) &
+                       _volume_confirmation(indicators, p.bb_period, 1.0))
+        # 信号卖出: 触及上轨 + RSI超买
+        self._exit = (close >= bb_top * 0.998) & (rsi > 75)
+        
+        # 缓存next()中使用的参数与数据线, 避免每根K线的属性查找
+        self._close = self.data.close
+        self._stop_loss = p.stop_loss
+        self._take_profit = p.take_profit
+        self._position_size = p.position_size
+        self._print_log = p.print_log
         
         self.order = None
         self.buy_price = None
-        self.trades = []
-        self.current_bb_dev = self.params.bb_dev_base
+        # 是否持仓: 只在订单成交时变化, 由notify_order维护, 避免next()中
+        # 每根K线经由broker查询self.position
+        self._in_position = False
+        self._exit_bar = 0  # 持仓时最早可能卖出的K线索引, 买入成交时计算
+        self.trades = ReturnBuffer()
         
+    @classmethod
+    def vectorized_signals(cls, ohlcv, p):
+        """向量化入场/出场信号(供VectorizedBacktester使用)"""
+        close = ohlcv.close
+        bb_top, bb_bot = dynamic_bollinger(close, p['bb_period'], p['volatility_period'],
+                                           p['bb_dev_base'], p['bb_dev_min'], p['bb_dev_max'])
+        rsi = rsi_wilder(close, p['rsi_period'])
+        volume_confirm = ohlcv.volume > moving_average(ohlcv.volume, p['bb_period'])
+        return {
+            'entry': (close <= bb_bot * 1.002) & (rsi > 25) & volume_confirm,
+            'exit': (close >= bb_top * 0.998) & (rsi > 75),
+            'warmup': max(p['rsi_period'] + 1, p['bb_period']),
+            'stop_loss': p['stop_loss'],
+            'take_profit': p['take_profit'],
+        }
+    
     def log(self, txt, dt=None):
-        if self.params.print_log:
+        if self._print_log:
             dt = dt or self.datas[0].datetime.date(0)
             print(f'{dt.isoformat()}, {txt}')
     
+    def start(self):
+        # 现金只在订单成交时变化: 开始时读取一次, 之后在notify_order中刷新
+        self._cash = self.broker.getcash()
+    
     def notify_order(self, order):
         if order.status in [order.Completed]:
+            self._cash = self.broker.getcash()
             if order.isbuy():
+                self._in_position = True
                 self.buy_price = order.executed.price
+                # 成交在本K线的next()之前通知, 即将处理的K线索引为self._bar
+                self._exit_bar = _first_exit_bar(self._bar, self._close_values, self._exit,
+                                                 self.buy_price, self._stop_loss, self._take_profit)
                 self.log(f'买入: {order.executed.price:.2f}')
             elif order.issell():
+                self._in_position = False
                 profit_pct = ((order.executed.price - self.buy_price) / self.buy_price) * 100
                 self.trades.append(profit_pct)
                 self.log(f'卖出: {order.executed.price:.2f}, 收益: {profit_pct:.2f}%')
         self.order = None
     
-    def calculate_dynamic_bb_dev(self):
-        """计算动态标准差倍数"""
-        if len(self.volatility) < self.params.volatility_period:
-            return self.params.bb_dev_base
-            
-        # 基于波动率调整
-        current_vol = self.volatility[0]
-        avg_vol = sum(self.volatility.get(size=self.params.volatility_period)) / self.params.volatility_period
-        
-        vol_ratio = current_vol / avg_vol if avg_vol > 0 else 1.0
-        
-        if vol_ratio > 1.2:  # 高波动时扩大布林带
-            bb_dev = min(self.params.bb_dev_max, self.params.bb_dev_base * vol_ratio)
-        elif vol_ratio < 0.8:  # 低波动时缩小布林带
-            bb_dev = max(self.params.bb_dev_min, self.params.bb_dev_base * vol_ratio)
-        else:
-            bb_dev = self.params.bb_dev_base
-            
-        return bb_dev
-    
     def next(self):
-        if self.order or len(self.bb) < self.params.bb_period:
+        self._bar += 1
+        if self.order or self._bar < self._warmup:
             return
             
-        current_price = self.data.close[0]
-        rsi_val = self.rsi[0]
-        
-        # 动态调整布林带
-        self.current_bb_dev = self.calculate_dynamic_bb_dev()
-        
-        # 重新计算布林带
-        bb_mid = self.bb.mid[0]
-        bb_std = self.data.close.get(size=self.params.bb_period).std()
-        bb_top = bb_mid + (bb_std * self.current_bb_dev)
-        bb_bot = bb_mid - (bb_std * self.current_bb_dev)
+        i = self._bar - 1
+        # 跳过不可能下单的K线: 空仓时只处理入场信号K线, 持仓时从最早可能卖出的K线开始
+        if self._in_position:
+            if i < self._exit_bar:
+                return
+        elif not self._entry[i]:
+            return
         
-        # 成交量确认
-        volume_confirm = self.data.volume[0] > self.volume_sma[0] * 1.0
+        current_price = self._close[0]
         
         # 买入条件: 触及下轨 + RSI不超卖 + 成交量确认
-        if (not self.position and 
-            current_price <= bb_bot * 1.002 and  # 允许小幅偏差
-            rsi_val > 25 and  # 避免极度超卖
-            volume_confirm):
-            
-            size = (self.broker.getcash() * self.params.position_size) / current_price
+        if not self._in_position and self._entry[i]:
+            size = (self._cash * self._position_size) / current_price
             self.order = self.buy(size=size)
             
         # 卖出条件
-        elif self.position and self.buy_price:
+        elif self._in_position and self.buy_price:
             return_pct = (current_price - self.buy_price) / self.buy_price
             
             # 触及上轨 + RSI超买 or 止损止盈
-            touch_upper = current_price >= bb_top * 0.998
-            rsi_overbought = rsi_val > 75
-            
-            if ((touch_upper and rsi_overbought) or
-                return_pct < -self.params.stop_loss or
-                return_pct > self.params.take_profit):
+            if (self._exit[i] or
+                return_pct < -self._stop_loss or
+                return_pct > self._take_profit):
                 self.order = self.sell(size=self.position.size)
     
     def stop(self):
         if self.params.print_log and self.trades:
-            win_rate = len([t for t in self.trades if t > 0]) / len(self.trades)
-            avg_return = sum(self.trades) / len(self.trades)
+            returns = self.trades.values
+            win_rate = (returns > 0).mean()
+            avg_return = returns.mean()
             self.log(f'增强布林带策略 - 交易次数: {len(self.trades)}, 胜率: {win_rate:.2%}, 平均收益: {avg_return:.2f}%')
 
 
@@ -337,22 +465,47 @@ class EnhancedGridStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        self.ema_trend = bt.indicators.EMA(self.data.close, period=self.params.trend_ema)
-        self.atr = bt.indicators.ATR(self.data, period=self.params.atr_period)
+        # 趋势EMA与ATR由编译内核一次性预计算, next()中按K线索引读取
+        indicators = precomputed(self.data)
+        self._ema_trend = indicators.ema('close', self.params.trend_ema)
+        self._atr = indicators.atr(self.params.atr_period)
+        # 与bt.indicators.EMA/ATR的最小周期一致
+        self._warmup = max(self.params.trend_ema, self.params.atr_period + 1)
+        self._bar = 0  # 已处理的K线数(策略无指标, 每根K线都会调用next)
+        
+        # 网格编号(相对中心价的档位), 每根K线乘以间距得到各网格价位
+        self._level_ids = np.arange(-self.params.grid_levels//2, self.params.grid_levels//2 + 1)
+        self.grid_levels_held = set()  # 已持仓网格的整数价位
+        
+        # 动态网格间距只依赖ATR, 整段一次向量运算: 基础间距 + ATR调整, 限制在150~500
+        self._spacing = np.clip(self.params.grid_spacing_base + self._atr * 0.8, 150, 500)
+        
+        # 缓存next()中使用的参数, 避免每根K线的参数查找
+        self._close = self.data.close
+        self._use_trend_filter = self.params.use_trend_filter
+        self._order_size = self.params.base_order_size
+        self._max_position = self.params.max_position
+        self._take_profit_ratio = 1 + self.params.take_profit_pct
+        self._print_log = self.params.print_log
         
-        self.grid_levels_dict = {}
         self.active_orders = {}
         self.total_position = 0.0
-        self.trades = []
+        self.trades = ReturnBuffer()
         self.initial_cash = None
         
     def log(self, txt, dt=None):
-        if self.params.print_log:
+        if self._print_log:
             dt = dt or self.datas[0].datetime.date(0)
             print(f'{dt.isoformat()}, {txt}')
     
+    def start(self):
+        # 现金只在订单成交时变化: 开始时读取一次, 之后在notify_order中刷新
+        self._cash = self.broker.getcash()
+        self.initial_cash = self.broker.getvalue()
+    
     def notify_order(self, order):
         if order.status == order.Completed:
+            self._cash = self.broker.getcash()
             if order.isbuy():
                 self.total_position += order.executed.size
                 self.log(f'网格买入: {order.executed.price:.2f}, 仓位: {self.total_position:.4f}')
@@ -365,24 +518,10 @@ class EnhancedGridStrategy(bt.Strategy):
         if hasattr(order, 'ref') and order.ref in self.active_orders:
             del self.active_orders[order.ref]
     
-    def calculate_dynamic_spacing(self, current_price):
-        """基于ATR计算动态网格间距"""
-        if len(self.atr) < self.params.atr_period:
-            return self.params.grid_spacing_base
-            
-        atr_value = self.atr[0]
-        # 网格间距 = 基础间距 + ATR调整
-        dynamic_spacing = self.params.grid_spacing_base + (atr_value * 0.8)
-        
-        return max(150, min(500, dynamic_spacing))  # 限制范围
-    
-    def trend_direction(self):
+    def trend_direction(self, current_price, ema_val):
         """判断趋势方向"""
-        if not self.params.use_trend_filter or len(self.ema_trend) < self.params.trend_ema:
+        if not self._use_trend_filter:
             return 0  # 无趋势过滤
-            
-        current_price = self.data.close[0]
-        ema_val = self.ema_trend[0]
         
         if current_price > ema_val * 1.02:
             return 1  # 上涨趋势
@@ -392,12 +531,15 @@ class EnhancedGridStrategy(bt.Strategy):
             return 0  # 震荡
     
     def next(self):
-        if self.initial_cash is None:
-            self.initial_cash = self.broker.getvalue()
-            
-        current_price = self.data.close[0]
-        trend = self.trend_direction()
-        dynamic_spacing = self.calculate_dynamic_spacing(current_price)
+        self._bar += 1
+        if self._bar < self._warmup:
+            return
+        
+        i = self._bar - 1
+        current_price = self._close[0]
+        center_price = self._ema_trend[i]
+        trend = self.trend_direction(current_price, center_price)
+        dynamic_spacing = self._spacing[i]
         
         # 趋势过滤: 在强趋势中减少逆势交易
         if abs(trend) > 0:
@@ -406,53 +548,92 @@ class EnhancedGridStrategy(bt.Strategy):
         else:
             buy_threshold = 1.002
         
-        # 计算网格水平
-        center_price = self.ema_trend[0] if len(self.ema_trend) > 0 else current_price
-        grid_levels = []
-        for i in range(-self.params.grid_levels//2, self.params.grid_levels//2 + 1):
-            level = center_price + (i * dynamic_spacing)
-            if level > 0:
-                grid_levels.append(level)
+        # 计算网格水平: 以趋势EMA为中心, 网格编号 × 动态间距(一次向量运算)
+        levels = center_price + self._level_ids * dynamic_spacing
+        # 整数价位作为持仓键, 取整方式与"%.0f"格式化相同
+        keys = np.rint(levels).astype(np.int64).tolist()
+        held = np.array([key in self.grid_levels_held for key in keys], dtype=np.bool_)
+        valid = levels > 0  # 确保价格为正
         
-        # 执行网格交易
-        for level in grid_levels:
-            level_key = f"grid_{level:.0f}"
-            
-            # 买入条件
-            if (current_price <= level * buy_threshold and
-                level_key not in self.grid_levels_dict and
-                self.total_position < self.params.max_position and
-                self.broker.getcash() > level * self.params.base_order_size):
-                
-                order = self.buy(size=self.params.base_order_size)
+        # 买入条件: 价格触及网格且该价位未持仓, 仓位与资金充足
+        buy_mask = valid & ~held & (current_price <= levels * buy_threshold)
+        if self.total_position < self._max_position:
+            buy_mask &= self._cash > levels * self._order_size
+        else:
+            buy_mask[:] = False
+        
+        # 卖出条件: 已持仓价位达到止盈
+        sell_mask = valid & held & (current_price >= levels * self._take_profit_ratio)
+        if self.total_position < self._order_size:
+            sell_mask[:] = False
+        
+        # 只遍历触发的网格(通常0~2个), 按网格顺序下单
+        for k in np.flatnonzero(buy_mask | sell_mask):
+            if buy_mask[k]:
+                order = self.buy(size=self._order_size)
                 if order:
                     self.active_orders[order.ref] = order
-                    self.grid_levels_dict[level_key] = {
-                        'level': level,
-                        'size': self.params.base_order_size
-                    }
-            
-            # 卖出条件
-            elif (level_key in self.grid_levels_dict and
-                  current_price >= level * (1 + self.params.take_profit_pct) and
-                  self.total_position >= self.params.base_order_size):
-                
-                order = self.sell(size=self.params.base_order_size)
+                    self.grid_levels_held.add(keys[k])
+            else:
+                order = self.sell(size=self._order_size)
                 if order:
                     self.active_orders[order.ref] = order
-                    del self.grid_levels_dict[level_key]
+                    self.grid_levels_held.discard(keys[k])
     
     def stop(self):
         if self.params.print_log and self.trades:
-            total_profit = sum(self.trades)
-            win_count = len([t for t in self.trades if t > 0])
+            profits = self.trades.values
+            total_profit = profits.sum()
+            win_count = np.count_nonzero(profits > 0)
             self.log(f'增强网格策略 - 网格交易次数: {len(self.trades)}, 盈利次数: {win_count}, 总盈利: {total_profit:.2f}')
 
 
+def _run_backtest(strategy_class, data):
+    """
+    使用Backtrader回测单个策略, 返回最终账户价值
+    
+    模块级函数, 可在子进程中执行; 数据源在回测中被消费, 每次由data(DataFrame)
+    创建独立的feed。
+    """
+    from btc_data import BTCDataFeed
+    
+    cerebro = bt.Cerebro()
+    cerebro.addstrategy(strategy_class, print_log=False)
+    cerebro.adddata(BTCDataFeed.to_backtrader_feed(data))
+    cerebro.broker.setcash(10000.0)
+    cerebro.broker.setcommission(commission=0.001)
+    cerebro.run()
+    return cerebro.broker.getvalue()
+
+
+# 子进程共享的行情数据, 由进程池初始化时传入一次
+_worker_data = None
+
+
+def _init_worker(data):
+    global _worker_data
+    _worker_data = data
+
+
+def _run_worker(strategy_class):
+    """进程池任务: 使用初始化时传入的行情数据回测"""
+    return _run_backtest(strategy_class, _worker_data)
+
+
 # 测试优化策略的函数
-def test_optimized_strategies():
-    """测试所有优化版策略"""
+def test_optimized_strategies(vectorized=False, max_workers=None):
+    """
+    测试所有优化版策略
+    
+    vectorized为True时, 提供vectorized_signals的策略改用向量化回测(不经过Cerebro,
+    以信号K线收盘价成交且不含手续费), 适合快速筛选; 其余策略仍使用Backtrader。
+    
+    Backtrader回测相互独立, 使用进程池并行运行(max_workers默认为CPU核数,
+    为1时顺序运行), 结果按列表顺序输出。
+    """
     from btc_data import BTCDataFeed
+    from utils.vectorized_backtest import VectorizedBacktester
+    from utils.backtest_pool import backtest_pool
     
     strategies = [
         ('优化RSI策略 v2.0', OptimizedRSIStrategy),
@@ -461,40 +642,53 @@ def test_optimized_strategies():
         ('增强网格策略 v2.0', EnhancedGridStrategy),
     ]
     
+    # 2025年数据只获取一次, 各策略共享同一DataFrame
+    btc_feed = BTCDataFeed()
+    raw_data = btc_feed.fetch_data_cached("2025-01-01", "2025-08-23", cache_dir='data_cache')
+    if raw_data is None:
+        return []
+    
+    backtester = VectorizedBacktester(btc_feed.get_shared_ohlcv(raw_data)) if vectorized else None
+    
+    # 需要Backtrader回测的策略先全部提交到进程池
+    pending = [strategy_class for _, strategy_class in strategies
+               if backtester is None or not hasattr(strategy_class, 'vectorized_signals')]
+    executor = None
+    futures = {}
+    if max_workers != 1 and pending:
+        executor = backtest_pool(_init_worker, (raw_data,), max_workers)
+        futures = {strategy_class: executor.submit(_run_worker, strategy_class)
+                   for strategy_class in pending}
+    
     results = []
     
-    for name, strategy_class in strategies:
-        try:
-            cerebro = bt.Cerebro()
-            cerebro.addstrategy(strategy_class, print_log=False)
-            
-            # 获取2025年数据
-            btc_feed = BTCDataFeed()
-            bt_data, raw_data = btc_feed.get_backtrader_data("2025-01-01", "2025-08-23")
-            
-            if bt_data is None:
-                continue
+    try:
+        for name, strategy_class in strategies:
+            try:
+                if backtester is not None and hasattr(strategy_class, 'vectorized_signals'):
+                    result = backtester.run(strategy_class)
+                    total_return = result['total_return'] / 100
+                    final_value = 10000.0 * (1 + total_return)
+                else:
+                    if executor is not None:
+                        final_value = futures[strategy_class].result()
+                    else:
+                        final_value = _run_backtest(strategy_class, raw_data)
+                    total_return = (final_value - 10000.0) / 10000.0
+                results.append({
+                    'name': name,
+                    'return': total_return * 100,
+                    'final_value': final_value
+                })
                 
-            cerebro.adddata(bt_data)
-            cerebro.broker.setcash(10000.0)
-            cerebro.broker.setcommission(commission=0.001)
-            
-            start_value = cerebro.broker.getvalue()
-            cerebro.run()
-            final_value = cerebro.broker.getvalue()
-            
-            total_return = (final_value - start_value) / start_value
-            results.append({
-                'name': name,
-                'return': total_return * 100,
-                'final_value': final_value
-            })
-            
-            status = "🏆" if total_return > 0.30 else "🟢" if total_return > 0.2258 else "🟡" if total_return > 0 else "🔴"
-            print(f"{status} {name}: {total_return*100:.2f}% (${final_value:.2f})")
-            
-        except Exception as e:
-            print(f"❌ {name} 测试失败: {e}")
+                status = "🏆" if total_return > 0.30 else "🟢" if total_return > 0.2258 else "🟡" if total_return > 0 else "🔴"
+                print(f"{status} {name}: {total_return*100:.2f}% (${final_value:.2f})")
+                
+            except Exception as e:
+                print(f"❌ {name} 测试失败: {e}")
+    finally:
+        if executor is not None:
+            executor.shutdown()
     
     return results
 
@@ -503,7 +697,8 @@ if __name__ == "__main__":
     print("🚀 测试优化版策略 (2025年数据)")
     print("="*50)
     
-    results = test_optimized_strategies()
+    results = test_optimized_strategies(vectorized='--vectorized' in sys.argv,
+                                        max_workers=1 if '--serial' in sys.argv else None)
     
     if results:
         print(f"\n📊 优化效果对比:")
@@ -12,10 +12,60 @@ import backtrader as bt
 import pandas as pd
 from btc_data import BTCDataFeed
 from fixed_all_strategies import *
+from utils.vectorized_backtest import VectorizedBacktester
+from utils.backtest_pool import backtest_pool
 
 
-def test_fixed_strategies():
-    """测试所有修复版策略"""
+def _run_backtest(strategy_class, params, data):
+    """
+    使用Backtrader回测单个策略, 返回(收益率%, 最终价值, 交易次数)
+    
+    模块级函数, 可在子进程中执行; 由data(DataFrame)创建独立的数据源。
+    """
+    cerebro = bt.Cerebro()
+    cerebro.addstrategy(strategy_class, **params)
+    
+    cerebro.adddata(BTCDataFeed.to_backtrader_feed(data))
+    cerebro.broker.setcash(10000.0)
+    cerebro.broker.setcommission(commission=0.001)
+    
+    # 运行回测
+    start_value = cerebro.broker.getvalue()
+    strategies = cerebro.run()
+    final_value = cerebro.broker.getvalue()
+    
+    # 计算结果
+    total_return = (final_value - start_value) / start_value
+    
+    # 获取交易记录
+    trades = getattr(strategies[0], 'trades', [])
+    return total_return * 100, final_value, len(trades)
+
+
+# 子进程共享的行情数据, 由进程池初始化时传入一次
+_worker_data = None
+
+
+def _init_worker(data):
+    global _worker_data
+    _worker_data = data
+
+
+def _run_worker(strategy_class, params):
+    """进程池任务: 使用初始化时传入的行情数据回测"""
+    return _run_backtest(strategy_class, params, _worker_data)
+
+
+def test_fixed_strategies(vectorized=False, max_workers=None):
+    """
+    测试所有修复版策略
+    
+    vectorized为True时, 提供vectorized_signals的策略改用向量化回测(不经过Cerebro,
+    以信号K线收盘价成交且不含手续费), 适合快速筛选; 其余策略仍使用Backtrader。
+    
+    Backtrader回测相互独立, 使用进程池并行运行(max_workers默认为CPU核数,
+    为1时顺序运行), 结果按列表顺序输出。
+    """
     
     print("🔧 测试修复版策略")
     print("="*60)
@@ -33,66 +83,72 @@ def test_fixed_strategies():
     btc_feed = BTCDataFeed()
     results = []
     
-    for i, strategy_config in enumerate(strategies_to_test, 1):
-        name = strategy_config[0]
-        strategy_class = strategy_config[1]
-        params = strategy_config[2] if len(strategy_config) > 2 else {}
-        
-        print(f"\n[{i}/{len(strategies_to_test)}] 🔄 测试 {name}...")
-        
-        try:
-            cerebro = bt.Cerebro()
-            cerebro.addstrategy(strategy_class, **params)
+    # 数据只获取一次, 每个策略由同一份DataFrame创建自己的数据源
+    raw_data = btc_feed.fetch_data_cached("2025-01-01", "2025-08-23", cache_dir='data_cache')
+    if raw_data is None:
+        print(f"   ❌ 无法获取数据")
+        return results
+    backtester = VectorizedBacktester(btc_feed.get_shared_ohlcv(raw_data)) if vectorized else None
+    
+    jobs = [(config[0], config[1], config[2] if len(config) > 2 else {})
+            for config in strategies_to_test]
+    
+    # 需要Backtrader回测的策略(按序号)先全部提交到进程池
+    pending = [i for i, (_, strategy_class, _) in enumerate(jobs, 1)
+               if backtester is None or not hasattr(strategy_class, 'vectorized_signals')]
+    executor = None
+    futures = {}
+    if max_workers != 1 and pending:
+        executor = backtest_pool(_init_worker, (raw_data,), max_workers)
+        for i in pending:
+            _, strategy_class, params = jobs[i - 1]
+            futures[i] = executor.submit(_run_worker, strategy_class, params)
+    
+    try:
+        for i, (name, strategy_class, params) in enumerate(jobs, 1):
+            print(f"\n[{i}/{len(jobs)}] 🔄 测试 {name}...")
             
-            # 获取数据
-            bt_data, raw_data = btc_feed.get_backtrader_data("2025-01-01", "2025-08-23")
-            if bt_data is None:
-                print(f"   ❌ 无法获取数据")
-                continue
+            try:
+                if backtester is not None and hasattr(strategy_class, 'vectorized_signals'):
+                    # 向量化回测: 一次编译循环得到全部交易
+                    vectorized_result = backtester.run(strategy_class, **params)
+                    return_pct = vectorized_result['total_return']
+                    final_value = 10000.0 * (1 + return_pct / 100)
+                    trade_count = len(vectorized_result['trades'])
+                elif executor is not None:
+                    return_pct, final_value, trade_count = futures[i].result()
+                else:
+                    return_pct, final_value, trade_count = _run_backtest(strategy_class, params, raw_data)
                 
-            cerebro.adddata(bt_data)
-            cerebro.broker.setcash(10000.0)
-            cerebro.broker.setcommission(commission=0.001)
-            
-            # 运行回测
-            start_value = cerebro.broker.getvalue()
-            strategies = cerebro.run()
-            final_value = cerebro.broker.getvalue()
-            
-            # 计算结果
-            total_return = (final_value - start_value) / start_value
-            return_pct = total_return * 100
-            
-            # 获取交易记录
-            strategy_instance = strategies[0]
-            trades = getattr(strategy_instance, 'trades', [])
-            
-            result = {
-                'name': name,
-                'return_pct': return_pct,
-                'final_value': final_value,
-                'trades': len(trades),
-                'status': 'success'
-            }
-            
-            results.append(result)
-            
-            # 状态显示
-            if return_pct > 30:
-                status = "🏆"
-            elif return_pct > 22.58:
-                status = "🟢"
-            elif return_pct > 10:
-                status = "🟡"
-            elif return_pct > 0:
-                status = "🟠"
-            else:
-                status = "🔴"
+                result = {
+                    'name': name,
+                    'return_pct': return_pct,
+                    'final_value': final_value,
+                    'trades': trade_count,
+                    'status': 'success'
+                }
                 
-            print(f"   {status} {name}: {return_pct:.2f}% (交易: {len(trades)})")
-            
-        except Exception as e:
-            print(f"   ❌ {name} 失败: {str(e)}")
+                results.append(result)
+                
+                # 状态显示
+                if return_pct > 30:
+                    status = "🏆"
+                elif return_pct > 22.58:
+                    status = "🟢"
+                elif return_pct > 10:
+                    status = "🟡"
+                elif return_pct > 0:
+                    status = "🟠"
+                else:
+                    status = "🔴"
+                    
+                print(f"   {status} {name}: {return_pct:.2f}% (交易: {trade_count})")
+                
+            except Exception as e:
+                print(f"   ❌ {name} 失败: {str(e)}")
+    finally:
+        if executor is not None:
+            executor.shutdown()
     
     return results
 
@@ -148,5 +204,6 @@ def generate_comparison_report(results):
 
 
 if __name__ == "__main__":
-    results = test_fixed_strategies()
+    results = test_fixed_strategies(vectorized='--vectorized' in sys.argv,
+                                    max_workers=1 if '--serial' in sys.argv else None)
     generate_comparison_report(results)
\ No newline at end of file
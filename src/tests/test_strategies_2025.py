@@ -141,36 +141,31 @@ def test_all_strategies_2025():
     
     results = []
     
-    for i, strategy_config in enumerate(strategies_config, 1):
+    # 各策略在进程池中并行回测, 结果按配置顺序返回(失败的为None)
+    strategy_results = backtest.run_strategies(strategies_config, test_start, test_end)
+    
+    for i, (strategy_config, result) in enumerate(zip(strategies_config, strategy_results), 1):
         print(f"\n🔄 [{i}/{len(strategies_config)}] 测试 {strategy_config['name']}...")
         
-        try:
-            result = backtest.run_single_strategy(
-                strategy_config['strategy'],
-                strategy_config['params'],
-                test_start,
-                test_end
-            )
-            
-            if result:
-                results.append({
-                    'name': strategy_config['name'],
-                    'result': result
-                })
-                
-                # 简要结果
-                perf = result['performance']
-                total_return = result['total_return'] * 100
-                sharpe = perf.get('sharpe_ratio', 0)
-                max_dd = perf.get('max_drawdown', 0) * 100
-                trades = perf.get('total_trades', 0)
-                win_rate = perf.get('win_rate', 0) * 100
-                
-                status = "🟢" if total_return > 22.58 else "🟡" if total_return > 0 else "🔴"
-                print(f"   {status} 收益: {total_return:.1f}% | 夏普: {sharpe:.2f} | 回撤: {abs(max_dd):.1f}% | 交易: {trades} | 胜率: {win_rate:.1f}%")
-                
-        except Exception as e:
-            print(f"   ❌ 测试失败: {str(e)}")
+        if not result:
+            print("   ❌ 测试失败")
+            continue
+        
+        results.append({
+            'name': strategy_config['name'],
+            'result': result
+        })
+        
+        # 简要结果
+        perf = result['performance']
+        total_return = result['total_return'] * 100
+        sharpe = perf.get('sharpe_ratio', 0)
+        max_dd = perf.get('max_drawdown', 0) * 100
+        trades = perf.get('total_trades', 0)
+        win_rate = perf.get('win_rate', 0) * 100
+        
+        status = "🟢" if total_return > 22.58 else "🟡" if total_return > 0 else "🔴"
+        print(f"   {status} 收益: {total_return:.1f}% | 夏普: {sharpe:.2f} | 回撤: {abs(max_dd):.1f}% | 交易: {trades} | 胜率: {win_rate:.1f}%")
     
     return results
 
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+向量化回测内核的正确性检查
+不需要下载行情数据, 使用构造的价格序列
+"""
+
+import sys
+import os
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.vectorized_backtest import simulate_signals, VectorizedBacktester
+from strategies._kernels import NDArrayOHLCV, run_rsi
+from strategies.rsi_strategy import RSIMeanReversionStrategy, backtest_rsi_vectorized
+from strategies.mean_reversion_strategies import (BollingerMeanReversionStrategy,
+                                                  ZScoreMeanReversionStrategy,
+                                                  OverboughtOversoldStrategy,
+                                                  backtest_bollinger_vectorized,
+                                                  sweep_bollinger_vectorized)
+from strategies.momentum_strategies import (MomentumBreakoutStrategy, RelativeStrengthStrategy,
+                                            PriceVolumeStrategy)
+from tests.fixed_all_strategies import sweep_improved_momentum
+
+
+def _writable_ohlcv(n=300):
+    """构造的可写OHLCV数组(普通np.array, 非只读缓存)"""
+    rng = np.random.default_rng(0)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, n)))
+    high = close * (1.0 + rng.uniform(0.0, 0.01, n))
+    low = close * (1.0 - rng.uniform(0.0, 0.01, n))
+    volume = rng.uniform(1000.0, 2000.0, n)
+    return NDArrayOHLCV(open=close.copy(), high=high, low=low, close=close, volume=volume)
+
+
+def test_simulate_signals_marks_open_position():
+    """期末未平仓的持仓按最后收盘价计入总收益率, 但不计入已平仓交易"""
+    close = np.array([100.0, 110.0, 100.0, 120.0, 150.0])
+    entry = np.array([True, False, True, False, False])
+    exit_ = np.array([False, True, False, False, False])
+
+    result = simulate_signals(close, {'entry': entry, 'exit': exit_}, 1.0)
+
+    assert len(result['trades']) == 1
+    assert result['open_entry'] == 2
+    # 第一笔 +10%, 未平仓持仓 100 -> 150 为 +50%
+    assert np.isclose(result['total_return'], (1.1 * 1.5 - 1) * 100)
+
+
+def test_run_rsi_marks_open_position():
+    """最后一个信号为未平仓的入场时, 资金曲线仍随持仓按收盘价变化"""
+    # 持续下跌使RSI进入超卖区买入, 之后反弹到入场价之上; 超买阈值101与
+    # 不设止损/止盈保证不会出场, 持仓到期末
+    close = np.concatenate((np.linspace(200.0, 100.0, 30), np.linspace(101.0, 250.0, 10)))
+    cash = 10000.0
+
+    equity, entries, exits, returns = run_rsi(close, 14, 30.0, 101.0, np.inf, np.inf,
+                                              0.95, cash)
+
+    assert entries.shape[0] == 0 and exits.shape[0] == 0
+    assert equity[-1] != cash
+    assert equity[-1] > equity[-2] > cash
+
+
+
+def test_vectorized_helpers_accept_writable_arrays():
+    """公开的向量化回测函数接受普通可写数组(内核签名不应产生重载歧义)"""
+    ohlcv = _writable_ohlcv()
+    assert ohlcv.close.flags.writeable
+
+    backtest_rsi_vectorized(np.array(ohlcv.close))
+    backtest_bollinger_vectorized(ohlcv.close, ohlcv.high, ohlcv.low)
+    sweep_bollinger_vectorized(ohlcv.close, ohlcv.high, ohlcv.low, [15, 20], [2.0, 2.5])
+    sweep_improved_momentum(ohlcv.close, ohlcv.volume, [10, 20], [20], [0.02])
+
+    backtester = VectorizedBacktester(ohlcv)
+    for strategy_class in (RSIMeanReversionStrategy, BollingerMeanReversionStrategy,
+                           ZScoreMeanReversionStrategy, OverboughtOversoldStrategy,
+                           MomentumBreakoutStrategy, RelativeStrengthStrategy,
+                           PriceVolumeStrategy):
+        backtester.run(strategy_class)
+
+
+if __name__ == "__main__":
+    test_simulate_signals_marks_open_position()
+    test_run_rsi_marks_open_position()
+    test_vectorized_helpers_accept_writable_arrays()
+    print("✅ 向量化回测内核检查通过")
@@ -0,0 +1,28 @@
+"""
+并行回测进程池
+Process pool for independent backtests
+"""
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from strategies._kernels import warm_up_in_subprocess
+
+
+def backtest_pool(initializer, initargs=(), max_workers=None):
+    """
+    创建并行回测的进程池(max_workers默认为CPU核数)
+
+    创建前在独立进程中预编译内核并写入磁盘缓存, 池中子进程直接加载, 不会各自
+    重复编译。预编译不在主进程中执行: 其中的并行内核会启动numba线程层, 而TBB
+    线程层不是fork安全的, fork出的子进程会使解释器退出时挂起。
+
+    参数:
+    - initializer, initargs: 子进程初始化函数及参数(如传入共享的行情数据)
+    """
+    warm_up_in_subprocess()
+    return ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                               initializer=initializer, initargs=initargs)
@@ -1,80 +1,135 @@
 import backtrader as bt
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from datetime import datetime, timedelta
+from datetime import datetime
+import os
+import sys
+import copy
+import functools
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import warnings
 warnings.filterwarnings('ignore')
 
 from btc_data import BTCDataFeed
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.trade_buffer import ColumnBuffer
+from strategies._kernels import NUMBA_AVAILABLE, equity_curve_stats
 from btc_strategies.rsi_strategy import RSIMeanReversionStrategy
 from btc_strategies.macd_strategy import MACDMomentumStrategy, AdvancedMACDStrategy
 from btc_strategies.bollinger_strategy import BollingerBandsStrategy, AdaptiveBollingerStrategy
 from btc_strategies.btc_grid_strategy import BTCGridTradingStrategy, DynamicBTCGridStrategy
 
 
+def _equity_curve_stats(values):
+    """
+    账户价值序列的(回撤数组, 日收益率标准差, 最大回撤)
+    
+    安装numba时由编译内核一次融合计算; 否则kernels.equity_curve_stats为纯Python
+    循环, 改用NumPy逐步向量化计算, 结果一致。
+    """
+    if NUMBA_AVAILABLE:
+        return equity_curve_stats(values)
+    
+    peak = np.maximum.accumulate(values)
+    drawdown = (values - peak) / peak
+    returns = np.diff(values) / values[:-1] if len(values) > 1 else np.array([0.0])
+    return drawdown, np.std(returns), drawdown.min()
+
+
+def _trade_returns(pnl, entry_price, size):
+    """
+    按列计算每笔交易的收益率(%)与出场价
+    
+    入场价为0时收益率记为0, 仓位未知(为0)时出场价记为NaN。
+    """
+    pnl_pct = np.divide(pnl, entry_price, out=np.zeros_like(pnl), where=entry_price != 0) * 100
+    exit_price = entry_price + np.divide(pnl, size, out=np.full_like(pnl, np.nan), where=size != 0)
+    return pnl_pct, exit_price
+
+
 class PerformanceAnalyzer(bt.Analyzer):
-    """性能分析器"""
+    """
+    性能分析器
+    
+    每日账户价值与已平仓交易均按列存储在预分配的float64数组中(ColumnBuffer),
+    每根K线每个字段8字节, 不为每条记录创建字典或装箱的浮点数。
+    """
+    
+    # 已平仓交易的原始记录字段(均为浮点数, 日期为Backtrader的浮点日期数值),
+    # 收益率与出场价在get_analysis中按列一次计算
+    TRADE_FIELDS = ('date', 'pnl', 'duration', 'entry_price', 'size')
     
     def __init__(self):
-        self.trades = []
-        self.daily_values = []
+        self.trades = ColumnBuffer(self.TRADE_FIELDS)
+        # 持仓中交易的最近仓位(trade.ref -> size), 平仓后trade.size已归零
+        self._trade_sizes = {}
+        self.daily_values = None
         self.start_value = None
-        self.drawdowns = []
-        self.returns = []
     
     def start(self):
-        self.start_value = self.strategy.broker.getvalue()
+        # 缓存next()中使用的broker与日期线, 避免每根K线的属性链查找
+        self._broker = self.strategy.broker
+        self._datetime = self.strategy.datas[0].datetime
+        self.start_value = self._broker.getvalue()
+        # 每日账户价值按列预分配(每根K线一行), 日期为Backtrader的浮点日期数值,
+        # 日收益率在get_analysis中一次向量化计算
+        self.daily_values = ColumnBuffer(('date', 'value', 'cash'),
+                                         self.strategy.datas[0].buflen())
     
     def next(self):
-        current_value = self.strategy.broker.getvalue()
-        self.daily_values.append({
-            'date': self.strategy.datas[0].datetime.date(0),
-            'value': current_value,
-            'cash': self.strategy.broker.getcash()
-        })
-        
-        # 计算日收益率
-        if len(self.daily_values) > 1:
-            prev_value = self.daily_values[-2]['value']
-            daily_return = (current_value - prev_value) / prev_value
-            self.returns.append(daily_return)
+        broker = self._broker
+        self.daily_values.append(self._datetime[0], broker.getvalue(), broker.getcash())
     
     def notify_trade(self, trade):
         if trade.isclosed:
-            self.trades.append({
-                'date': self.strategy.datas[0].datetime.date(0),
-                'pnl': trade.pnl,
-                'pnl_pct': (trade.pnl / trade.price) * 100,
-                'duration': (trade.dtclose - trade.dtopen),
-                'entry_price': trade.price,
-                'exit_price': trade.price + (trade.pnl / trade.size)
-            })
+            self.trades.append(
+                self._datetime[0],
+                trade.pnl,
+                trade.dtclose - trade.dtopen,
+                trade.price,
+                self._trade_sizes.pop(trade.ref, 0.0)
+            )
+        elif trade.isopen:
+            self._trade_sizes[trade.ref] = trade.size
     
     def get_analysis(self):
         if not self.daily_values or not self.start_value:
             return {}
         
-        df = pd.DataFrame(self.daily_values)
-        final_value = df['value'].iloc[-1]
+        values = self.daily_values.column('value')
+        final_value = values[-1]
         
         # 基本指标
         total_return = (final_value - self.start_value) / self.start_value
-        trading_days = len(df)
+        trading_days = len(values)
         annualized_return = (1 + total_return) ** (365 / trading_days) - 1
         
-        # 风险指标
-        returns_array = np.array(self.returns) if self.returns else np.array([0])
-        volatility = np.std(returns_array) * np.sqrt(365)
+        # 风险指标与最大回撤
+        drawdown, return_std, max_drawdown = _equity_curve_stats(values)
+        volatility = return_std * np.sqrt(365)
         sharpe_ratio = (annualized_return - 0.02) / volatility if volatility > 0 else 0
         
-        # 最大回撤
-        df['peak'] = df['value'].cummax()
-        df['drawdown'] = (df['value'] - df['peak']) / df['peak']
-        max_drawdown = df['drawdown'].min()
-        
         # 交易统计
-        trades_df = pd.DataFrame(self.trades) if self.trades else pd.DataFrame()
+        total_trades = len(self.trades)
+        pnl = self.trades.column('pnl')
+        pnl_pct, exit_price = _trade_returns(pnl, self.trades.column('entry_price'),
+                                             self.trades.column('size'))
+        win_rate = np.count_nonzero(pnl > 0) / total_trades if total_trades > 0 else 0
+        avg_return = pnl_pct.mean() if total_trades > 0 else 0
+        
+        # 每日数据与交易记录表(供绘图与导出), 各由列数组一次构造
+        df = pd.DataFrame(self.daily_values.to_dict())
+        df['date'] = [bt.num2date(x).date() for x in df['date']]
+        df['peak'] = df['value'].cummax()
+        df['drawdown'] = drawdown
+        trades_df = pd.DataFrame()
+        if total_trades > 0:
+            trades_df = pd.DataFrame(self.trades.to_dict())
+            trades_df['date'] = [bt.num2date(x).date() for x in trades_df['date']]
+            trades_df['pnl_pct'] = pnl_pct
+            trades_df['exit_price'] = exit_price
         
         return {
             'total_return': total_return,
@@ -82,9 +137,9 @@ class PerformanceAnalyzer(bt.Analyzer):
             'volatility': volatility,
             'sharpe_ratio': sharpe_ratio,
             'max_drawdown': max_drawdown,
-            'total_trades': len(trades_df),
-            'win_rate': len(trades_df[trades_df['pnl'] > 0]) / len(trades_df) if len(trades_df) > 0 else 0,
-            'avg_return': trades_df['pnl_pct'].mean() if len(trades_df) > 0 else 0,
+            'total_trades': total_trades,
+            'win_rate': win_rate,
+            'avg_return': avg_return,
             'start_value': self.start_value,
             'final_value': final_value,
             'daily_data': df,
@@ -92,60 +147,137 @@ class PerformanceAnalyzer(bt.Analyzer):
         }
 
 
+def _run_backtest(strategy_class, strategy_params, data, initial_cash, commission):
+    """
+    运行单个策略的回测, 返回(初始价值, 最终价值, 性能分析结果)
+    
+    模块级函数, 可在子进程中执行; data为行情DataFrame, 每次回测由它创建
+    独立的Backtrader数据源。
+    """
+    cerebro = bt.Cerebro()
+    
+    # 添加性能分析器
+    cerebro.addanalyzer(PerformanceAnalyzer, _name='performance')
+    cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
+    cerebro.addanalyzer(bt.analyzers.Returns, _name='returns')
+    cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe')
+    
+    # 添加策略
+    if strategy_params:
+        cerebro.addstrategy(strategy_class, **strategy_params)
+    else:
+        cerebro.addstrategy(strategy_class)
+    
+    cerebro.adddata(BTCDataFeed.to_backtrader_feed(data))
+    
+    # 设置资金和手续费
+    cerebro.broker.setcash(initial_cash)
+    cerebro.broker.setcommission(commission=commission)
+    
+    # 运行回测
+    start_value = cerebro.broker.getvalue()
+    strategies = cerebro.run()
+    final_value = cerebro.broker.getvalue()
+    
+    # 获取分析结果
+    performance = strategies[0].analyzers.performance.get_analysis()
+    return start_value, final_value, performance
+
+
+# 子进程共享的行情数据, 由进程池初始化时传入一次
+_worker_data = None
+
+
+def _init_worker(data):
+    global _worker_data
+    _worker_data = data
+
+
+def _run_worker(strategy_class, strategy_params, initial_cash, commission):
+    """进程池任务: 使用初始化时传入的行情数据回测"""
+    return _run_backtest(strategy_class, strategy_params, _worker_data,
+                         initial_cash, commission)
+
+
+def _copy_result(result):
+    """
+    回测结果的副本: 性能分析结果(含DataFrame)深复制, 行情数据为共享缓存不复制
+    """
+    copied = dict(result)
+    copied['performance'] = copy.deepcopy(result['performance'])
+    return copied
+
+
 class BTCStrategyBacktester:
     """比特币策略回测框架"""
     
-    def __init__(self, initial_cash=10000, commission=0.001):
+    # 回测结果缓存的最大条目数, 超出时淘汰最久未使用的
+    RESULT_CACHE_SIZE = 128
+    
+    def __init__(self, initial_cash=10000, commission=0.001, cache_dir=None):
         self.initial_cash = initial_cash
         self.commission = commission
         self.btc_feed = BTCDataFeed()
+        self.cache_dir = cache_dir  # 磁盘缓存目录, None为只使用内存缓存
+        self._data_cache = {}
+        self._result_cache = OrderedDict()
         self.results = {}
     
-    def run_single_strategy(self, strategy_class, strategy_params=None, 
-                          start_date="2022-01-01", end_date="2023-12-31"):
-        """运行单个策略回测"""
-        cerebro = bt.Cerebro()
-        
-        # 添加性能分析器
-        cerebro.addanalyzer(PerformanceAnalyzer, _name='performance')
-        cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
-        cerebro.addanalyzer(bt.analyzers.Returns, _name='returns')
-        cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe')
-        
-        # 添加策略
-        if strategy_params:
-            cerebro.addstrategy(strategy_class, **strategy_params)
-        else:
-            cerebro.addstrategy(strategy_class)
-        
-        # 获取数据
-        bt_data, raw_data = self.btc_feed.get_backtrader_data(start_date, end_date)
-        if bt_data is None:
-            print(f"无法获取数据: {start_date} 到 {end_date}")
+    def _get_data(self, start_date, end_date):
+        """
+        获取行情DataFrame, 按 内存缓存 -> 磁盘缓存 -> 下载 的顺序查找, 失败时返回None
+        
+        同一日期区间的所有回测共用同一份DataFrame(不应修改), 每次回测只需由它
+        创建新的数据源。
+        """
+        key = (start_date, end_date)
+        data = self._data_cache.get(key)
+        if data is None:
+            data = self.btc_feed.fetch_data_cached(start_date, end_date, self.cache_dir)
+            if data is not None:
+                self._data_cache[key] = data
+        return data
+    
+    def _result_key(self, strategy_class, strategy_params, start_date, end_date):
+        """
+        回测结果缓存键
+        
+        同一策略、参数、日期区间、资金与手续费的回测结果相同; 参数含不可哈希的
+        值(如列表)时返回None, 即不缓存。
+        """
+        key = (strategy_class, tuple(sorted((strategy_params or {}).items())),
+               start_date, end_date, self.initial_cash, self.commission)
+        try:
+            hash(key)
+        except TypeError:
             return None
+        return key
+    
+    def _cached_result(self, key):
+        """读取缓存的回测结果副本, 未命中时返回None"""
+        result = self._result_cache.get(key) if key is not None else None
+        if result is None:
+            return None
+        self._result_cache.move_to_end(key)
+        return _copy_result(result)
+    
+    def _store_result(self, key, result):
+        """缓存回测结果的副本(调用方修改返回的结果不影响缓存)"""
+        if key is None or result is None:
+            return
+        self._result_cache[key] = _copy_result(result)
+        while len(self._result_cache) > self.RESULT_CACHE_SIZE:
+            self._result_cache.popitem(last=False)
+    
+    def clear_result_cache(self):
+        """清空回测结果缓存(如修改策略代码后)"""
+        self._result_cache.clear()
+    
+    def _make_result(self, strategy_class, start_date, end_date, raw_data, backtest_output):
+        """由_run_backtest的返回值组装回测结果"""
+        start_value, final_value, performance = backtest_output
         
-        cerebro.adddata(bt_data)
-        
-        # 设置资金和手续费
-        cerebro.broker.setcash(self.initial_cash)
-        cerebro.broker.setcommission(commission=self.commission)
-        
-        # 运行回测
-        print(f"\n{'='*50}")
-        print(f"回测策略: {strategy_class.__name__}")
-        print(f"时间范围: {start_date} 到 {end_date}")
-        print(f"初始资金: {self.initial_cash}")
-        print(f"{'='*50}")
-        
-        start_value = cerebro.broker.getvalue()
-        strategies = cerebro.run()
-        final_value = cerebro.broker.getvalue()
-        
-        # 获取分析结果
-        strategy = strategies[0]
-        performance = strategy.analyzers.performance.get_analysis()
-        
-        result = {
+        return {
             'strategy_name': strategy_class.__name__,
             'start_date': start_date,
             'end_date': end_date,
@@ -155,35 +287,121 @@ class BTCStrategyBacktester:
             'performance': performance,
             'raw_data': raw_data
         }
+    
+    def _report(self, result):
+        """打印单个策略的回测结果"""
+        print(f"\n{'='*50}")
+        print(f"回测策略: {result['strategy_name']}")
+        print(f"时间范围: {result['start_date']} 到 {result['end_date']}")
+        print(f"初始资金: {result['initial_cash']}")
+        print(f"{'='*50}")
         
         self.print_results(result)
+    
+    def run_single_strategy(self, strategy_class, strategy_params=None, 
+                          start_date="2022-01-01", end_date="2023-12-31", use_cache=True):
+        """
+        运行单个策略回测
+        
+        相同策略、参数与日期区间的结果会被缓存(最近RESULT_CACHE_SIZE个),
+        参数扫描中重复的组合不再重新回测; use_cache=False时强制重新运行。
+        """
+        key = self._result_key(strategy_class, strategy_params, start_date, end_date)
+        result = self._cached_result(key) if use_cache else None
+        if result is None:
+            # 获取数据
+            raw_data = self._get_data(start_date, end_date)
+            if raw_data is None:
+                print(f"无法获取数据: {start_date} 到 {end_date}")
+                return None
+            
+            output = _run_backtest(strategy_class, strategy_params, raw_data,
+                                   self.initial_cash, self.commission)
+            result = self._make_result(strategy_class, start_date, end_date, raw_data, output)
+            self._store_result(key, result)
+        
+        self._report(result)
         return result
     
+    def run_strategies(self, strategies_config, start_date="2022-01-01", end_date="2023-12-31",
+                       max_workers=None, use_cache=True):
+        """
+        运行多个策略回测, 返回与strategies_config一一对应的结果列表
+        
+        各策略回测相互独立, 使用进程池并行运行(max_workers默认为CPU核数,
+        为1或只需运行一个策略时顺序运行)。行情数据只获取一次, 在进程池初始化时
+        传给各子进程; 结果按配置顺序打印。回测失败的策略结果为None。
+        已缓存的结果直接复用(见run_single_strategy), 只回测未命中的配置。
+        """
+        jobs = [(config['strategy'], config.get('params', {})) for config in strategies_config]
+        keys = [self._result_key(strategy_class, params, start_date, end_date)
+                for strategy_class, params in jobs]
+        results = [self._cached_result(key) if use_cache else None for key in keys]
+        pending = [k for k, result in enumerate(results) if result is None]
+        
+        raw_data = self._get_data(start_date, end_date) if pending else None
+        if pending and raw_data is None:
+            print(f"无法获取数据: {start_date} 到 {end_date}")
+            return [None] * len(strategies_config)
+        
+        if max_workers == 1 or len(pending) <= 1:
+            outputs = {k: functools.partial(_run_backtest, jobs[k][0], jobs[k][1], raw_data,
+                                            self.initial_cash, self.commission)
+                       for k in pending}
+            return self._gather(jobs, keys, results, outputs, start_date, end_date, raw_data)
+        
+        workers = min(len(pending), max_workers or os.cpu_count())
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(raw_data,)) as executor:
+            outputs = {k: executor.submit(_run_worker, jobs[k][0], jobs[k][1],
+                                          self.initial_cash, self.commission).result
+                       for k in pending}
+            return self._gather(jobs, keys, results, outputs, start_date, end_date, raw_data)
+    
+    def _gather(self, jobs, keys, results, outputs, start_date, end_date, raw_data):
+        """按配置顺序取得各策略的结果(缓存命中或回测输出), 缓存新结果并打印"""
+        for k, (strategy_class, _) in enumerate(jobs):
+            if k in outputs:
+                results[k] = self._collect(strategy_class, start_date, end_date, raw_data,
+                                           outputs[k])
+                self._store_result(keys[k], results[k])
+            if results[k] is not None:
+                self._report(results[k])
+        return results
+    
+    def _collect(self, strategy_class, start_date, end_date, raw_data, get_output):
+        """取得单个策略的回测输出并组装结果, 失败时打印错误并返回None"""
+        try:
+            output = get_output()
+        except Exception as e:
+            print(f"❌ {strategy_class.__name__} 回测失败: {e}")
+            return None
+        return self._make_result(strategy_class, start_date, end_date, raw_data, output)
+    
     def run_strategy_comparison(self, strategies_config, 
-                               start_date="2022-01-01", end_date="2023-12-31"):
-        """运行多策略对比"""
-        results = []
-        
+                               start_date="2022-01-01", end_date="2023-12-31", max_workers=None,
+                               plot=True, show_plot=None):
+        """
+        运行多策略对比(策略并行回测, 见run_strategies)
+        
+        plot为False时不绘制对比图(批量运行时省去绘图与保存PNG的开销);
+        show_plot见plot_strategy_comparison。
+        """
         print(f"\n{'='*60}")
         print(f"比特币交易策略对比分析")
         print(f"时间范围: {start_date} 到 {end_date}")
         print(f"初始资金: {self.initial_cash}")
         print(f"{'='*60}")
         
-        for config in strategies_config:
-            result = self.run_single_strategy(
-                config['strategy'], 
-                config.get('params', {}),
-                start_date, 
-                end_date
-            )
-            if result:
-                results.append(result)
+        results = [result for result in self.run_strategies(strategies_config, start_date,
+                                                             end_date, max_workers)
+                   if result]
         
         # 生成对比报告
         if results:
             self.generate_comparison_report(results)
-            self.plot_strategy_comparison(results)
+            if plot:
+                self.plot_strategy_comparison(results, show_plot=show_plot)
         
         return results
     
@@ -227,11 +445,26 @@ class BTCStrategyBacktester:
         print(f"\n🏆 最佳收益策略: {best_return['strategy_name']} ({best_return['total_return']*100:.2f}%)")
         print(f"🏆 最佳风险调整收益策略: {best_sharpe['strategy_name']} (夏普比率: {best_sharpe['performance'].get('sharpe_ratio', 0):.3f})")
     
-    def plot_strategy_comparison(self, results):
-        """绘制策略对比图"""
+    def plot_strategy_comparison(self, results, show_plot=None, dpi=300):
+        """
+        绘制策略对比图并保存为PNG
+        
+        参数:
+        - show_plot: 是否显示窗口, None为只在交互式后端下显示(无显示环境时
+          matplotlib使用Agg后端, plt.show()无意义)
+        - dpi: 保存图片的分辨率, 批量运行时可调低以减少PNG编码时间
+        """
         if not results:
             return
         
+        # 只在绘图时导入matplotlib: 回测与参数扫描(含进程池子进程)不绘图,
+        # 无需承担其导入时间与内存
+        import matplotlib
+        import matplotlib.pyplot as plt
+        
+        if show_plot is None:
+            show_plot = matplotlib.get_backend().lower() != 'agg'
+        
         fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 10))
         fig.suptitle('比特币交易策略对比分析', fontsize=16)
         
@@ -289,12 +522,15 @@ class BTCStrategyBacktester:
         ax4.grid(True, alpha=0.3)
         
         plt.tight_layout()
-        plt.show()
         
-        # 保存图表
+        # 保存图表(在show之前, 窗口关闭后图形已被清空)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        plt.savefig(f'btc_strategy_comparison_{timestamp}.png', dpi=300, bbox_inches='tight')
+        fig.savefig(f'btc_strategy_comparison_{timestamp}.png', dpi=dpi, bbox_inches='tight')
         print(f"\n📈 图表已保存: btc_strategy_comparison_{timestamp}.png")
+        
+        if show_plot:
+            plt.show()
+        plt.close(fig)
 
 
 def main():
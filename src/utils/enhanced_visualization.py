@@ -17,6 +17,7 @@ import seaborn as sns
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from dataclasses import asdict, is_dataclass
 import warnings
 import os
 import io
@@ -527,6 +528,11 @@ class EnhancedStrategyMixin:
             'trades': [],
             'signals': []
         }
+        
+        # 数据源是否含成交量在整个回测中不变, 只判断一次
+        volume_line = getattr(self.data, 'volume', None)
+        self._get_volume = ((lambda: volume_line[0]) if volume_line is not None
+                            else (lambda: 0))
     
     def log_visualization_data(self, indicator_values=None):
         """Log data for visualization"""
@@ -540,7 +546,7 @@ class EnhancedStrategyMixin:
             'High': self.data.high[0],
             'Low': self.data.low[0], 
             'Close': current_price,
-            'Volume': self.data.volume[0] if hasattr(self.data, 'volume') else 0
+            'Volume': self._get_volume()
         }
         
         # Add indicator values
@@ -561,7 +567,8 @@ class EnhancedStrategyMixin:
         """Get all visualization data"""
         return {
             'indicator_data': pd.DataFrame(self.visualization_data['indicator_data']),
-            'trade_points': self.visualization_data['trade_points'],
+            'trade_points': [asdict(point) if is_dataclass(point) else point
+                             for point in self.visualization_data['trade_points']],
             'portfolio_values': pd.DataFrame(self.visualization_data['portfolio_values']),
             'trades': self.visualization_data['trades'],
             'signals': pd.DataFrame(self.visualization_data['signals'])
@@ -0,0 +1,145 @@
+"""
+交易记录缓冲区
+Preallocated trade record buffers
+"""
+
+import numpy as np
+
+
+class ReturnBuffer:
+    """
+    预分配的交易收益率(%)缓冲区
+
+    替代Python列表记录每笔交易收益率。容量不足时按倍数扩容, 均摊O(1)追加。
+    兼容len()/迭代/下标/布尔判断等列表用法, values属性返回已记录部分的
+    NumPy视图, 便于向量化统计。
+    """
+
+    __slots__ = ('_buffer', '_size')
+
+    def __init__(self, capacity=64):
+        self._buffer = np.empty(max(capacity, 1), dtype=np.float64)
+        self._size = 0
+
+    def append(self, value):
+        if self._size == self._buffer.shape[0]:
+            grown = np.empty(self._buffer.shape[0] * 2, dtype=np.float64)
+            grown[:self._size] = self._buffer
+            self._buffer = grown
+        self._buffer[self._size] = value
+        self._size += 1
+
+    def clear(self):
+        self._size = 0
+
+    @property
+    def values(self):
+        """已记录的收益率(NumPy视图)"""
+        return self._buffer[:self._size]
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    def __iter__(self):
+        return iter(self.values.tolist())
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def __repr__(self):
+        return f'ReturnBuffer({self.values.tolist()})'
+
+
+class ColumnBuffer:
+    """
+    按列存储(SoA)的预分配记录缓冲区
+
+    每个字段一个float64数组, 每次append写入同一行; 容量不足时按倍数扩容。
+    to_dict()返回各列已记录部分的视图, 可直接构造DataFrame, 无需逐行解析字典。
+    """
+
+    __slots__ = ('names', '_columns', '_size')
+
+    def __init__(self, names, capacity=64):
+        self.names = tuple(names)
+        self._columns = [np.empty(max(capacity, 1), dtype=np.float64) for _ in self.names]
+        self._size = 0
+
+    def append(self, *values):
+        size = self._size
+        if size == self._columns[0].shape[0]:
+            self._grow()
+        for column, value in zip(self._columns, values):
+            column[size] = value
+        self._size = size + 1
+
+    def _grow(self):
+        for k, column in enumerate(self._columns):
+            grown = np.empty(column.shape[0] * 2, dtype=np.float64)
+            grown[:self._size] = column[:self._size]
+            self._columns[k] = grown
+
+    def column(self, name):
+        """指定字段已记录部分(NumPy视图)"""
+        return self._columns[self.names.index(name)][:self._size]
+
+    def to_dict(self):
+        """字段名 -> 已记录部分的视图"""
+        return {name: column[:self._size] for name, column in zip(self.names, self._columns)}
+
+    def __len__(self):
+        return self._size
+
+
+# 已平仓交易记录的结构化类型: 每条32字节
+TRADE_RECORD_DTYPE = np.dtype([
+    ('date', 'datetime64[D]'),
+    ('pnl', np.float64),
+    ('pnl_pct', np.float64),
+    ('price', np.float64),
+])
+
+
+class TradeRecordBuffer:
+    """
+    预分配的已平仓交易记录(NumPy结构化数组)
+
+    替代每笔交易一个字典的列表。values属性返回已记录部分的结构化数组视图,
+    可按字段向量化统计(如 values['pnl'] > 0), 或直接 pd.DataFrame(values)。
+    迭代时逐条返回字典, 兼容原有按字典读取的代码。
+    """
+
+    __slots__ = ('_buffer', '_size')
+
+    def __init__(self, capacity=64):
+        self._buffer = np.empty(max(capacity, 1), dtype=TRADE_RECORD_DTYPE)
+        self._size = 0
+
+    def append(self, date, pnl, pnl_pct, price):
+        if self._size == self._buffer.shape[0]:
+            grown = np.empty(self._buffer.shape[0] * 2, dtype=TRADE_RECORD_DTYPE)
+            grown[:self._size] = self._buffer
+            self._buffer = grown
+        self._buffer[self._size] = (date, pnl, pnl_pct, price)
+        self._size += 1
+
+    @property
+    def values(self):
+        """已记录的交易(结构化数组视图)"""
+        return self._buffer[:self._size]
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    def __iter__(self):
+        names = TRADE_RECORD_DTYPE.names
+        return (dict(zip(names, row)) for row in self.values.tolist())
+
+    def __repr__(self):
+        return f'TradeRecordBuffer({len(self)} trades)'
@@ -0,0 +1,129 @@
+"""
+向量化回测器
+Vectorized backtester for parameter sweeps
+
+不经过Backtrader的Cerebro/Broker事件循环: 策略以类方法 vectorized_signals()
+一次性生成整段行情的入场/出场信号数组, 再由编译的单仓位状态机一次遍历得到
+全部交易。适合参数扫描时快速筛选, 最终结果仍应使用Backtrader策略验证。
+
+简化假设: 以信号K线收盘价成交, 不含手续费, 不支持加仓。期末未平仓的持仓
+按最后一根K线收盘价计入总收益率(与Backtrader的账户价值一致), 但不计入trades。
+"""
+
+import sys
+import os
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from strategies._kernels import simulate_long_only, final_value
+
+
+def strategy_params(strategy_class, overrides=None):
+    """合并策略默认参数与覆盖参数, 返回字典"""
+    params = dict(strategy_class.params._getitems())
+    if overrides:
+        unknown = set(overrides) - set(params)
+        if unknown:
+            raise ValueError(f"{strategy_class.__name__} 不支持参数: {sorted(unknown)}")
+        params.update(overrides)
+    return params
+
+
+class VectorizedBacktester:
+    """
+    向量化回测器
+
+    使用方法:
+        backtester = VectorizedBacktester(ohlcv)
+        result = backtester.run(ZScoreMeanReversionStrategy, lookback_period=30)
+
+    ohlcv为含 open/high/low/close/volume 数组属性的对象(如SharedOHLCV)。
+    """
+
+    def __init__(self, ohlcv):
+        self.ohlcv = ohlcv
+
+    def run(self, strategy_class, **params):
+        """
+        运行单次向量化回测
+
+        返回:
+        - dict: trades(每笔收益率%), entries/exits(K线索引), total_return(复利收益率%)
+        """
+        if not hasattr(strategy_class, 'vectorized_signals'):
+            raise NotImplementedError(f"{strategy_class.__name__} 不支持向量化回测")
+
+        p = strategy_params(strategy_class, params)
+        signals = strategy_class.vectorized_signals(self.ohlcv, p)
+        return simulate_signals(self.ohlcv.close, signals, p['position_size'])
+
+
+def simulate_signals(close, signals, position_size):
+    """
+    按vectorized_signals()返回的信号运行单仓位状态机
+
+    signals字典:
+    - entry, exit: 布尔数组
+    - warmup: 预热K线数, 之前的信号被忽略(可选)
+    - stop_distance: 止损距离数组(可选)
+    - stop_loss, take_profit: 止损/止盈比例(可选)
+    
+    返回的total_return含期末未平仓持仓的浮动盈亏, open_entry为该持仓的
+    入场K线索引(无持仓为None)。
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    entry = np.asarray(signals['entry'], dtype=np.bool_).copy()
+    exit_ = np.asarray(signals['exit'], dtype=np.bool_).copy()
+
+    warmup = signals.get('warmup', 0)
+    if warmup > 1:
+        entry[:warmup - 1] = False
+        exit_[:warmup - 1] = False
+
+    stop_distance = signals.get('stop_distance')
+    if stop_distance is None:
+        stop_distance = np.full(close.shape[0], np.inf)
+    stop_loss = signals.get('stop_loss')
+    take_profit = signals.get('take_profit')
+
+    entries, exits, returns, open_entry = simulate_long_only(
+        close, entry, exit_, np.asarray(stop_distance, dtype=np.float64),
+        np.inf if stop_loss is None else float(stop_loss),
+        np.inf if take_profit is None else float(take_profit)
+    )
+
+    equity = np.prod(1.0 + position_size * returns)
+    if open_entry >= 0:
+        # 期末未平仓的持仓按最后收盘价计值
+        equity *= 1.0 + position_size * (close[-1] / close[open_entry] - 1.0)
+    return {
+        'trades': returns * 100,
+        'entries': entries,
+        'exits': exits,
+        'open_entry': int(open_entry) if open_entry >= 0 else None,
+        'total_return': (equity - 1.0) * 100,
+    }
+
+
+def backtest_final_value(close, entry, exit_, stop_loss=None, take_profit=None,
+                         initial_cash=10000.0, commission=0.001, position_size=0.95):
+    """
+    含手续费的向量化回测, 返回最终账户价值
+    
+    整段行情在一个编译循环中完成, 不记录交易, 参数扫描时用于替代每组参数
+    一次的cerebro.run()。以信号K线收盘价成交, 最终结果仍应使用Backtrader验证。
+    
+    参数:
+    - entry, exit_: 布尔信号数组
+    - stop_loss, take_profit: 止损/止盈比例, None为不使用
+    - commission: 买卖双边的手续费比例
+    """
+    return float(final_value(
+        np.ascontiguousarray(close, dtype=np.float64),
+        np.asarray(entry, dtype=np.bool_),
+        np.asarray(exit_, dtype=np.bool_),
+        np.inf if stop_loss is None else float(stop_loss),
+        np.inf if take_profit is None else float(take_profit),
+        float(initial_cash), float(commission), float(position_size)
+    ))